@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Coste por turno de añadir la sesión del ADK Agent a la memoria en una conversación larga.
+
+Ejecuta ``--turns`` turnos reales con el Runner de ADK (LLM simulado, sin red)
+en una única sesión y, tras cada turno, mide:
+
+- ``completa`` (el comportamiento anterior): ``get_session`` de la sesión
+  entera y ``add_session_to_memory``, que la indexa de nuevo desde el
+  principio; el coste crece con la longitud de la conversación,
+- ``incremental``: ``ADKAgent._add_session_to_memory``, que sólo añade los
+  eventos posteriores a la última ingesta.
+
+Muestra la mediana por tramos de turnos y comprueba que la memoria
+incremental contiene cada evento una sola vez y encuentra los primeros turnos.
+
+Uso:
+    python benchmarks/bench_adk_memory_ingest.py --turns 500
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from google.adk.memory import InMemoryMemoryService
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from multi_tool_agent.agents.adk_agent import ADKAgent
+
+
+class SimulatedLlm(BaseLlm):
+    """LLM sin red: una respuesta corta al instante."""
+
+    async def generate_content_async(self, llm_request, stream=False):
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="Entendido, lo recordaré.")]))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Ingesta completa frente a incremental en la memoria ADK")
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--buckets", type=int, default=5, help="Tramos de turnos en el resumen")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["ADK_SESSION_DB"] = os.path.join(tmp, "sessions.db")
+        # Se compara con InMemoryMemoryService, y al final se inspeccionan sus eventos
+        os.environ["ADK_MEMORY_SERVICE"] = "memory"
+        os.environ["ADK_MEMORY_DB"] = os.path.join(tmp, "memory.db")
+        os.environ["ADK_MEMORY_SNAPSHOT"] = os.path.join(tmp, "memory.snapshot")
+        agent = ADKAgent()
+        agent.llm_agent.model = SimulatedLlm(model="simulado")
+        # La ingesta se lanza a mano tras cada turno para medirla
+        agent._schedule_memory_ingest = lambda user_id, session_id: None
+        full_memory = InMemoryMemoryService()
+
+        full_times, delta_times = [], []
+        session_id = None
+        for turn in range(args.turns):
+            _, session_id = await agent.run("bench-user", f"Dato número {turn}: mi color favorito {turn}", session_id)
+
+            started = time.perf_counter()
+            session = await agent.session_service.get_session(app_name="adk_agent", user_id="bench-user",
+                                                              session_id=session_id)
+            await full_memory.add_session_to_memory(session)
+            full_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await agent._add_session_to_memory("bench-user", session_id)
+            delta_times.append(time.perf_counter() - started)
+
+        size = max(1, args.turns // args.buckets)
+        print(f"\n📊 Ingesta en memoria por turno, una sesión de {args.turns} turnos (mediana por tramo)")
+        print(f"   {'turnos':<12} {'completa':>12} {'incremental':>14}")
+        for start in range(0, args.turns, size):
+            end = min(args.turns, start + size)
+            print(f"   {start + 1:>4}-{end:<7} {statistics.median(full_times[start:end]) * 1000:9.3f} ms"
+                  f" {statistics.median(delta_times[start:end]) * 1000:11.3f} ms")
+        print(f"   total: completa {sum(full_times) * 1000:.0f} ms, incremental {sum(delta_times) * 1000:.0f} ms")
+
+        stored = agent.memory_service._session_events[("adk_agent", "bench-user")][session_id]
+        ids = [event.id for event in stored]
+        found = await agent.memory_service.search_memory(app_name="adk_agent", user_id="bench-user", query="número 0")
+        print(f"   eventos en memoria: {len(ids)} ({len(set(ids))} distintos); "
+              f"búsqueda de un turno antiguo: {len(found.memories)} resultados")
+        print(f"   {agent.get_runtime_stats()['memory_ingest']}")
+        await agent.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Memoria del ADK Agent con 100k eventos: InMemoryMemoryService frente a SQLiteMemoryService.
+
+Añade ``--events`` eventos de texto (turnos de usuario y modelo, de dos en
+dos como la ingesta incremental del agente) repartidos entre ``--users``
+usuarios y mide:
+
+- tiempo de ingesta y RSS del proceso tras cargar los eventos,
+- latencia de ``search_memory`` (mediana y p95) para consultas de una y dos
+  palabras sobre usuarios al azar,
+- (sqlite) que tras reabrir el fichero las búsquedas siguen encontrando lo
+  mismo: la memoria sobrevive a un reinicio.
+
+Cada servicio se mide en un proceso nuevo para que el RSS sea comparable.
+
+Uso:
+    python benchmarks/bench_adk_memory_service.py --events 100000 --users 20
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from google.adk.events import Event
+from google.adk.memory import InMemoryMemoryService
+from google.genai import types
+
+from multi_tool_agent.storage import SQLiteMemoryService
+
+TOPICS = ["gato", "perro", "viaje", "trabajo", "música", "cocina", "fútbol", "libro", "película", "jardín",
+          "montaña", "playa", "ordenador", "guitarra", "bicicleta", "café", "teatro", "idioma", "museo", "tren"]
+WORDS = ["hoy", "mañana", "siempre", "nuevo", "antiguo", "grande", "pequeño", "rojo", "azul", "verde",
+         "rápido", "lento", "casa", "ciudad", "amigo", "familia", "semana", "tarde", "noche", "mercado"]
+
+
+def rss_mb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def make_event(rng, author, turn):
+    text = f"{rng.choice(TOPICS)} {' '.join(rng.choices(WORDS, k=12))} {rng.choice(TOPICS)} número {turn}"
+    return Event(author=author, invocation_id=f"inv-{turn}",
+                 content=types.Content(role="user" if author == "user" else "model", parts=[types.Part(text=text)]))
+
+
+async def measure(mode, events, users, queries, db_path):
+    rng = random.Random(7)
+    service = InMemoryMemoryService() if mode == "inmemory" else SQLiteMemoryService(db_path)
+    baseline = rss_mb()
+
+    started = time.perf_counter()
+    for turn in range(events // 2):
+        user_id = f"user-{turn % users}"
+        await service.add_events_to_memory(app_name="adk_agent", user_id=user_id, session_id=f"s-{user_id}",
+                                           events=[make_event(rng, "user", turn), make_event(rng, "adk_agent", turn)])
+    if mode == "sqlite":
+        await service.write_queue.flush()
+    ingest = time.perf_counter() - started
+    loaded_rss = rss_mb()
+
+    query_rng = random.Random(11)
+    query_list = [
+        (f"user-{query_rng.randrange(users)}",
+         query_rng.choice(TOPICS) if i % 2 else f"{query_rng.choice(TOPICS)} {query_rng.choice(WORDS)}")
+        for i in range(queries)
+    ]
+    latencies, found = [], 0
+    for user_id, query in query_list:
+        started = time.perf_counter()
+        response = await service.search_memory(app_name="adk_agent", user_id=user_id, query=query)
+        latencies.append(time.perf_counter() - started)
+        found += len(response.memories)
+    latencies.sort()
+
+    print(f"\n📊 {mode}: {events} eventos, {users} usuarios")
+    print(f"   ingesta {ingest:6.2f} s ({events / ingest:,.0f} eventos/s)   "
+          f"RSS {baseline:.0f} -> {loaded_rss:.0f} MB (+{loaded_rss - baseline:.0f} MB)")
+    print(f"   búsqueda: mediana {statistics.median(latencies) * 1000:7.2f} ms   "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.2f} ms   "
+          f"({found / len(query_list):.1f} resultados por consulta)")
+
+    if mode == "sqlite":
+        await service.close()
+        reopened = SQLiteMemoryService(db_path)
+        response = await reopened.search_memory(app_name="adk_agent", user_id=query_list[0][0], query=query_list[0][1])
+        print(f"   tras reabrir: {reopened.get_stats()['events']} eventos, "
+              f"{len(response.memories)} resultados para la primera consulta; "
+              f"fichero {os.path.getsize(db_path) / (1024 * 1024):.0f} MB")
+        await reopened.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="InMemoryMemoryService frente a SQLiteMemoryService")
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--mode", choices=["inmemory", "sqlite"], help="(interno) medir un solo servicio")
+    args = parser.parse_args()
+
+    if args.mode:
+        logging.basicConfig(level=logging.ERROR)
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(measure(args.mode, args.events, args.users, args.queries, os.path.join(tmp, "memory.db")))
+        return
+
+    for mode in ("inmemory", "sqlite"):
+        subprocess.run([sys.executable, __file__, "--mode", mode, "--events", str(args.events),
+                        "--users", str(args.users), "--queries", str(args.queries)], check=True)
+
+
+if __name__ == "__main__":
+    main()
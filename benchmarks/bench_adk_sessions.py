@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Prueba de resistencia de las sesiones del ADK Agent: RSS con miles de usuarios.
+
+Ejecuta turnos reales con el Runner de ADK (LLM simulado, sin red) para
+``--users`` usuarios distintos, cada uno con su sesión, y muestra el RSS del
+proceso a medida que avanzan, con:
+
+- ``InMemorySessionService`` (el comportamiento anterior): todas las sesiones
+  se quedan en memoria,
+- ``BoundedSessionService``: como mucho ``--max-sessions`` en memoria, el
+  resto volcadas a SQLite.
+
+Cada modo se ejecuta en un proceso nuevo para que el RSS sea comparable. El
+volcado de cada sesión a InMemoryMemoryService se desactiva para medir sólo
+el servicio de sesiones. Al final se relee la sesión del primer usuario para
+comprobar que sigue completa.
+
+Uso:
+    python benchmarks/bench_adk_sessions.py --users 3000 --turns 3 --max-sessions 200
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+
+class SimulatedLlm(BaseLlm):
+    """LLM sin red: una respuesta de ``response_chars`` caracteres al instante."""
+
+    response_chars: int = 1500
+
+    async def generate_content_async(self, llm_request, stream=False):
+        text = ("Respuesta simulada del modelo. " * (self.response_chars // 31 + 1))[:self.response_chars]
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+def rss_mb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def soak(mode, users, turns, max_sessions, db_path):
+    from google.adk import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    from multi_tool_agent.agents.adk_agent import ADKAgent
+
+    os.environ["ADK_SESSION_DB"] = db_path
+    os.environ["ADK_SESSION_MAX_SESSIONS"] = str(max_sessions)
+    agent = ADKAgent()
+    agent.llm_agent.model = SimulatedLlm(model="simulado")
+    if mode == "inmemory":
+        agent.session_service = InMemorySessionService()
+        agent.runner = Runner(agent=agent.llm_agent, app_name="adk_agent",
+                              session_service=agent.session_service, memory_service=agent.memory_service)
+
+    async def skip_memory(user_id, session_id):
+        return None
+    agent._add_session_to_memory = skip_memory
+
+    first_session = None
+    started = time.perf_counter()
+    checkpoints = max(1, users // 5)
+    print(f"\n📊 {mode}: {users} usuarios x {turns} turnos (RSS inicial {rss_mb():.0f} MB)")
+    for user in range(users):
+        session_id = None
+        for turn in range(turns):
+            _, session_id = await agent.run(f"user-{user}", f"Mensaje {turn} del usuario {user}", session_id)
+        first_session = first_session or session_id
+        if (user + 1) % checkpoints == 0:
+            print(f"   {user + 1:>6} usuarios   RSS {rss_mb():7.1f} MB")
+    elapsed = time.perf_counter() - started
+
+    session = await agent.session_service.get_session(app_name="adk_agent", user_id="user-0",
+                                                      session_id=first_session)
+    print(f"   {elapsed / (users * turns) * 1000:.2f} ms por turno; "
+          f"sesión del primer usuario: {len(session.events)} eventos")
+    if hasattr(agent.session_service, "get_stats"):
+        print(f"   {agent.session_service.get_stats()}")
+        await agent.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSS de las sesiones del ADK Agent con miles de usuarios")
+    parser.add_argument("--users", type=int, default=3000)
+    parser.add_argument("--turns", type=int, default=3, help="Turnos por usuario")
+    parser.add_argument("--max-sessions", type=int, default=200, help="Límite de BoundedSessionService")
+    parser.add_argument("--mode", choices=["inmemory", "bounded"], help="(interno) ejecutar un solo modo")
+    args = parser.parse_args()
+
+    if args.mode:
+        # El listener de logging escribiría miles de líneas: sólo errores
+        import logging
+        logging.basicConfig(level=logging.ERROR)
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(soak(args.mode, args.users, args.turns, args.max_sessions,
+                             os.path.join(tmp, "sessions.db")))
+        return
+
+    for mode in ("inmemory", "bounded"):
+        subprocess.run([sys.executable, __file__, "--mode", mode, "--users", str(args.users),
+                        "--turns", str(args.turns), "--max-sessions", str(args.max_sessions)], check=True)
+
+
+if __name__ == "__main__":
+    main()
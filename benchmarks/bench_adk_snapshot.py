@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Reinicio en caliente del ADK Agent con 10k sesiones: tamaño en disco y tiempo de restauración.
+
+Con ``--sessions`` sesiones (una por usuario, ``--turns`` turnos de usuario y
+modelo cada una) mide:
+
+- memoria (``SnapshotMemoryService``, ADK_MEMORY_SERVICE=memory): tamaño de la
+  instantánea, tiempo de escritura y la mayor pausa del event loop mientras
+  se escribe (un temporizador de 5 ms mide cuánto se retrasa); al reiniciar,
+  tiempo hasta poder atender (sólo el índice), primera búsqueda de un usuario
+  (carga su bloque) y, como referencia, cargarlo todo,
+- sesiones (``BoundedSessionService``): punto de control con todas las
+  sesiones modificadas, tamaño del fichero SQLite y, al reiniciar, tiempo de
+  arranque y de la primera ``get_session`` (carga perezosa).
+
+Uso:
+    python benchmarks/bench_adk_snapshot.py --sessions 10000 --turns 2
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from google.adk.events import Event
+from google.genai import types
+
+from multi_tool_agent.storage import BoundedSessionService, SnapshotMemoryService
+
+
+def make_events(user, turns):
+    events = []
+    for turn in range(turns):
+        events.append(Event(author="user", invocation_id=f"{user}-{turn}", content=types.Content(
+            role="user", parts=[types.Part(text=f"Hola, soy el usuario {user}; hoy quiero hablar del tema {turn}")])))
+        events.append(Event(author="adk_agent", invocation_id=f"{user}-{turn}", content=types.Content(
+            role="model", parts=[types.Part(text=f"Perfecto, usuario {user}. Recordaré que te interesa el tema "
+                                                 f"{turn} y lo que me has contado hasta ahora.")])))
+    return events
+
+
+async def max_loop_stall(coro):
+    """Ejecutar ``coro`` y devolver (resultado, mayor retraso de un temporizador de 5 ms)."""
+    stalls = []
+
+    async def ticker():
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append(time.perf_counter() - started - 0.005)
+
+    # Sin basura pendiente de otras fases: una recolección completa no es la escritura
+    gc.collect()
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.02)
+    result = await coro
+    tick.cancel()
+    return result, max(stalls) if stalls else 0.0
+
+
+async def bench_memory(tmp, sessions, turns):
+    path = os.path.join(tmp, "memory.snapshot")
+    service = SnapshotMemoryService(path)
+    for user in range(sessions):
+        await service.add_events_to_memory(app_name="adk_agent", user_id=f"user-{user}", session_id=f"s-{user}",
+                                           events=make_events(user, turns))
+
+    started = time.perf_counter()
+    size, stall = await max_loop_stall(service.snapshot())
+    written = time.perf_counter() - started
+
+    started = time.perf_counter()
+    restored = SnapshotMemoryService(path)
+    restore = time.perf_counter() - started
+
+    first_search = []
+    for user in range(0, sessions, max(1, sessions // 50)):
+        started = time.perf_counter()
+        response = await restored.search_memory(app_name="adk_agent", user_id=f"user-{user}", query="tema")
+        first_search.append(time.perf_counter() - started)
+    found = len(response.memories)
+
+    started = time.perf_counter()
+    for user_key in list(restored._unloaded):
+        restored._hydrate(user_key)
+    eager = time.perf_counter() - started
+
+    print(f"\n📊 Memoria (SnapshotMemoryService): {sessions} sesiones, {sessions * turns * 2} eventos")
+    print(f"   instantánea {size / (1024 * 1024):.1f} MB ({size / (sessions * turns * 2):.0f} B/evento), "
+          f"escrita en {written:.2f} s; mayor pausa del event loop {stall * 1000:.1f} ms")
+    print(f"   reinicio: índice en {restore * 1000:.1f} ms; primera búsqueda de un usuario "
+          f"{statistics.median(first_search) * 1000:.2f} ms (mediana, {found} resultados); "
+          f"cargar todos los usuarios {eager:.2f} s")
+
+
+async def bench_sessions(tmp, sessions, turns):
+    path = os.path.join(tmp, "sessions.db")
+    service = BoundedSessionService(path, max_sessions=sessions, max_memory_mb=1024)
+    ids = []
+    for user in range(sessions):
+        session = await service.create_session(app_name="adk_agent", user_id=f"user-{user}")
+        for event in make_events(user, turns):
+            await service.append_event(session, event)
+        ids.append(session.id)
+
+    started = time.perf_counter()
+    _, stall = await max_loop_stall(service.flush())
+    flushed = time.perf_counter() - started
+    await service.close()
+
+    started = time.perf_counter()
+    restored = BoundedSessionService(path, max_sessions=sessions)
+    startup = time.perf_counter() - started
+    first_get = []
+    for user in range(0, sessions, max(1, sessions // 50)):
+        started = time.perf_counter()
+        session = await restored.get_session(app_name="adk_agent", user_id=f"user-{user}", session_id=ids[user])
+        first_get.append(time.perf_counter() - started)
+    await restored.close()
+
+    print(f"\n📊 Sesiones (BoundedSessionService): {sessions} sesiones")
+    print(f"   punto de control {flushed:.2f} s; mayor pausa del event loop {stall * 1000:.1f} ms; "
+          f"fichero {os.path.getsize(path) / (1024 * 1024):.1f} MB")
+    print(f"   reinicio: arranque {startup * 1000:.1f} ms; primera get_session "
+          f"{statistics.median(first_get) * 1000:.2f} ms (mediana, {len(session.events)} eventos)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Instantáneas y restauración del ADK Agent")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=2, help="Turnos por sesión")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        await bench_memory(tmp, args.sessions, args.turns)
+        await bench_sessions(tmp, args.sessions, args.turns)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
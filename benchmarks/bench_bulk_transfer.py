@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Exportación e importación NDJSON de millones de filas con memoria acotada.
+
+Siembra ``conversation_log`` (más memorias y contexto semántico) en una base
+de datos temporal, exporta todo a un fichero, lo importa en otra base de
+datos vacía y comprueba que los recuentos coinciden. Muestra filas/s de cada
+fase y el pico de memoria del proceso (ru_maxrss), que debe quedarse plano
+aunque crezca el número de filas.
+
+Uso:
+    python benchmarks/bench_bulk_transfer.py --rows 1000000
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+# Las páginas del fichero leídas por mmap cuentan en ru_maxrss aunque no sean
+# memoria del proceso: sin mmap el pico refleja sólo la caché de SQLite y Python
+os.environ.setdefault("SQLITE_MMAP_SIZE_MB", "0")
+
+from multi_tool_agent.storage import DatabaseMemorySystem, NDJSONImporter, export_ndjson
+from multi_tool_agent.storage.write_behind import TurnRecord
+
+
+def peak_rss_mb():
+    # ru_maxrss está en KiB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed(memory_system, rows, users, batch=20000):
+    """Filas de conversación en lotes, más una memoria y un contexto semántico por cada 10 mensajes."""
+    for start in range(0, rows, batch):
+        records = []
+        for i in range(start, min(start + batch, rows)):
+            user_id = f"user{i % users}"
+            record = TurnRecord(user_id, f"{user_id}-s", messages=[("user", f"Mensaje {i} sobre recetas y viajes")])
+            if i % 10 == 0:
+                record.memories = [(f"dato{i % 20}", f"valor {i}")]
+                record.semantic = [("conversation", f"Usuario: mensaje {i} sobre recetas y viajes", 1.0)]
+            records.append(record)
+        memory_system.save_turns(records)
+
+
+def counts(memory_system):
+    stats = memory_system.get_storage_stats()
+    return {table: stats[table] for table in ("user_memories", "conversation_log", "semantic_context")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput y memoria de la exportación/importación NDJSON")
+    parser.add_argument("--rows", type=int, default=1000000, help="Mensajes de conversation_log")
+    parser.add_argument("--users", type=int, default=5000, help="Usuarios distintos")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Filas por transacción al importar")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = DatabaseMemorySystem(os.path.join(tmp, "source.db"), max_memories_per_user=0)
+        started = time.perf_counter()
+        seed(source, args.rows, args.users)
+        print(f"\n🌱 Sembradas {args.rows} filas en {time.perf_counter() - started:.1f} s "
+              f"(pico de memoria {peak_rss_mb():.0f} MB)")
+
+        path = os.path.join(tmp, "export.ndjson")
+        started = time.perf_counter()
+        exported = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for line in export_ndjson(source, chunk_size=2000):
+                f.write(line)
+                exported += 1
+        elapsed = time.perf_counter() - started
+        print(f"📤 Exportación: {exported - 1} filas en {elapsed:.1f} s ({(exported - 1) / elapsed:,.0f} filas/s), "
+              f"{os.path.getsize(path) / 1e6:.0f} MB, pico de memoria {peak_rss_mb():.0f} MB")
+
+        target = DatabaseMemorySystem(os.path.join(tmp, "target.db"))
+        started = time.perf_counter()
+        importer = NDJSONImporter(target, "bench", batch_size=args.batch_size)
+        with open(path, "r", encoding="utf-8") as f:
+            importer.add_lines(f)
+        stats = importer.finish()
+        elapsed = time.perf_counter() - started
+        imported = sum(stats["imported"].values())
+        print(f"📥 Importación: {imported} filas en {elapsed:.1f} s ({imported / elapsed:,.0f} filas/s), "
+              f"pico de memoria {peak_rss_mb():.0f} MB")
+
+        expected, actual = counts(source), counts(target)
+        source.close()
+        target.close()
+        if expected != actual:
+            raise SystemExit(f"❌ Recuentos distintos: {expected} != {actual}")
+        print(f"✅ Recuentos iguales: {actual}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark de throughput del Database Agent con un modelo simulado.
+
+El modelo falso tarda ``--latency`` segundos en responder sin usar la red. Con
+el Runner síncrono cada chat bloquea el event loop durante toda la llamada, así
+que N chats tardan ~N x latencia; con ``run_async`` las llamadas se solapan.
+
+Uso:
+    python benchmarks/bench_concurrent_chats.py --chats 10 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM real
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from google.adk.models import BaseLlm, LlmResponse
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from multi_tool_agent.agents.database_agent import DatabaseAgent
+
+
+class FakeLlm(BaseLlm):
+    """Modelo que responde tras una espera fija, sin red."""
+
+    latency: float = 0.5
+
+    @classmethod
+    def supported_models(cls):
+        return [r"fake-.*"]
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        await asyncio.sleep(self.latency)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="Respuesta simulada")]))
+
+
+async def run_blocking(agent, user_id, session_id, message):
+    """Patrón anterior: iterar el generador síncrono runner.run dentro de la corrutina."""
+    await agent.session_service.create_session(app_name="database_agent", user_id=user_id, session_id=session_id)
+    content = types.Content(role="user", parts=[types.Part(text=message)])
+    for event in agent.runner.run(user_id=user_id, session_id=session_id, new_message=content):
+        if event.is_final_response():
+            break
+
+
+async def measure(name, chats, make_chat):
+    started = time.perf_counter()
+    await asyncio.gather(*(make_chat(i) for i in range(chats)))
+    elapsed = time.perf_counter() - started
+    print(f"{name:<26} {chats} chats en {elapsed:6.2f} s  ({chats / elapsed:5.2f} chats/s)")
+    return elapsed
+
+
+async def main_async(args):
+    agent = DatabaseAgent()
+    if agent.runner is None:
+        raise SystemExit("❌ No se pudo configurar el Runner de ADK")
+    agent.llm_agent.model = FakeLlm(model="fake-llm", latency=args.latency)
+    # Se mide el solapamiento de las llamadas al modelo, no el almacén de sesiones de ADK
+    # (runner.run usa su propio hilo y event loop, incompatible con un driver SQLite asíncrono)
+    agent.session_service = agent.runner.session_service = InMemorySessionService()
+
+    print(f"\n📊 {args.chats} chats concurrentes, latencia del modelo {args.latency}s\n")
+    before = await measure(
+        "Antes (runner.run)", args.chats,
+        lambda i: run_blocking(agent, f"sync_user{i}", f"sync_session{i}", "hola"),
+    )
+    after = await measure(
+        "Después (runner.run_async)", args.chats,
+        lambda i: agent.run(f"async_user{i}", "hola", f"async_session{i}"),
+    )
+    print(f"\n⚡ Solapamiento: {before / after:.1f}x más throughput "
+          f"(ideal {args.chats}x, serie = {args.chats * args.latency:.1f} s)")
+
+    await agent.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput de chats concurrentes con modelo simulado")
+    parser.add_argument("--chats", type=int, default=10, help="Chats concurrentes")
+    parser.add_argument("--latency", type=float, default=0.5, help="Latencia simulada del modelo (s)")
+    args = parser.parse_args()
+
+    # Las bases de datos del agente usan rutas relativas: trabajar en un directorio temporal
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
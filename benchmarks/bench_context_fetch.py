@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Lecturas de contexto en serie frente a concurrentes, con latencia de red.
+
+Mide ``DatabaseAgent._prepare_memory_context`` (memorias, historial y
+búsqueda semántica a la vez, cada una con su tiempo máximo) frente a las tres
+lecturas una detrás de otra, sobre un almacén SQLite al que se añade un
+retardo por llamada que simula la ida y vuelta a un almacén remoto. Con
+``--postgres-dsn`` usa PostgreSQL real sin retardo añadido. Por último,
+comprueba que una búsqueda semántica lenta se omite al agotar su tiempo
+máximo en lugar de retrasar el turno.
+
+Uso:
+    python benchmarks/bench_context_fetch.py --rtt-ms 5 --turns 200
+    python benchmarks/bench_context_fetch.py --postgres-dsn postgresql://localhost/memoria
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+# Sin caché de contexto: cada turno va a la base de datos
+os.environ["CONTEXT_CACHE_BACKEND"] = "off"
+
+from multi_tool_agent.agents.database_agent import DatabaseAgent
+from multi_tool_agent.storage import create_memory_store
+from multi_tool_agent.storage.write_behind import TurnRecord
+
+
+class DelayedStore:
+    """Envuelve un MemoryStore y añade un retardo fijo a cada lectura."""
+
+    def __init__(self, store, delay_seconds: float, semantic_delay_seconds: float = 0.0):
+        self.store = store
+        self.delay_seconds = delay_seconds
+        self.semantic_delay_seconds = semantic_delay_seconds
+
+    async def get_memories(self, user_id):
+        await asyncio.sleep(self.delay_seconds)
+        return await self.store.get_memories(user_id)
+
+    async def get_conversation_history(self, user_id, limit=10):
+        await asyncio.sleep(self.delay_seconds)
+        return await self.store.get_conversation_history(user_id, limit)
+
+    async def search_semantic_context(self, user_id, query, limit=5):
+        await asyncio.sleep(self.delay_seconds + self.semantic_delay_seconds)
+        return await self.store.search_semantic_context(user_id, query, limit)
+
+
+async def serial_lookups(store, user_id, message):
+    """Comportamiento anterior: una lectura detrás de otra."""
+    await store.get_memories(user_id)
+    await store.get_conversation_history(user_id, limit=5)
+    await store.search_semantic_context(user_id, message)
+
+
+async def seed(store, user_id, turns=200):
+    await store.save_turns([
+        TurnRecord(user_id, "bench", messages=[("user", f"Mensaje {i} sobre viajes a Japón"), ("agent", "Respuesta")],
+                   memories=[(f"dato{i % 10}", f"valor {i}")],
+                   semantic=[("user_message", f"Mensaje {i} sobre viajes a Japón en primavera", 1.0)])
+        for i in range(turns)
+    ])
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return (f"mediana {statistics.median(samples) * 1000:7.2f} ms   "
+            f"p95 {samples[int(len(samples) * 0.95) - 1] * 1000:7.2f} ms")
+
+
+async def compare(agent, store, turns, label):
+    user_id, message = "bench-user", "¿Qué viaje a Japón me recomiendas?"
+    serial, concurrent = [], []
+    for _ in range(turns):
+        started = time.perf_counter()
+        await serial_lookups(store, user_id, message)
+        serial.append(time.perf_counter() - started)
+
+        # Sin el ensamblado del prompt, que la versión en serie no incluye
+        timings = {}
+        started = time.perf_counter()
+        await agent._prepare_memory_context(user_id, message, timings)
+        concurrent.append(time.perf_counter() - started - timings["build"][0])
+
+    print(f"\n🗄️ {label}")
+    print(f"   en serie      {summary(serial)}")
+    print(f"   concurrentes  {summary(concurrent)}  ({statistics.median(serial) / statistics.median(concurrent):.2f}x)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Lecturas de contexto en serie frente a concurrentes")
+    parser.add_argument("--turns", type=int, default=200, help="Turnos medidos")
+    parser.add_argument("--rtt-ms", type=float, default=5.0, help="Retardo añadido a cada lectura (almacén remoto)")
+    parser.add_argument("--postgres-dsn", default=os.getenv("MEMORY_STORE_POSTGRES_DSN"))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_AGENT_DB_PATH"] = os.path.join(tmp, "bench.db")
+        agent = DatabaseAgent()
+        sqlite_store = agent.memory
+        await seed(sqlite_store, "bench-user")
+
+        try:
+            agent.memory = sqlite_store
+            await compare(agent, sqlite_store, args.turns, "sqlite local")
+
+            agent.memory = DelayedStore(sqlite_store, args.rtt_ms / 1000)
+            await compare(agent, agent.memory, args.turns, f"sqlite + {args.rtt_ms:g} ms por lectura")
+
+            if args.postgres_dsn:
+                postgres = create_memory_store("postgres", dsn=args.postgres_dsn)
+                await seed(postgres, "bench-user")
+                agent.memory = postgres
+                await compare(agent, postgres, args.turns, "postgres")
+                await postgres.close()
+
+            # Búsqueda semántica más lenta que su tiempo máximo: el turno no la espera
+            timeout = agent.lookup_timeouts["semantic"]
+            agent.memory = DelayedStore(sqlite_store, 0, semantic_delay_seconds=timeout * 4)
+            timings = {}
+            started = time.perf_counter()
+            await agent._prepare_memory_context("bench-user", "viajes a Japón", timings)
+            elapsed = time.perf_counter() - started
+            outcome = timings["semantic"][1]
+            print(f"\n⏳ Búsqueda semántica de {timeout * 4000:.0f} ms con límite {timeout * 1000:.0f} ms: "
+                  f"turno listo en {elapsed * 1000:.0f} ms (semantic={outcome})")
+            if outcome != "timeout" or elapsed > timeout * 2:
+                raise SystemExit("❌ La búsqueda lenta no se omitió")
+            # Dejar que la lectura abandonada termine antes de cerrar
+            await asyncio.sleep(timeout * 4)
+            print(f"📊 Etapas acumuladas: {agent.stage_timings.get_stats()}")
+        finally:
+            agent.memory = sqlite_store
+            await agent.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
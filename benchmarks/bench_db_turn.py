@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark del tiempo de base de datos por turno de /chat en el Database Agent.
+
+Compara el patrón anterior (una conexión sqlite3 nueva y un commit por operación,
+journal por defecto) con DatabaseMemorySystem usando conexiones persistentes en WAL.
+
+Uso:
+    python benchmarks/bench_db_turn.py --turns 500 --seed-turns 200
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from multi_tool_agent.storage import DatabaseMemorySystem
+
+
+class LegacyMemorySystem:
+    """Reproduce el acceso anterior: abrir, ejecutar, confirmar y cerrar en cada llamada."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def _execute(self, sql, params, fetch=False):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.execute(sql, params)
+        rows = cursor.fetchall() if fetch else None
+        conn.commit()
+        conn.close()
+        return rows
+
+    def get_memories(self, user_id):
+        return self._execute("SELECT DISTINCT key, value, timestamp FROM user_memories "
+                             "WHERE user_id = ? ORDER BY timestamp DESC", (user_id,), fetch=True)
+
+    def get_conversation_history(self, user_id, limit=10):
+        return self._execute("SELECT role, content, timestamp FROM conversation_log "
+                             "WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?", (user_id, limit), fetch=True)
+
+    def search_semantic_context(self, user_id, query):
+        terms = query.lower().split()
+        where = " AND ".join("content LIKE ?" for _ in terms)
+        return self._execute(f"SELECT content, relevance_score, timestamp FROM semantic_context "
+                             f"WHERE user_id = ? AND ({where}) ORDER BY relevance_score DESC, timestamp DESC LIMIT 5",
+                             [user_id] + [f"%{t}%" for t in terms], fetch=True)
+
+    def log_conversation(self, user_id, session_id, role, content):
+        self._execute("INSERT INTO conversation_log (user_id, session_id, role, content, timestamp) "
+                      "VALUES (?, ?, ?, ?, datetime('now'))", (user_id, session_id, role, content))
+
+    def save_memory(self, user_id, session_id, key, value):
+        self._execute("INSERT OR REPLACE INTO user_memories (user_id, session_id, key, value, timestamp) "
+                      "VALUES (?, ?, ?, ?, datetime('now'))", (user_id, session_id, key, value))
+
+    def save_semantic_context(self, user_id, session_id, context_type, content, relevance_score=1.0):
+        self._execute("INSERT INTO semantic_context (user_id, session_id, context_type, content, relevance_score) "
+                      "VALUES (?, ?, ?, ?, ?)", (user_id, session_id, context_type, content, relevance_score))
+
+
+def run_turn(system, user_id, session_id, turn):
+    """Las lecturas y escrituras que hace DatabaseAgent en un turno de chat."""
+    message = f"me llamo usuario{turn % 7} y me gusta el cafe numero {turn}"
+    response = f"Encantado usuario{turn % 7}, tomo nota de tu cafe favorito {turn}."
+
+    system.get_memories(user_id)
+    system.get_conversation_history(user_id, limit=5)
+    system.search_semantic_context(user_id, message)
+
+    system.log_conversation(user_id, session_id, "user", message)
+    system.log_conversation(user_id, session_id, "agent", response)
+    system.save_memory(user_id, session_id, "nombre", f"Usuario{turn % 7}")
+    system.save_semantic_context(user_id, session_id, "user_message", message, 1.0)
+    system.save_semantic_context(user_id, session_id, "agent_response", response, 0.8)
+
+
+def measure(name, system, turns, seed_turns):
+    for turn in range(seed_turns):
+        run_turn(system, "seed_user", "seed_session", turn)
+
+    timings = []
+    for turn in range(turns):
+        started = time.perf_counter()
+        run_turn(system, "bench_user", "bench_session", turn)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:<28} media={statistics.mean(timings):7.3f} ms  p50={statistics.median(timings):7.3f} ms  "
+          f"p95={p95:7.3f} ms")
+    return statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de base de datos por turno (antes/después)")
+    parser.add_argument("--turns", type=int, default=300, help="Turnos medidos")
+    parser.add_argument("--seed-turns", type=int, default=200, help="Turnos previos para poblar la base de datos")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        # Crear el esquema y volver al journal por defecto del código anterior
+        DatabaseMemorySystem(legacy_path).close()
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+
+        print(f"\n📊 {args.turns} turnos medidos, {args.seed_turns} turnos previos\n")
+        before = measure("Antes (conexión por llamada)", LegacyMemorySystem(legacy_path), args.turns, args.seed_turns)
+
+        system = DatabaseMemorySystem(os.path.join(tmp, "pooled.db"))
+        after = measure("Después (pool + WAL)", system, args.turns, args.seed_turns)
+        system.close()
+
+        print(f"\n⚡ Mejora: {before / after:.1f}x menos tiempo de base de datos por turno")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Prueba de concurrencia: latencia de /health mientras hay carga de /chat.
+
+Un sondeo periódico mide cuánto tarda el event loop en atender una petición
+trivial (lo que vería /health) mientras varias corrutinas hacen las lecturas
+de memoria de un turno, incluida una consulta lenta (búsqueda LIKE sin índice).
+Se compara la llamada bloqueante directa con SQLiteMemoryStore.
+
+Uso:
+    python benchmarks/bench_health_under_load.py --rows 200000 --chats 8 --seconds 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from multi_tool_agent.storage import DatabaseMemorySystem, SQLiteMemoryStore
+
+PROBE_INTERVAL = 0.02
+
+
+def seed(memory_system, rows):
+    """Poblar semantic_context para que la búsqueda sin índice sea lenta."""
+    with memory_system.db.write() as conn:
+        conn.executemany(
+            "INSERT INTO semantic_context (user_id, session_id, context_type, content, relevance_score) "
+            "VALUES (?, ?, ?, ?, ?)",
+            ((f"user{i % 8}", "seed", "user_message", f"mensaje de prueba numero {i} sobre viajes y comida", 1.0)
+             for i in range(rows)),
+        )
+
+
+async def health_probe(stop, latencies):
+    """Sondeo tipo /health: el retraso sobre el intervalo es espera en el event loop."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        latencies.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+
+async def chat_load(stop, memory_system, memory, user_id, counter):
+    """Lecturas de un turno de chat, bloqueantes (memory=None) o asíncronas."""
+    while not stop.is_set():
+        if memory is None:
+            memory_system.get_memories(user_id)
+            memory_system.get_conversation_history(user_id, 5)
+            memory_system._search_semantic_context_like(user_id, "viajes comida baratos")
+            await asyncio.sleep(0)
+        else:
+            await memory.get_memories(user_id)
+            await memory.get_conversation_history(user_id, 5)
+            await memory.run(memory_system._search_semantic_context_like, user_id, "viajes comida baratos")
+        counter[0] += 1
+
+
+async def scenario(name, memory_system, memory, chats, seconds):
+    stop = asyncio.Event()
+    latencies = []
+    counter = [0]
+    tasks = [asyncio.create_task(health_probe(stop, latencies))]
+    tasks += [asyncio.create_task(chat_load(stop, memory_system, memory, f"user{i % 8}", counter))
+              for i in range(chats)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<34} /health p50={statistics.median(latencies):7.2f} ms  p95={p95:7.2f} ms  "
+          f"max={latencies[-1]:7.2f} ms  | turnos de chat={counter[0]}")
+
+
+async def main_async(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        memory_system = DatabaseMemorySystem(os.path.join(tmp, "load.db"))
+        seed(memory_system, args.rows)
+        memory = SQLiteMemoryStore(memory_system)
+
+        print(f"\n📊 {args.rows} filas, {args.chats} chats concurrentes, {args.seconds}s por escenario\n")
+        await scenario("Sin carga", memory_system, memory, 0, args.seconds)
+        await scenario("Carga con sqlite3 bloqueante", memory_system, None, args.chats, args.seconds)
+        await scenario("Carga con SQLiteMemoryStore", memory_system, memory, args.chats, args.seconds)
+
+        await memory.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de /health bajo carga de /chat")
+    parser.add_argument("--rows", type=int, default=200000, help="Filas de semantic_context")
+    parser.add_argument("--chats", type=int, default=8, help="Chats concurrentes")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duración de cada escenario")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
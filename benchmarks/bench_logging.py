@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Coste por línea en el hilo del event loop: print() frente al logging en cola.
+
+Reproduce las líneas por evento del procesado de respuestas y mide, en el
+hilo que registra, la mediana por línea y la peor espera de una sola línea:
+
+- ``print`` a stdout (el comportamiento anterior),
+- ``logger.debug`` con el nivel en INFO (la línea se descarta sin formatear),
+- ``logger.debug`` con DEBUG activo y muestreo 1 de cada N,
+- ``logger.info`` en JSON a través de la cola (el formateo y la escritura
+  ocurren en el hilo del listener).
+
+Se repite con stdout en un fichero y en una tubería que se lee despacio
+(``--pipe-kbps``, como un terminal o un recolector de logs saturado): ahí
+print se bloquea en cuanto se llena el buffer de la tubería, mientras que la
+cola sólo descarta registros.
+
+Uso:
+    python benchmarks/bench_logging.py --lines 20000 --pipe-kbps 200
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from multi_tool_agent.logging_setup import configure_logging, get_logging_stats, shutdown_logging
+
+SLOW_READER = """
+import sys, time
+rate = float(sys.argv[1]) * 1024
+while True:
+    chunk = sys.stdin.buffer.read1(4096)
+    if not chunk:
+        break
+    time.sleep(len(chunk) / rate)
+"""
+
+
+def measure(emit, lines):
+    """(mediana en µs por línea, peor línea en ms, total en ms) en el hilo que registra."""
+    samples = []
+    for i in range(lines):
+        started = time.perf_counter()
+        emit(i)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1e6, max(samples) * 1e3, sum(samples) * 1e3
+
+
+def run(sink_name, open_sink, lines, sample_every):
+    original_stdout = sys.stdout
+    sys.stdout, close_sink = open_sink()
+    # El listener escribe en sys.stdout: también al destino medido
+    configure_logging(level="INFO", fmt="json", debug_sample_every=sample_every, queue_size=10000)
+    logger = logging.getLogger("multi_tool_agent.agents.database_agent")
+    text = "Respuesta de ejemplo del modelo " * 4
+    results = {}
+    try:
+        results["print"] = measure(lambda i: print(f"📝 [DATABASE AGENT] Parte {i}: {text[:100]}..."), lines)
+        results["debug desactivado"] = measure(lambda i: logger.debug("📝 Parte %s: %s...", i, text[:100]), lines)
+        logger.setLevel(logging.DEBUG)
+        results[f"debug 1/{sample_every}"] = measure(lambda i: logger.debug("📝 Parte %s: %s...", i, text[:100]), lines)
+        logger.setLevel(logging.NOTSET)
+        results["info en cola (json)"] = measure(
+            lambda i: logger.info("⏱️  Etapas: %s", i, extra={"user_id": "u", "stages_ms": {"llm": 1.0}}), lines
+        )
+        stats = get_logging_stats()
+    finally:
+        sys.stdout = original_stdout
+        # Sin esperar a la tubería lenta: lo que quede en la cola se descarta
+        close_sink()
+        logging.raiseExceptions = False
+        shutdown_logging()
+    print(f"\n📊 stdout -> {sink_name} ({lines} líneas por caso)")
+    for name, (median_us, worst_ms, total_ms) in results.items():
+        print(f"   {name:<22} mediana {median_us:7.2f} µs   peor {worst_ms:8.2f} ms   total {total_ms:9.1f} ms")
+    print(f"   cola: {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coste de print() frente al logging en cola")
+    parser.add_argument("--lines", type=int, default=20000, help="Líneas por caso")
+    parser.add_argument("--sample-every", type=int, default=10, help="Muestreo de DEBUG")
+    parser.add_argument("--pipe-kbps", type=float, default=200, help="Velocidad de lectura de la tubería lenta")
+    parser.add_argument("--sink", default="both", choices=["file", "pipe", "both"])
+    args = parser.parse_args()
+
+    if args.sink in ("file", "both"):
+        def open_file():
+            sink = open(os.path.join(tempfile.mkdtemp(), "stdout.log"), "w", buffering=1, encoding="utf-8")
+            return sink, sink.close
+        run("fichero", open_file, args.lines, args.sample_every)
+
+    if args.sink in ("pipe", "both"):
+        def open_pipe():
+            reader = subprocess.Popen([sys.executable, "-c", SLOW_READER, str(args.pipe_kbps)], stdin=subprocess.PIPE)
+            sink = open(reader.stdin.fileno(), "w", buffering=1, encoding="utf-8", closefd=False)
+
+            def close():
+                reader.kill()
+                reader.wait()
+            return sink, close
+        run(f"tubería a {args.pipe_kbps:g} KB/s", open_pipe, args.lines, args.sample_every)
+
+
+if __name__ == "__main__":
+    main()
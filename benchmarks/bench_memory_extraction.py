@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de la extracción de memorias personales.
+
+Compara la extracción anterior (import y expresiones regulares construidas en
+cada mensaje, una búsqueda por palabra clave) con ``RuleEngine`` (reglas
+compiladas una vez y probadas sólo donde aparece su disparador) sobre un
+corpus de mensajes de chat en español, y comprueba que ambas extraen lo mismo.
+El corpus por defecto (``chat``) compone mensajes de una a cinco frases, de los
+que sólo ``--fact-rate`` contienen un dato personal; ``frases`` usa las frases
+cortas de ``MESSAGES``, casi todas con un dato. Se mide con las reglas por
+defecto y añadiendo reglas de usuario, que en el patrón anterior serían una
+comprobación y una búsqueda más por mensaje. Las variantes se ejecutan
+alternadas ``--repeat`` veces y se toma el mejor tiempo de cada una.
+
+Uso:
+    python benchmarks/bench_memory_extraction.py --messages 200000 --user-rules 40
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from multi_tool_agent.memory import ExtractionRule, RuleEngine
+from multi_tool_agent.memory.extraction import DEFAULT_RULES
+
+# Mensajes típicos de usuarios del chat (la mayoría no contienen datos personales)
+MESSAGES = [
+    "Hola, ¿qué tal estás?",
+    "Buenos días, me llamo Lucía y necesito ayuda con una receta",
+    "¿Te acuerdas de cómo me llamo?",
+    "Tengo 34 años y quiero empezar a correr",
+    "Me gusta mucho la música clásica, sobre todo Bach",
+    "Prefiero el té al café por las mañanas",
+    "Mi color favorito es el verde",
+    "Disfruto paseando por la montaña los fines de semana",
+    "¿Puedes recomendarme un libro de ciencia ficción?",
+    "No entiendo bien la diferencia entre un préstamo y una hipoteca",
+    "Me llamo Javier, tengo 27 años y me gusta el fútbol",
+    "¿Qué tiempo va a hacer mañana en Sevilla?",
+    "Ayer fui al cine y la película fue bastante aburrida",
+    "Explícame cómo funciona la fotosíntesis",
+    "Mi hija tiene 5 años y no quiere comer verdura",
+    "Prefiero que me contestes en frases cortas",
+    "Gracias por la ayuda, hasta luego",
+    "¿Cuál es la capital de Australia?",
+    "Tengo que preparar una presentación para el lunes",
+    "Me gusta cocinar pero no tengo mucho tiempo entre semana",
+    "Estoy aprendiendo a tocar la guitarra y me cuesta el cambio de acordes",
+    "¿Cómo puedo mejorar mi currículum para un puesto de ingeniería?",
+    "Mi plato favorito es la tortilla de patatas con cebolla",
+    "Hace mucho calor hoy, ¿qué me recomiendas para dormir mejor?",
+    "Necesito ideas para el cumpleaños de mi madre, cumple 60",
+    "¿Qué diferencia hay entre Python y JavaScript?",
+    "Disfruto mucho leyendo novelas históricas",
+    "¿Me recuerdas qué te dije la última vez?",
+    "Quiero viajar a Japón en primavera, ¿qué ciudades me aconsejas?",
+    "No me gusta nada madrugar",
+    "Mi dato3 es importante: apúntalo",
+    "Te cuento que mi dato17 es azul",
+]
+
+
+# Frases para componer mensajes de longitud variable, como los de un chat real: casi
+# todo son preguntas y contexto sin datos personales
+SENTENCES = [
+    "¿Me puedes explicar cómo funciona {tema}?",
+    "Estoy intentando entender {tema} y no termino de verlo claro.",
+    "He leído un artículo sobre {tema} pero tenía muchos términos técnicos.",
+    "¿Cuál sería el primer paso si quiero aprender {tema} desde cero?",
+    "Dame un ejemplo sencillo, por favor.",
+    "Vale, eso tiene sentido, pero ¿qué pasa si los datos vienen incompletos?",
+    "En mi trabajo usamos {tema} a diario y siempre surgen dudas.",
+    "¿Podrías resumirlo en tres puntos?",
+    "Gracias, me ha servido mucho.",
+    "No estoy seguro de haberlo entendido bien.",
+    "Mañana tengo una reunión con el equipo y quiero llevarlo preparado.",
+    "¿Hay algún libro o curso que me recomiendes?",
+    "La semana pasada probé otra forma y no funcionó.",
+    "Escríbeme un correo formal para pedir un día libre el {dia}.",
+    "¿Qué opinas de {tema} comparado con la alternativa clásica?",
+    "Corrígeme este texto: «ayer fuimos al parque y estubimos jugando hasta tarde».",
+    "Necesito una lista de la compra para una semana, somos {n} en casa.",
+    "¿Cuánto tiempo se tarda en llegar de Madrid a {ciudad} en tren?",
+    "Tengo que entregar el informe antes del {dia}.",
+    "Mi jefe quiere que lo tengamos listo pronto.",
+]
+FACT_SENTENCES = [
+    "Por cierto, me llamo {nombre}.",
+    "Tengo {n} años.",
+    "Me gusta {gusto}.",
+    "Prefiero {gusto}.",
+    "Mi grupo favorito es {grupo}.",
+    "Disfruto {gusto}.",
+]
+FILL = {
+    "tema": ["la fotosíntesis", "las hipotecas", "el aprendizaje automático", "la inflación", "Python",
+             "las bases de datos", "la relatividad", "el sistema inmunitario", "la declaración de la renta"],
+    "dia": ["lunes", "martes", "miércoles", "jueves", "viernes"],
+    "ciudad": ["Sevilla", "Valencia", "Bilbao", "Zaragoza", "Málaga"],
+    "nombre": ["Lucía", "Javier", "Marta", "Andrés", "Carmen", "Diego"],
+    "gusto": ["la música clásica", "el café solo", "correr por las mañanas", "leer novelas históricas",
+              "las respuestas cortas", "viajar en tren"],
+    "grupo": ["Queen", "Vetusta Morla", "Radiohead"],
+}
+
+
+def make_message(rng, fact_rate):
+    """Mensaje de 1 a 5 frases; con probabilidad ``fact_rate`` incluye un dato personal."""
+    sentences = [rng.choice(SENTENCES) for _ in range(rng.choices([1, 2, 3, 4, 5], [35, 30, 18, 10, 7])[0])]
+    if rng.random() < fact_rate:
+        sentences.insert(rng.randrange(len(sentences) + 1), rng.choice(FACT_SENTENCES))
+    values = {key: rng.choice(options) for key, options in FILL.items()}
+    values["n"] = rng.randint(2, 80)
+    return " ".join(sentence.format(**values) for sentence in sentences)
+
+
+def legacy_extract(message: str):
+    """Extracción anterior, tal cual se hacía en DatabaseAgent."""
+    memories = []
+    message_lower = message.lower()
+
+    if "me llamo" in message_lower:
+        import re
+        match = re.search(r'me llamo (\w+)', message_lower)
+        if match:
+            memories.append(("nombre", match.group(1).capitalize()))
+
+    if "tengo" in message_lower and "años" in message_lower:
+        import re
+        match = re.search(r'tengo (\d+) años', message_lower)
+        if match:
+            memories.append(("edad", match.group(1)))
+
+    preference_keywords = ["me gusta", "prefiero", "favorito", "disfruto"]
+    for keyword in preference_keywords:
+        if keyword in message_lower:
+            import re
+            match = re.search(f'{keyword} (.+)', message_lower)
+            if match:
+                memories.append((f"preferencia_{keyword}", match.group(1).strip()))
+
+    return memories
+
+
+def make_user_rules(count):
+    """Reglas de usuario sintéticas ("mi datoN es X")."""
+    return [ExtractionRule(f"dato{i}", rf"mi dato{i} es (\w+)", f"dato{i}") for i in range(count)]
+
+
+def legacy_extract_with(rules):
+    """Patrón anterior ampliado con reglas de usuario: una comprobación y una búsqueda por regla."""
+    def extract(message):
+        memories = legacy_extract(message)
+        message_lower = message.lower()
+        for rule in rules:
+            if rule.trigger in message_lower:
+                import re
+                match = re.search(rule.pattern, message_lower)
+                if match:
+                    memories.append((rule.key, match.group(1).strip()))
+        return memories
+    return extract
+
+
+def run(extract, corpus):
+    started = time.perf_counter()
+    facts = 0
+    for message in corpus:
+        facts += len(extract(message))
+    return time.perf_counter() - started, facts
+
+
+def measure(variants, corpus, repeat):
+    """Mejor tiempo de ``repeat`` pasadas por variante, alternándolas (la máquina compartida mete mucho ruido)."""
+    timings = {name: [] for name in variants}
+    facts = {}
+    for _ in range(repeat):
+        for name, extract in variants.items():
+            elapsed, facts[name] = run(extract, corpus)
+            timings[name].append(elapsed)
+    best = {}
+    for name, elapsed in timings.items():
+        best[name] = min(elapsed)
+        print(f"{name:<24} {best[name] * 1000:9.1f} ms  ({best[name] / len(corpus) * 1e6:6.2f} µs/mensaje, {facts[name]} hechos)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de extracción de memorias por mensaje")
+    parser.add_argument("--messages", type=int, default=200000, help="Mensajes del corpus")
+    parser.add_argument("--user-rules", type=int, default=40, help="Reglas de usuario adicionales")
+    parser.add_argument("--corpus", choices=["chat", "frases"], default="chat",
+                        help="chat: mensajes de longitud variable, la mayoría sin datos personales; "
+                             "frases: las frases cortas de MESSAGES")
+    parser.add_argument("--repeat", type=int, default=3, help="Pasadas por variante (se toma la mejor)")
+    parser.add_argument("--fact-rate", type=float, default=0.1, help="(chat) mensajes con un dato personal")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    if args.corpus == "frases":
+        corpus = [rng.choice(MESSAGES) for _ in range(args.messages)]
+        print(f"\n📊 {args.messages} mensajes ({len(MESSAGES)} distintos)")
+    else:
+        corpus = [make_message(rng, args.fact_rate) for _ in range(args.messages)]
+        print(f"\n📊 {args.messages} mensajes compuestos de 1 a 5 frases "
+              f"(media {sum(map(len, corpus)) / len(corpus):.0f} caracteres, {args.fact_rate:.0%} con un dato personal)")
+
+    for user_rules in sorted({0, args.user_rules}):
+        extra = make_user_rules(user_rules)
+        legacy = legacy_extract_with(extra)
+        engine = RuleEngine(DEFAULT_RULES + extra)
+
+        mismatches = [m for m in MESSAGES + corpus[:20000] if sorted(legacy(m)) != sorted(engine.extract(m))]
+        if mismatches:
+            raise SystemExit(f"❌ Resultados distintos en: {mismatches}")
+
+        print(f"\n{len(engine.rules)} reglas ({user_rules} de usuario), mismos hechos extraídos:")
+        best = measure({"Antes (regex por mensaje)": legacy, "Después (RuleEngine)": engine.extract},
+                       corpus, args.repeat)
+        print(f"⚡ {best['Antes (regex por mensaje)'] / best['Después (RuleEngine)']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Caché de respuestas: aciertos, llamadas al modelo ahorradas y latencia.
+
+Ejecuta turnos que abren sesión (el caso cacheable: saludos y preguntas
+frecuentes al empezar una conversación) con un LLM simulado de latencia fija
+a través del Runner de ADK. ``--repeat-ratio`` de los mensajes son saludos de
+una lista corta con variaciones de mayúsculas, acentos y signos; el resto son
+mensajes únicos. Cada turno es de un usuario nuevo o de uno de ``--users``
+que vuelve, así que el contexto de memoria cambia según su historial.
+Compara la latencia de /chat con la caché activada y desactivada.
+
+Uso:
+    python benchmarks/bench_response_cache.py --turns 200 --llm-ms 300
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from multi_tool_agent.agents.database_agent import DatabaseAgent
+
+GREETINGS = ["hola", "¡Hola!", "HOLA", "¿cómo estás?", "como estas", "buenos días", "Buenos dias!", "¿qué puedes hacer?"]
+
+
+class FixedLatencyLlm(BaseLlm):
+    """LLM sin red con latencia fija; cuenta las llamadas."""
+
+    latency_seconds: float = 0.3
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.calls += 1
+        await asyncio.sleep(self.latency_seconds)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=f"Respuesta {self.calls}")]))
+
+
+def workload(turns, users, repeat_ratio, seed=7):
+    rng = random.Random(seed)
+    return [
+        (f"user{rng.randrange(users)}" if rng.random() < 0.5 else f"nuevo{i}",
+         rng.choice(GREETINGS) if rng.random() < repeat_ratio else f"Pregunta única número {i}")
+        for i in range(turns)
+    ]
+
+
+async def run_scenario(enabled, turns, llm_ms):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_AGENT_DB_PATH"] = os.path.join(tmp, "bench.db")
+        os.environ["RESPONSE_CACHE_AGENTS"] = "database" if enabled else ""
+        agent = DatabaseAgent()
+        llm = FixedLatencyLlm(model="simulado", latency_seconds=llm_ms / 1000)
+        agent.llm_agent.model = llm
+        latencies = []
+        try:
+            for user_id, message in turns:
+                started = time.perf_counter()
+                await agent.run(user_id, message)
+                latencies.append(time.perf_counter() - started)
+            stats = agent.response_cache.get_stats() if agent.response_cache else None
+        finally:
+            await agent.shutdown()
+    return latencies, llm.calls, stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Aciertos y latencia de la caché de respuestas")
+    parser.add_argument("--turns", type=int, default=200, help="Turnos (cada uno abre sesión)")
+    parser.add_argument("--users", type=int, default=20, help="Usuarios que vuelven")
+    parser.add_argument("--repeat-ratio", type=float, default=0.5, help="Fracción de saludos repetidos")
+    parser.add_argument("--llm-ms", type=float, default=300, help="Latencia simulada del modelo")
+    args = parser.parse_args()
+
+    turns = workload(args.turns, args.users, args.repeat_ratio)
+    results = {}
+    for enabled in (False, True):
+        results[enabled] = await run_scenario(enabled, turns, args.llm_ms)
+
+    print(f"\n📊 {args.turns} turnos, {args.repeat_ratio:.0%} saludos repetidos, modelo de {args.llm_ms:g} ms")
+    for enabled, (latencies, calls, stats) in results.items():
+        label = "con caché" if enabled else "sin caché"
+        print(f"   {label:<10} llamadas al modelo {calls:>4}   mediana {statistics.median(latencies) * 1000:6.1f} ms   "
+              f"media {statistics.mean(latencies) * 1000:6.1f} ms")
+    stats = results[True][2]
+    print(f"   aciertos {stats['hits']}/{stats['hits'] + stats['misses']} (hit_ratio {stats['hit_ratio']}), "
+          f"llamadas ahorradas {stats['model_calls_saved']}")
+    if results[False][1] - results[True][1] != stats["model_calls_saved"]:
+        raise SystemExit("❌ Las llamadas ahorradas no cuadran con las llamadas al modelo")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
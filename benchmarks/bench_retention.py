@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Retención por pasos frente a un borrado de golpe, con tráfico de escritura.
+
+Siembra ``conversation_log`` y ``semantic_context`` con fechas repartidas en
+los últimos ``--days`` días y aplica una política de antigüedad mientras un
+hilo escribe turnos sin parar. Compara la latencia de esas escrituras (p95 y
+máximo) con:
+
+- sin retención (referencia),
+- ``RetentionManager``: lotes archivados en gzip y borrados en transacciones
+  cortas, más incremental_vacuum por pasos,
+- borrado de golpe: un DELETE por tabla y VACUUM completo.
+
+Comprueba también que las filas archivadas coinciden con las borradas y
+muestra el tamaño del fichero antes y después.
+
+Uso:
+    python benchmarks/bench_retention.py --rows 200000 --max-age-days 90
+"""
+
+import argparse
+import gzip
+import glob
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from multi_tool_agent.storage import DatabaseMemorySystem, RetentionManager, RetentionPolicy
+from multi_tool_agent.storage.write_behind import TurnRecord
+
+
+def seed(memory_system, rows, users, days, batch=10000):
+    """Mensajes con contexto semántico; después se reparten las fechas hacia atrás."""
+    text = "Quiero ideas para viajar barato por Europa en verano con amigos y sin coche " * 3
+    for start in range(0, rows, batch):
+        records = []
+        for i in range(start, min(start + batch, rows)):
+            user_id = f"user{i % users}"
+            records.append(TurnRecord(user_id, f"{user_id}-s", messages=[("user", f"{i} {text}")],
+                                      semantic=[("user_message", f"{i} {text}", 1.0)]))
+        memory_system.save_turns(records)
+    with memory_system.db.write() as conn:
+        for table in ("conversation_log", "semantic_context"):
+            conn.execute(f"UPDATE {table} SET timestamp = datetime('now', '-' || (id % ?) || ' days')", (days,))
+    memory_system.db.checkpoint("TRUNCATE")
+
+
+def traffic(memory_system, stop, latencies):
+    """Un turno por iteración, como /chat en modo sync."""
+    i = 0
+    while not stop.is_set():
+        record = TurnRecord("live", "live-s", messages=[("user", f"Mensaje en vivo {i}")],
+                            semantic=[("user_message", f"Mensaje en vivo {i}", 1.0)])
+        started = time.perf_counter()
+        memory_system.save_turns([record])
+        latencies.append(time.perf_counter() - started)
+        i += 1
+        time.sleep(0.002)
+
+
+def with_traffic(memory_system, work):
+    latencies = []
+    stop = threading.Event()
+    writer = threading.Thread(target=traffic, args=(memory_system, stop, latencies))
+    writer.start()
+    started = time.perf_counter()
+    try:
+        work()
+    finally:
+        elapsed = time.perf_counter() - started
+        stop.set()
+        writer.join()
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0
+    return elapsed, p95, (latencies[-1] * 1000 if latencies else 0), len(latencies)
+
+
+def bulk_delete(memory_system, max_age_days):
+    with memory_system.db.write() as conn:
+        for table in ("conversation_log", "semantic_context"):
+            conn.execute(f"DELETE FROM {table} WHERE timestamp < datetime('now', ?)", (f"-{max_age_days} days",))
+    memory_system.db.vacuum()
+    memory_system.db.checkpoint("PASSIVE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de escritura durante la retención")
+    parser.add_argument("--rows", type=int, default=200000, help="Mensajes sembrados")
+    parser.add_argument("--users", type=int, default=2000, help="Usuarios distintos")
+    parser.add_argument("--days", type=int, default=365, help="Antigüedad máxima de las filas sembradas")
+    parser.add_argument("--max-age-days", type=float, default=90, help="Política de antigüedad")
+    parser.add_argument("--traffic-seconds", type=float, default=3, help="Duración de la referencia")
+    args = parser.parse_args()
+
+    policies = [RetentionPolicy("conversation_log", max_age_days=args.max_age_days),
+                RetentionPolicy("semantic_context", max_age_days=args.max_age_days)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for scenario in ("referencia", "por pasos", "de golpe"):
+            path = os.path.join(tmp, f"{scenario.replace(' ', '_')}.db")
+            memory_system = DatabaseMemorySystem(path)
+            seed(memory_system, args.rows, args.users, args.days)
+            before = memory_system.get_storage_stats()
+            size_before = os.path.getsize(path)
+
+            if scenario == "referencia":
+                work = lambda: time.sleep(args.traffic_seconds)
+            elif scenario == "por pasos":
+                manager = RetentionManager(memory_system, policies, archive="gzip")
+                work = manager.run_pass
+            else:
+                work = lambda: bulk_delete(memory_system, args.max_age_days)
+            elapsed, p95, worst, writes = with_traffic(memory_system, work)
+
+            after = memory_system.get_storage_stats()
+            deleted = sum(before[t] - after[t] for t in ("conversation_log", "semantic_context")) + writes * 2
+            results[scenario] = (elapsed, p95, worst, writes, size_before, os.path.getsize(path), deleted)
+
+            if scenario == "por pasos":
+                archived = 0
+                for archive in glob.glob(os.path.join(tmp, "*_archive", "*.ndjson.gz")):
+                    with gzip.open(archive, "rt", encoding="utf-8") as f:
+                        archived += sum(1 for line in f if '"table"' in line)
+                if archived != deleted:
+                    raise SystemExit(f"❌ Archivadas {archived} filas, borradas {deleted}")
+                print(f"✅ Archivadas en gzip las {archived} filas borradas")
+            memory_system.close()
+
+    print(f"\n📊 {args.rows} mensajes (x2 con semantic_context), política de {args.max_age_days:g} días, "
+          f"{os.cpu_count()} CPU")
+    for scenario, (elapsed, p95, worst, writes, size_before, size_after, deleted) in results.items():
+        print(f"   {scenario:<10} {elapsed:6.1f} s  {deleted:>8} filas borradas  "
+              f"escrituras: {writes:>5}, p95 {p95:7.1f} ms, máx {worst:7.1f} ms  "
+              f"fichero {size_before / 1e6:6.1f} -> {size_after / 1e6:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
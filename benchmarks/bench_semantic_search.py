@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark de recuperación en semantic_context: LIKE vs FTS5 vs índice vectorial.
+
+Genera un corpus sintético en español de N filas repartidas en temas (cada fila
+mezcla palabras de su tema en distintas formas con relleno común) y lanza
+consultas redactadas con otras variantes de las mismas palabras. Se mide la
+precisión@5 (resultados que pertenecen al tema de la consulta) y la latencia
+de cada método; para el índice vectorial también el tiempo de construcción
+perezosa desde la columna embedding.
+
+Uso:
+    python benchmarks/bench_semantic_search.py --sizes 10000,100000,1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from multi_tool_agent.storage import DatabaseMemorySystem
+from multi_tool_agent.storage.embeddings import to_blob
+
+USER_ID = "bench_user"
+
+TOPICS = {
+    "mascotas": ["gato", "gata", "gatos", "gatito", "perro", "perra", "perros", "cachorro", "veterinario"],
+    "viajes": ["viaje", "viajes", "viajar", "vuelo", "playa", "hotel", "maleta", "aeropuerto"],
+    "comida": ["paella", "cocina", "receta", "recetas", "comida", "cenar", "restaurante", "tortilla"],
+    "deporte": ["futbol", "correr", "gimnasio", "partido", "entrenamiento", "tenis", "maraton"],
+    "musica": ["guitarra", "concierto", "cancion", "canciones", "piano", "banda", "disco"],
+    "trabajo": ["oficina", "reunion", "proyecto", "jefe", "trabajo", "informe", "cliente"],
+    "salud": ["medico", "dolor", "cita", "farmacia", "vacuna", "dormir", "hospital"],
+    "tecnologia": ["ordenador", "movil", "programar", "servidor", "aplicacion", "portatil", "teclado"],
+}
+
+FILLER = ("hoy ayer mañana semana siempre luego quiero tengo pienso creo gusta mucho nuevo "
+          "viejo grande bonito casa amigo familia tarde noche dia mes verano invierno").split()
+
+QUERIES = [
+    ("mañana quiero llevar a mi gatita al veterinario", "mascotas"),
+    ("tengo un cachorro nuevo en casa", "mascotas"),
+    ("creo que quiero viajar este verano", "viajes"),
+    ("reservar hoteles en la playa para la familia", "viajes"),
+    ("una receta de tortillas para la noche", "comida"),
+    ("restaurantes para cenar con un amigo", "comida"),
+    ("entrenar cada semana para la maratón", "deporte"),
+    ("partidos de tenis por la tarde", "deporte"),
+    ("me gusta mucho tocar guitarras y pianos", "musica"),
+    ("entradas para conciertos este mes", "musica"),
+    ("preparar el informe del cliente mañana", "trabajo"),
+    ("reuniones con mi jefa toda la semana", "trabajo"),
+    ("pedir cita con el médico mañana", "salud"),
+    ("no puedo dormir por la noche del dolor", "salud"),
+    ("programar una aplicación nueva para el móvil", "tecnologia"),
+    ("comprar un portátil grande con buen teclado", "tecnologia"),
+]
+
+
+def make_corpus(rows, seed=42):
+    """Filas (contenido, tema) con palabras del tema y relleno común."""
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    corpus = []
+    for _ in range(rows):
+        topic = rng.choice(topics)
+        words = rng.sample(TOPICS[topic], 2) + rng.sample(FILLER, 4)
+        rng.shuffle(words)
+        corpus.append((" ".join(words), topic))
+    return corpus
+
+
+def seed(memory_system, corpus, batch=10000):
+    """Insertar el corpus con sus embeddings (como lo haría save_turns)."""
+    embedder = memory_system.embedder
+    topic_by_content = {}
+    for start in range(0, len(corpus), batch):
+        chunk = corpus[start:start + batch]
+        vectors = embedder.embed([content for content, _ in chunk])
+        with memory_system.db.write() as conn:
+            conn.executemany(
+                "INSERT INTO semantic_context (user_id, session_id, context_type, content, relevance_score, "
+                "embedding, embedding_model) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(USER_ID, "seed", "user_message", content, 1.0, to_blob(vector), embedder.name)
+                 for (content, _), vector in zip(chunk, vectors)],
+            )
+        topic_by_content.update(chunk)
+    return topic_by_content
+
+
+def evaluate(name, search, topic_by_content, repeat):
+    """Precisión@5 media y latencias de un método de búsqueda."""
+    precisions = []
+    latencies = []
+    for query, topic in QUERIES:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            results = search(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+        top = results[:5]
+        hits = sum(1 for row in top if topic_by_content.get(row[0]) == topic)
+        precisions.append(hits / 5)
+
+    latencies.sort()
+    p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+    print(f"  {name:<10} precisión@5={statistics.mean(precisions):5.2f}  "
+          f"p50={statistics.median(latencies):8.2f} ms  p95={p95:8.2f} ms")
+
+
+def run_size(rows, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        memory_system = DatabaseMemorySystem(os.path.join(tmp, "semantic.db"))
+
+        started = time.perf_counter()
+        topic_by_content = seed(memory_system, make_corpus(rows))
+        print(f"\n📊 {rows} filas (carga con embeddings: {time.perf_counter() - started:.1f} s)")
+
+        started = time.perf_counter()
+        memory_system._ensure_vector_index(USER_ID)
+        print(f"  Índice vectorial construido en {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        evaluate("LIKE", lambda q: memory_system._search_semantic_context_like(USER_ID, q), topic_by_content, repeat)
+        if memory_system.fts_enabled:
+            memory_system.semantic_search_mode = "fts"
+            evaluate("FTS5", lambda q: memory_system.search_semantic_context(USER_ID, q), topic_by_content, repeat)
+        memory_system.semantic_search_mode = "vector"
+        evaluate("Vectorial", lambda q: memory_system.search_semantic_context(USER_ID, q), topic_by_content, repeat)
+
+        memory_system.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recuperación en semantic_context: LIKE vs FTS5 vs vectorial")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Tamaños del corpus separados por comas")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones de cada consulta")
+    args = parser.parse_args()
+
+    for rows in (int(size) for size in args.sizes.split(",")):
+        run_size(rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Throughput de escritura de turnos según el número de shards SQLite.
+
+Muchos usuarios escriben a la vez: cada turno (mensajes, una memoria y una
+entrada de contexto semántico) se confirma en su propia transacción, como con
+DATABASE_AGENT_DURABILITY=sync, o a través de la cola write-behind, que con
+shards confirma en paralelo la parte de cada shard del lote. Con un solo
+fichero todos los commits pasan por el mismo escritor; con N shards hay N
+escritores independientes. La mejora depende de que haya varios núcleos o de
+que el commit espere al disco (synchronous=FULL en un disco con fsync lento):
+con un núcleo y fsync rápido el trabajo es de CPU y repartirlo no acelera.
+
+Uso:
+    python benchmarks/bench_sharded_writes.py --turns 4000 --writers 32 --shards 1,2,4,8
+    python benchmarks/bench_sharded_writes.py --synchronous FULL
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from multi_tool_agent.storage import create_memory_store
+from multi_tool_agent.storage.write_behind import TurnRecord, WriteBehindQueue
+
+
+def make_record(rng, users, i):
+    user_id = f"user{rng.randrange(users)}"
+    return TurnRecord(
+        user_id, f"{user_id}-session",
+        messages=[("user", f"Mensaje {i}: quiero ideas para viajar barato por Europa en verano"),
+                  ("agent", f"Respuesta {i}: te propongo rutas en tren por Portugal, Italia y Croacia")],
+        memories=[(f"dato{i % 7}", f"valor {i}")],
+        semantic=[("conversation", f"Usuario: mensaje {i} sobre viajar barato por Europa", 1.0)],
+    )
+
+
+async def run_direct(store, records, writers):
+    """Cada escritor confirma sus turnos uno a uno (una transacción por turno)."""
+    pending = iter(records)
+
+    async def writer():
+        for record in pending:
+            await store.save_turns([record])
+
+    await asyncio.gather(*(writer() for _ in range(writers)))
+
+
+async def run_write_behind(store, records, writers):
+    """Los escritores encolan y esperan su turno; la cola agrupa y reparte por shard."""
+    queue = WriteBehindQueue(store.save_turns, durability="sync", max_size=writers * 4,
+                             partition_key=store.shard_key)
+    pending = iter(records)
+
+    async def writer():
+        for record in pending:
+            await queue.submit(record)
+
+    await asyncio.gather(*(writer() for _ in range(writers)))
+    await queue.close()
+
+
+async def measure(tmp, shards, mode, records, writers):
+    store = create_memory_store("sqlite", db_path=os.path.join(tmp, f"{mode}-{shards}.db"), shards=shards)
+    try:
+        started = time.perf_counter()
+        await (run_direct if mode == "directo" else run_write_behind)(store, records, writers)
+        elapsed = time.perf_counter() - started
+        stats = await store.get_storage_stats()
+    finally:
+        await store.close()
+    if stats["conversation_log"] != len(records) * 2:
+        raise SystemExit(f"❌ Faltan filas: {stats['conversation_log']} de {len(records) * 2}")
+    return len(records) / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Turnos por segundo según el número de shards")
+    parser.add_argument("--turns", type=int, default=4000, help="Turnos por escenario")
+    parser.add_argument("--writers", type=int, default=32, help="Escritores concurrentes")
+    parser.add_argument("--users", type=int, default=1000, help="Usuarios distintos")
+    parser.add_argument("--shards", default="1,2,4,8", help="Números de shards a comparar")
+    parser.add_argument("--synchronous", default="NORMAL", help="PRAGMA synchronous (NORMAL o FULL)")
+    parser.add_argument("--dir", default=None, help="Directorio de las bases de datos (el disco a medir)")
+    args = parser.parse_args()
+
+    os.environ["SQLITE_SYNCHRONOUS"] = args.synchronous
+    rng = random.Random(7)
+    records = [make_record(rng, args.users, i) for i in range(args.turns)]
+    shard_counts = [int(value) for value in args.shards.split(",")]
+
+    print(f"\n📊 {args.turns} turnos, {args.writers} escritores, {args.users} usuarios, "
+          f"synchronous={args.synchronous}, {os.cpu_count()} CPU")
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        for mode in ("directo", "write-behind"):
+            for shards in shard_counts:
+                results[mode, shards] = await measure(tmp, shards, mode, records, args.writers)
+
+    for mode in ("directo", "write-behind"):
+        print(f"\n{mode}:")
+        base = results[mode, shard_counts[0]]
+        for shards in shard_counts:
+            rate = results[mode, shards]
+            print(f"   {shards:>2} shard(s)  {rate:8.0f} turnos/s  ({rate / base:4.2f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tiempo hasta el primer fragmento: respuesta completa frente a streaming.
+
+Sustituye el modelo del LlmAgent por un LLM simulado que genera la respuesta
+en ``--chunks`` fragmentos separados por ``--chunk-ms`` (como el streaming de
+Gemini) y ejecuta turnos reales con el Runner de ADK, la sesión y la memoria
+SQLite. Compara:
+
+- ``run()`` (/chat): el usuario ve el texto cuando la respuesta está completa
+  y la memoria guardada,
+- ``run_stream()`` (/chat/stream y /ws/chat): el primer fragmento llega en
+  cuanto el modelo lo genera y la memoria se guarda después, en segundo plano.
+
+Comprueba también que los turnos en streaming quedan guardados en la memoria.
+
+Uso:
+    python benchmarks/bench_streaming_ttft.py --turns 20 --chunks 20 --chunk-ms 40
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from multi_tool_agent.agents.database_agent import DatabaseAgent
+
+
+class SimulatedLlm(BaseLlm):
+    """LLM sin red: fragmentos de texto a intervalos fijos."""
+
+    chunks: int = 20
+    chunk_seconds: float = 0.04
+
+    async def generate_content_async(self, llm_request, stream=False):
+        pieces = [f"fragmento {i} " for i in range(self.chunks)]
+        for piece in pieces:
+            await asyncio.sleep(self.chunk_seconds)
+            if stream:
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=piece)]), partial=True)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="".join(pieces))]))
+
+
+def summary(samples):
+    return f"mediana {statistics.median(samples) * 1000:7.1f} ms   máx {max(samples) * 1000:7.1f} ms"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Tiempo hasta el primer fragmento con y sin streaming")
+    parser.add_argument("--turns", type=int, default=20, help="Turnos por modo")
+    parser.add_argument("--chunks", type=int, default=20, help="Fragmentos por respuesta")
+    parser.add_argument("--chunk-ms", type=float, default=40, help="Intervalo entre fragmentos")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_AGENT_DB_PATH"] = os.path.join(tmp, "bench.db")
+        agent = DatabaseAgent()
+        agent.llm_agent.model = SimulatedLlm(model="simulado", chunks=args.chunks,
+                                             chunk_seconds=args.chunk_ms / 1000)
+        try:
+            full_ttft, full_total = [], []
+            for i in range(args.turns):
+                started = time.perf_counter()
+                await agent.run("bench-user", f"Mensaje completo {i}")
+                full_ttft.append(time.perf_counter() - started)
+                full_total.append(full_ttft[-1])
+
+            stream_ttft, stream_total = [], []
+            for i in range(args.turns):
+                started = time.perf_counter()
+                first = None
+                async for event in agent.run_stream("bench-user", f"Mensaje en streaming {i}"):
+                    if event["type"] == "delta" and first is None:
+                        first = time.perf_counter() - started
+                    if event["type"] == "done" and event["response"] == agent._generate_fallback_response(""):
+                        raise SystemExit("❌ El streaming devolvió la respuesta de fallback")
+                stream_ttft.append(first)
+                stream_total.append(time.perf_counter() - started)
+
+            # Esperar a las escrituras en segundo plano (shutdown() también lo hace)
+            await asyncio.gather(*agent._pending_saves)
+            history = await agent.memory.get_conversation_history("bench-user", limit=1000)
+            saved = sum(1 for entry in history if "en streaming" in str(entry))
+            if saved != args.turns:
+                raise SystemExit(f"❌ Guardados {saved} de {args.turns} turnos en streaming")
+            print(f"✅ Los {saved} turnos en streaming quedaron guardados en la memoria")
+        finally:
+            await agent.shutdown()
+
+    print(f"\n📊 {args.turns} turnos, {args.chunks} fragmentos cada {args.chunk_ms:g} ms")
+    print(f"   completa   primer texto {summary(full_ttft)}   turno {summary(full_total)}")
+    print(f"   streaming  primer texto {summary(stream_ttft)}   turno {summary(stream_total)}  "
+          f"({statistics.median(full_ttft) / statistics.median(stream_ttft):.1f}x antes)")
+    print(f"📊 Etapas: {agent.stage_timings.get_stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Carga sobre ``VertexAgent._generate_response`` contra un endpoint HTTP local que imita Vertex AI.
+
+El endpoint (uvicorn en otro proceso) responde a ``generateContent`` tras
+``--latency`` segundos y cuenta las conexiones TCP distintas que recibe.
+``--concurrency`` clientes lanzan ``--requests`` peticiones en total con:
+
+- ``anterior``: el código previo, un ``genai.Client`` nuevo por mensaje y la
+  llamada síncrona ``client.models.generate_content`` dentro de la corrutina
+  (bloquea el event loop durante toda la llamada),
+- ``compartido``: el cliente único del agente con ``client.aio``, pool
+  keep-alive y como mucho VERTEX_MAX_CONCURRENCY llamadas a la vez.
+
+Mide throughput, latencia por petición (mediana y p95) y conexiones abiertas.
+Por último comprueba que una respuesta más lenta que VERTEX_TIMEOUT_SECONDS
+se corta y se cuenta como ``timeout``.
+
+Sin OAuth: el endpoint local no comprueba el token, así que ambos modos usan
+un token fijo (en producción el cliente por mensaje además repetía la
+carga de credenciales, que aquí no se mide).
+
+Uso:
+    python benchmarks/bench_vertex_client.py --requests 200 --concurrency 32 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def serve(port, latency):
+    """Endpoint local: generateContent tras ``latency`` s (``lento`` en el modelo: 20 veces más)."""
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    connections = set()
+
+    async def generate(request):
+        connections.add(request.client)
+        slow = "lento" in request.path_params["path"]
+        await asyncio.sleep(latency * (20 if slow else 1))
+        return JSONResponse({"candidates": [{
+            "content": {"role": "model", "parts": [{"text": "Respuesta simulada"}]},
+            "finishReason": "STOP",
+        }]})
+
+    async def stats(request):
+        return JSONResponse({"connections": len(connections)})
+
+    async def reset(request):
+        connections.clear()
+        return JSONResponse({})
+
+    app = Starlette(routes=[
+        Route("/stats", stats), Route("/reset", reset, methods=["POST"]),
+        Route("/{path:path}", generate, methods=["POST"]),
+    ])
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="error")
+
+
+def server_call(base_url, path, method="GET"):
+    import json
+    with urllib.request.urlopen(urllib.request.Request(base_url + path, method=method)) as response:
+        return json.loads(response.read())
+
+
+async def generate_per_request(agent, message, memory_context):
+    """El _generate_response anterior: cliente nuevo por mensaje y llamada síncrona."""
+    from google import genai
+    from google.genai import types
+
+    client = genai.Client(vertexai=True, project="proyect-470810", location="us-central1",
+                          http_options=types.HttpOptions(base_url=os.environ["VERTEX_BASE_URL"]))
+    response = client.models.generate_content(
+        model=agent.model,
+        contents=[{"role": "user", "parts": [{"text": "Eres un asistente Vertex AI con memoria persistente."}]},
+                  {"role": "user", "parts": [{"text": f"{memory_context}\n{message}"}]}],
+    )
+    return response.text
+
+
+async def load(name, generate, requests, concurrency, base_url):
+    server_call(base_url, "/reset", "POST")
+    latencies = []
+    pending = iter(range(requests))
+
+    async def client():
+        for i in pending:
+            started = time.perf_counter()
+            await generate(f"Mensaje {i}", "Contexto de memoria")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    connections = server_call(base_url, "/stats")["connections"]
+    print(f"   {name:<11} {requests / elapsed:7.1f} pet/s   mediana {statistics.median(latencies) * 1000:8.1f} ms"
+          f"   p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:8.1f} ms   {connections} conexiones")
+
+
+async def main(args, base_url):
+    agent = VertexAgent()
+    print(f"\n📊 {args.requests} peticiones, {args.concurrency} clientes, endpoint con {args.latency * 1000:.0f} ms "
+          f"(VERTEX_MAX_CONCURRENCY={agent.max_concurrency})")
+    await load("anterior", lambda message, context: generate_per_request(agent, message, context),
+               args.requests, args.concurrency, base_url)
+    await load("compartido", agent._generate_response, args.requests, args.concurrency, base_url)
+
+    agent.model = "lento"
+    agent.genai_client = agent._create_genai_client()
+    started = time.perf_counter()
+    response = await agent._generate_response("Mensaje", "")
+    print(f"   respuesta de {args.latency * 20:.1f} s con timeout {agent.request_timeout:.1f} s: "
+          f"{'cortada' if response == GENERATION_ERROR else 'NO cortada'} a los {time.perf_counter() - started:.2f} s; "
+          f"llm {agent.get_runtime_stats()['stages']['llm']['outcomes']}")
+    await agent.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cliente genai por mensaje frente a cliente compartido asíncrono")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.1, help="Latencia simulada del modelo (s)")
+    parser.add_argument("--serve", type=int, help="(interno) puerto del endpoint local")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.latency)
+        sys.exit(0)
+
+    logging.basicConfig(level=logging.CRITICAL)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([sys.executable, __file__, "--serve", str(port), "--latency", str(args.latency)])
+    try:
+        for _ in range(100):
+            try:
+                server_call(base_url, "/stats")
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        # El paquete inicializa el Database Agent al importarse, que borra la configuración de Vertex
+        os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+        from multi_tool_agent.agents.vertex_agent import GENERATION_ERROR, VertexAgent
+        os.environ.update({
+            "GOOGLE_API_KEY": "benchmark-sin-llm",
+            "GOOGLE_API_KEY_VERTEX": "benchmark-sin-llm",
+            "AGENT_ENGINE_ID": "benchmark",
+            "VERTEX_BASE_URL": base_url,
+            "VERTEX_TIMEOUT_SECONDS": os.getenv("VERTEX_TIMEOUT_SECONDS", str(args.latency * 5)),
+        })
+        # El endpoint local no comprueba el token OAuth
+        import google.auth
+        from google.oauth2.credentials import Credentials
+        google.auth.default = lambda *a, **kw: (Credentials(token="benchmark"), "proyect-470810")
+
+        asyncio.run(main(args, base_url))
+    finally:
+        server.terminate()
+        server.wait()
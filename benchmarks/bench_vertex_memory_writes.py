@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Latencia de ``VertexAgent.run`` con la escritura en el Memory Bank dentro y fuera de la respuesta.
+
+Sin red: un Memory Bank simulado tarda ``--search-latency`` s en buscar y
+``--write-latency`` s en guardar; una fracción ``--failure-rate`` de las
+escrituras falla, y el modelo simulado tarda ``--llm-latency`` s.
+``--concurrency`` usuarios envían ``--chats`` mensajes en total:
+
+- ``en línea`` (el comportamiento anterior): la respuesta espera a
+  ``_write_memory`` (sin reintentos: un fallo sólo se registraba),
+- ``en segundo plano``: ``run`` encola el turno en ``BackgroundMemoryWriter``.
+
+Además muestra el lag (encolado -> escrito), reintentos, turnos en
+dead-letter y cuánto tarda ``shutdown()`` en vaciar la cola.
+
+Uso:
+    python benchmarks/bench_vertex_memory_writes.py --chats 200 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa el Database Agent al importarse, que borra la configuración de Vertex
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from google.adk.memory.base_memory_service import SearchMemoryResponse
+
+from multi_tool_agent.memory import MemoryWrite
+
+
+class SimulatedMemoryBank:
+    """Memory Bank sin red: latencias fijas y una fracción de escrituras fallidas."""
+
+    def __init__(self, search_latency, write_latency, failure_rate, seed=7):
+        self.search_latency = search_latency
+        self.write_latency = write_latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.stored = 0
+
+    async def search_memory(self, *, app_name, user_id, query):
+        await asyncio.sleep(self.search_latency)
+        return SearchMemoryResponse(memories=[])
+
+    async def add_session_to_memory(self, session):
+        await asyncio.sleep(self.write_latency)
+        if self.rng.random() < self.failure_rate:
+            raise ConnectionError("503 simulado del Memory Bank")
+        self.stored += 1
+
+
+async def measure(agent, name, chats, concurrency, inline):
+    latencies = []
+    pending = iter(range(chats))
+
+    async def user(user_index):
+        for i in pending:
+            started = time.perf_counter()
+            response, session_id = await agent.run(f"user-{user_index}", f"Mensaje {i}", f"s-{user_index}")
+            if inline:
+                # Lo que run esperaba antes de devolver la respuesta
+                try:
+                    await agent._write_memory(MemoryWrite(f"user-{user_index}", session_id, f"Mensaje {i}", response))
+                except Exception:
+                    pass
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(u) for u in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"   {name:<17} respuesta: mediana {statistics.median(latencies) * 1000:7.1f} ms   "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f} ms   ({chats / elapsed:5.1f} chats/s)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Escritura en el Memory Bank en línea frente a en segundo plano")
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--write-latency", type=float, default=0.3)
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dead_letter = os.path.join(tmp, "dead_letter.jsonl")
+        os.environ.update({
+            "GOOGLE_API_KEY_VERTEX": "benchmark-sin-llm",
+            "AGENT_ENGINE_ID": "benchmark",
+            "VERTEX_MEMORY_MAX_ATTEMPTS": os.getenv("VERTEX_MEMORY_MAX_ATTEMPTS", "3"),
+            "VERTEX_MEMORY_DEAD_LETTER": dead_letter,
+        })
+        from multi_tool_agent.agents.vertex_agent import VertexAgent
+
+        async def generate(message, memory_context):
+            await asyncio.sleep(args.llm_latency)
+            return "Respuesta simulada"
+
+        print(f"\n📊 {args.chats} chats, {args.concurrency} usuarios; búsqueda {args.search_latency * 1000:.0f} ms, "
+              f"modelo {args.llm_latency * 1000:.0f} ms, escritura {args.write_latency * 1000:.0f} ms "
+              f"({args.failure_rate:.0%} fallan)")
+        for name, inline in (("en línea", True), ("en segundo plano", False)):
+            agent = VertexAgent()
+            agent.memory_service = SimulatedMemoryBank(args.search_latency, args.write_latency, args.failure_rate)
+            agent._generate_response = generate
+            # Un backoff corto para que el benchmark no dure minutos
+            agent.memory_writer.backoff_base = 0.05
+            if inline:
+                agent.memory_writer.submit = lambda item: None
+            await measure(agent, name, args.chats, args.concurrency, inline)
+            if inline:
+                await agent.shutdown()
+                continue
+
+            peak_stats = agent.memory_writer.get_stats()
+            started = time.perf_counter()
+            await agent.shutdown()
+            drained = time.perf_counter() - started
+            stats = agent.memory_writer.get_stats()
+            dead = sum(1 for _ in open(dead_letter)) if os.path.exists(dead_letter) else 0
+            print(f"   al terminar la carga: {peak_stats['queue_depth']} en cola, {peak_stats['in_flight']} en curso; "
+                  f"shutdown() vacía la cola en {drained:.2f} s")
+            print(f"   escritos {stats['written']} (memoria simulada: {agent.memory_service.stored}), "
+                  f"reintentos {stats['retries']}, dead-letter {stats['dead_lettered']} ({dead} líneas en el fichero)")
+            print(f"   lag encolado -> escrito: mediana {stats['lag']['p50_ms']:.0f} ms, p95 {stats['lag']['p95_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
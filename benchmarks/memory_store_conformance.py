@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Conformidad y rendimiento de los backends de MemoryStore.
+
+Ejecuta las mismas comprobaciones sobre cada backend (sesiones, memorias con
+historial y límites, orden del historial, búsqueda semántica con formas
+flexionadas, aislamiento entre usuarios y datos de /debug) y mide la latencia
+de las operaciones de un turno de /chat. PostgreSQL sólo se prueba si se indica
+un DSN (``--postgres-dsn`` o ``MEMORY_STORE_POSTGRES_DSN``); cada ejecución usa
+identificadores de usuario nuevos, así que puede apuntar a una base existente.
+
+Uso:
+    python benchmarks/memory_store_conformance.py --turns 300
+    python benchmarks/memory_store_conformance.py --postgres-dsn postgresql://localhost/memoria
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# El paquete inicializa todos los agentes al importarse; no se llama al LLM
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-sin-llm")
+
+from multi_tool_agent.storage import create_memory_store
+from multi_tool_agent.storage.write_behind import TurnRecord
+
+# Límites pequeños para comprobar los recortes con pocos datos
+LIMITS = {"max_memories_per_user": 3, "memory_history_versions": 2}
+
+
+def check(condition, description):
+    if not condition:
+        raise AssertionError(description)
+
+
+async def conformance(store):
+    """Comprobaciones de comportamiento comunes a todos los backends."""
+    run = uuid.uuid4().hex[:8]
+    alice, bob = f"alice-{run}", f"bob-{run}"
+
+    session_id = await store.get_or_create_session(alice)
+    check(session_id, "get_or_create_session devuelve un id")
+    check(await store.get_or_create_session(alice, session_id) == session_id, "la sesión existente se reutiliza")
+
+    # Una fila por clave: gana el último valor y el anterior pasa al historial
+    for value in ["Ana", "Ana", "Lucía", "Marta", "Carmen"]:
+        await store.save_memory(alice, session_id, "nombre", value)
+    memories = await store.get_memories(alice)
+    check([(key, value) for key, value, _ in memories] == [("nombre", "Carmen")], f"upsert de memorias: {memories}")
+    history = await store.get_memory_history(alice, "nombre")
+    check([value for value, _, _ in history] == ["Marta", "Lucía"], f"historial limitado a 2 versiones: {history}")
+
+    # Límite de claves: se conservan las más recientes
+    for key in ["edad", "ciudad", "color"]:
+        await store.save_memory(alice, session_id, key, f"valor-{key}")
+    keys = [key for key, _, _ in await store.get_memories(alice)]
+    check(keys == ["color", "ciudad", "edad"], f"límite de 3 memorias por usuario: {keys}")
+
+    # Turno completo: mensajes, memorias y contexto semántico en un lote
+    await store.save_turns([
+        TurnRecord(alice, session_id,
+                   messages=[("user", "Quiero viajar a Japón en primavera"), ("assistant", "Kioto es ideal")],
+                   semantic=[("conversation", "Usuario: Quiero viajar a Japón en primavera", 1.0)]),
+        TurnRecord(alice, session_id,
+                   messages=[("user", "Me encanta cocinar pasta"), ("assistant", "¡Qué rico!")],
+                   semantic=[("conversation", "Usuario: Me encanta cocinar pasta fresca", 1.0)]),
+        TurnRecord(bob, str(uuid.uuid4()),
+                   messages=[("user", "Hola")],
+                   semantic=[("conversation", "Usuario: viajes por Japón con amigos", 1.0)]),
+    ])
+
+    conversation = await store.get_conversation_history(alice, limit=3)
+    check([content for _, content, _ in conversation] == ["¡Qué rico!", "Me encanta cocinar pasta", "Kioto es ideal"],
+          f"historial del más reciente al más antiguo: {conversation}")
+
+    results = await store.search_semantic_context(alice, "¿qué viaje hago a japon?")
+    check(results and "Japón" in results[0][0], f"búsqueda por prefijo y sin tildes: {results}")
+    check(all("amigos" not in content for content, _, _ in results), "la búsqueda no mezcla usuarios")
+    check(await store.search_semantic_context(alice, "zzz inexistente") == [], "sin coincidencias -> lista vacía")
+
+    debug = await store.get_debug_info(alice)
+    check(debug["memory_count"] == 3 and debug["conversation_count"] == 4, f"contadores de /debug: {debug}")
+    check(debug["recent_conversations"][0]["content"] == "¡Qué rico!", "últimos mensajes en /debug")
+    check(await store.get_memories(bob) == [], "memorias aisladas por usuario")
+
+
+async def performance(store, turns):
+    """Latencia de un turno: lecturas de contexto y escritura del turno."""
+    user_id = f"perf-{uuid.uuid4().hex[:8]}"
+    session_id = await store.get_or_create_session(user_id)
+    reads, writes = [], []
+    for i in range(turns):
+        started = time.perf_counter()
+        await asyncio.gather(
+            store.get_memories(user_id),
+            store.get_conversation_history(user_id, 5),
+            store.search_semantic_context(user_id, "viajes baratos por europa"),
+        )
+        reads.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await store.save_turns([TurnRecord(
+            user_id, session_id,
+            messages=[("user", f"Mensaje {i} sobre viajes baratos"), ("assistant", f"Respuesta {i}")],
+            memories=[(f"dato{i % 5}", f"valor {i}")],
+            semantic=[("conversation", f"Usuario: mensaje {i} sobre viajes baratos por europa", 1.0)],
+        )])
+        writes.append(time.perf_counter() - started)
+
+    for name, samples in (("lecturas", reads), ("escritura", writes)):
+        samples = sorted(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        print(f"   {name:<10} mediana {statistics.median(samples) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Conformidad y rendimiento de los backends de MemoryStore")
+    parser.add_argument("--turns", type=int, default=300, help="Turnos de la prueba de rendimiento")
+    parser.add_argument("--postgres-dsn", default=os.getenv("MEMORY_STORE_POSTGRES_DSN"))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [
+            ("sqlite", "sqlite", {"db_path": os.path.join(tmp, "conformance.db")}),
+            ("sqlite (4 shards)", "sqlite", {"db_path": os.path.join(tmp, "sharded.db"), "shards": 4}),
+            ("memory", "memory", {}),
+        ]
+        if args.postgres_dsn:
+            backends.append(("postgres", "postgres", {"dsn": args.postgres_dsn}))
+        else:
+            print("ℹ️ PostgreSQL omitido (indique --postgres-dsn o MEMORY_STORE_POSTGRES_DSN)")
+
+        failures = 0
+        for name, backend, options in backends:
+            store = create_memory_store(backend, **options, **LIMITS)
+            try:
+                print(f"\n🗄️ {name}")
+                try:
+                    await conformance(store)
+                    print("   ✅ conformidad")
+                except AssertionError as e:
+                    failures += 1
+                    print(f"   ❌ conformidad: {e}")
+                await performance(store, args.turns)
+            finally:
+                await store.close()
+
+    if failures:
+        raise SystemExit(f"❌ {failures} backend(s) no conformes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
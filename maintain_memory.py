@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Retención y recuperación de espacio de la memoria SQLite del Database Agent.
+
+Aplica ahora una pasada de las políticas RETENTION_* (el servidor lo hace
+solo cada RETENTION_INTERVAL_SECONDS): archiva en gzip y borra las filas
+caducadas y devuelve las páginas libres con incremental_vacuum. Puede
+ejecutarse con el servidor en marcha.
+
+Las bases de datos creadas antes de auto_vacuum=INCREMENTAL necesitan una
+reescritura completa (VACUUM) una sola vez, con el servidor parado:
+--enable-incremental-vacuum.
+
+Uso:
+    python maintain_memory.py --dry-run
+    python maintain_memory.py
+    python maintain_memory.py --enable-incremental-vacuum
+"""
+
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# El paquete importa los agentes al cargarse; esta herramienta no usa el LLM
+os.environ.setdefault("GOOGLE_API_KEY", "maintenance-sin-llm")
+
+from multi_tool_agent.storage import create_sqlite_memory_system, RetentionManager
+from multi_tool_agent.logging_setup import configure_logging
+
+# Registros de la librería (migraciones, progreso) en texto legible por consola
+configure_logging(fmt="text")
+
+
+def enable_incremental_vacuum(memory_system):
+    for shard in memory_system.shards:
+        if shard.db.auto_vacuum == "INCREMENTAL":
+            print(f"✅ [MAINTENANCE] {shard.db_path} ya usa auto_vacuum=INCREMENTAL")
+            continue
+        size = os.path.getsize(shard.db_path)
+        print(f"🔄 [MAINTENANCE] Reescribiendo {shard.db_path} ({size / 1e6:.1f} MB)...")
+        shard.db.vacuum(auto_vacuum="INCREMENTAL")
+        shard.db.checkpoint("TRUNCATE")
+        print(f"✅ [MAINTENANCE] {shard.db_path}: auto_vacuum={shard.db.auto_vacuum}, "
+              f"{os.path.getsize(shard.db_path) / 1e6:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retención y recuperación de espacio de la memoria SQLite")
+    parser.add_argument("--dry-run", action="store_true", help="Sólo contar las filas caducadas")
+    parser.add_argument("--batch-size", type=int, default=None, help="Filas por transacción de borrado")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Pasar a auto_vacuum=INCREMENTAL con VACUUM (servidor parado)")
+    args = parser.parse_args()
+
+    memory_system = create_sqlite_memory_system()
+    try:
+        if args.enable_incremental_vacuum:
+            enable_incremental_vacuum(memory_system)
+            return
+
+        manager = RetentionManager(memory_system, batch_size=args.batch_size, pause_seconds=0)
+        if not manager.policies:
+            print("ℹ️ [MAINTENANCE] Sin políticas RETENTION_* configuradas: sólo se recupera espacio")
+        summary = manager.run_pass(dry_run=args.dry_run)
+        if args.dry_run:
+            print(f"🔍 [MAINTENANCE] Filas que se borrarían: {summary['deleted']}")
+        else:
+            print(f"✅ [MAINTENANCE] Filas borradas: {summary['deleted']} ({manager.archived} archivadas), "
+                  f"páginas devueltas: {summary['vacuumed_pages']}")
+    finally:
+        memory_system.close()
+
+
+if __name__ == "__main__":
+    main()
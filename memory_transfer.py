@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Exportar e importar la memoria del Database Agent (SQLite) en NDJSON.
+
+Funciona con el servidor en marcha: la exportación lee por trozos y la
+importación confirma por lotes. Ambas se reanudan tras una interrupción:
+
+- export --resume continúa desde el cursor de la última línea completa del fichero.
+- import vuelve a leer el fichero y salta las líneas ya confirmadas con el
+  mismo --import-id (por defecto, la ruta del fichero).
+
+import también lee los ficheros .ndjson.gz del archivo frío de la retención.
+
+Uso:
+    python memory_transfer.py export --output memoria.ndjson
+    python memory_transfer.py export --output ana.ndjson --user ana --resume
+    python memory_transfer.py import --input memoria.ndjson --batch-size 10000
+    python memory_transfer.py import --input database_agent_sessions_archive/conversation_log-2025-01-31.ndjson.gz
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# El paquete importa los agentes al cargarse; esta herramienta no usa el LLM
+os.environ.setdefault("GOOGLE_API_KEY", "transfer-sin-llm")
+
+from multi_tool_agent.storage import create_sqlite_memory_system, export_ndjson, NDJSONImporter
+from multi_tool_agent.logging_setup import configure_logging
+
+# Registros de la librería (migraciones, progreso) en texto legible por consola
+configure_logging(fmt="text")
+
+
+def last_cursor(path: str):
+    """Cursor de la última línea completa del fichero; descarta una línea final a medias."""
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        block = 64 * 1024
+        data = b""
+        position = end
+        # Leer hacia atrás hasta tener la última línea completa
+        while position > 0:
+            read = min(block, position)
+            position -= read
+            f.seek(position)
+            data = f.read(read) + data
+            if data.count(b"\n") >= 2 or (position == 0 and b"\n" in data):
+                break
+
+        complete = data[:data.rfind(b"\n") + 1] if b"\n" in data else b""
+        # Truncar lo que quede detrás del último salto de línea (escritura interrumpida)
+        f.truncate(position + len(complete))
+        lines = complete.splitlines()
+        if not lines:
+            return None
+        record = json.loads(lines[-1])
+    return record.get("cursor")
+
+
+def run_export(memory_system, args):
+    cursor = None
+    if args.resume and os.path.exists(args.output):
+        cursor = last_cursor(args.output)
+        print(f"↩️  [EXPORT] Reanudando desde {cursor or 'el principio'}")
+        if cursor is None and os.path.getsize(args.output) > 0:
+            # Sólo estaba la cabecera: se continúa sin volver a escribirla
+            cursor = "0:sessions:0"
+    elif os.path.exists(args.output) and not args.force:
+        raise SystemExit(f"❌ [EXPORT] {args.output} ya existe (use --resume o --force)")
+
+    def progress(rows, table):
+        print(f"📤 [EXPORT] {rows} filas ({table})")
+
+    mode = "a" if cursor else "w"
+    with open(args.output, mode, encoding="utf-8") as f:
+        for line in export_ndjson(memory_system, args.user, cursor, args.chunk_size, progress):
+            f.write(line)
+    print(f"✅ [EXPORT] Exportación completa en {args.output}")
+
+
+def run_import(memory_system, args):
+    import_id = args.import_id or f"file:{os.path.abspath(args.input)}"
+
+    def progress(stats):
+        print(f"📥 [IMPORT] línea {stats['lines']}: {sum(stats['imported'].values())} filas importadas, "
+              f"{stats['skipped']} ya importadas")
+
+    importer = NDJSONImporter(memory_system, import_id, args.batch_size, args.user, progress=progress)
+    if args.restart:
+        importer.reset()
+    opener = gzip.open if args.input.endswith(".gz") else open
+    with opener(args.input, "rt", encoding="utf-8") as f:
+        importer.add_lines(f)
+    stats = importer.finish()
+    print(f"✅ [IMPORT] {stats['lines']} líneas: {stats['imported']} (omitidas {stats['skipped']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportar/importar la memoria SQLite en NDJSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Exportar a un fichero NDJSON")
+    export_parser.add_argument("--output", required=True, help="Fichero de salida")
+    export_parser.add_argument("--user", default=None, help="Exportar sólo este usuario")
+    export_parser.add_argument("--chunk-size", type=int, default=1000, help="Filas por lectura")
+    export_parser.add_argument("--resume", action="store_true", help="Continuar una exportación interrumpida")
+    export_parser.add_argument("--force", action="store_true", help="Sobrescribir el fichero de salida")
+
+    import_parser = commands.add_parser("import", help="Importar un fichero NDJSON")
+    import_parser.add_argument("--input", required=True, help="Fichero NDJSON")
+    import_parser.add_argument("--user", default=None, help="Importar sólo este usuario")
+    import_parser.add_argument("--batch-size", type=int, default=5000, help="Filas por transacción")
+    import_parser.add_argument("--import-id", default=None, help="Identificador para reanudar (por defecto, la ruta)")
+    import_parser.add_argument("--restart", action="store_true", help="Ignorar el progreso guardado")
+
+    args = parser.parse_args()
+    memory_system = create_sqlite_memory_system()
+    try:
+        if args.command == "export":
+            run_export(memory_system, args)
+        else:
+            run_import(memory_system, args)
+    except (ValueError, OSError) as e:
+        print(f"❌ [TRANSFER] {e}")
+        sys.exit(1)
+    finally:
+        memory_system.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ Gestor de Agentes - Permite seleccionar y usar diferentes tipos de agentes.
 """
 
 import asyncio
+import logging
 from typing import Optional, Tuple
 
 # Importar las clases de agentes (no las instancias)
@@ -10,6 +11,8 @@ from .agents.database_agent import DatabaseAgent
 from .agents.adk_agent import ADKAgent
 from .agents.vertex_agent import VertexAgent
 
+logger = logging.getLogger(__name__)
+
 class AgentManager:
     """Gestor para manejar diferentes tipos de agentes."""
     
@@ -36,21 +39,13 @@ class AgentManager:
         self.current_agent = agent_class()
         self.current_agent_type = agent_type
         
-        print(f"✅ [AGENT MANAGER] Agente seleccionado: {agent_type.upper()}")
-        
         # Mostrar información del agente seleccionado
-        if agent_type == 'database':
-            print("   🗄️  Base de datos integral con SQLite completo")
-            print("   📊 Búsqueda semántica básica")
-            print("   💾 Memoria persistente local")
-        elif agent_type == 'adk':
-            print("   🔧 ADK InMemorySessionService")
-            print("   🧠 Memoria persistente ADK")
-            print("   🔍 Búsqueda en conversaciones")
-        elif agent_type == 'vertex':
-            print("   ☁️  Vertex AI Memory Bank")
-            print("   🧠 Búsqueda semántica avanzada")
-            print("   💾 Memoria persistente en Google Cloud")
+        features = {
+            'database': "🗄️  Base de datos integral con SQLite completo, búsqueda semántica básica, memoria persistente local",
+            'adk': "🔧 ADK SessionService acotado con volcado a disco, memoria persistente ADK, búsqueda en conversaciones",
+            'vertex': "☁️  Vertex AI Memory Bank, búsqueda semántica avanzada, memoria persistente en Google Cloud",
+        }
+        logger.info("✅ Agente seleccionado: %s (%s)", agent_type.upper(), features[agent_type])
         
         return self.current_agent
     
@@ -59,13 +54,13 @@ class AgentManager:
         if not self.current_agent:
             raise ValueError("No se ha seleccionado ningún agente. Use select_agent() primero.")
         
-        print(f"🚀 [AGENT MANAGER] Ejecutando agente: {self.current_agent_type.upper()}")
+        logger.debug("🚀 Ejecutando agente: %s", self.current_agent_type.upper())
         
         try:
             response, session_id = await self.current_agent.run(user_id, message, session_id)
             return response, session_id
         except Exception as e:
-            print(f"❌ [AGENT MANAGER] Error ejecutando agente: {e}")
+            logger.error("❌ Error ejecutando agente: %s", e)
             return f"Error ejecutando agente {self.current_agent_type}: {str(e)}", session_id or "error"
     
     def get_agent_info(self, agent_type: str = None):
@@ -97,9 +92,9 @@ class AgentManager:
                 '🔍 Contexto semántico'
             ]
         elif agent_type == 'adk':
-            info['description'] = 'Agente usando ADK InMemorySessionService'
+            info['description'] = 'Agente usando ADK con sesiones acotadas en memoria y volcado a disco'
             info['features'] = [
-                '🔧 ADK InMemorySessionService',
+                '🔧 ADK SessionService acotado (LRU + SQLite)',
                 '🧠 Memoria persistente ADK',
                 '🔍 Búsqueda en conversaciones',
                 '📋 Gestión de sesiones ADK',
@@ -1,16 +1,28 @@
 """
-Agente ADK - Usa ADK InMemorySessionService e InMemoryMemoryService para memoria persistente.
+Agente ADK - Usa un SessionService de ADK acotado (sesiones calientes en memoria,
+el resto en disco) y un MemoryService de ADK sobre SQLite (FTS5) para memoria
+persistente; ADK_MEMORY_SERVICE=memory vuelve a InMemoryMemoryService, con
+instantáneas en disco para no perder la memoria al reiniciar.
 """
 
 import os
+import time
 import uuid
 import asyncio
+import logging
+from collections import OrderedDict
 from google.genai import types
 from dotenv import load_dotenv
 
+from ..logging_setup import redact_secret
+from ..memory.stage_timings import StageTimings
+from ..storage import BoundedSessionService, SQLiteMemoryService, SnapshotMemoryService
+
 # Cargar variables de entorno
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Verificar API Key (solo Google AI Studio, NO Vertex AI)
 api_key = os.getenv("GOOGLE_API_KEY")
 if not api_key:
@@ -26,13 +38,24 @@ os.environ.pop("GOOGLE_APPLICATION_CREDENTIALS", None)
 # FORZAR uso de Google AI Studio
 os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "FALSE"
 
-print(f"✅ [ADK AGENT] API Key cargada: {api_key[:10]}...{api_key[-5:]}")
-print("🔧 [ADK AGENT] Configurado para usar Google AI Studio (NO Vertex AI)")
-
 class ADKAgent:
-    """Agente que usa ADK InMemorySessionService e InMemoryMemoryService siguiendo el patrón oficial de LlmAgent."""
+    """Agente que usa un SessionService de ADK acotado y un MemoryService persistente siguiendo el patrón oficial de LlmAgent."""
     
     def __init__(self):
+        # Al crear el agente (no al importar el módulo) para que el logging ya esté configurado
+        logger.info("✅ API Key cargada: %s", redact_secret(api_key))
+        logger.info("🔧 Configurado para usar Google AI Studio (NO Vertex AI)")
+        # Ingesta incremental en la memoria: (user_id, session_id) -> eventos ya añadidos
+        self._ingested = OrderedDict()
+        self._max_tracked_sessions = int(os.getenv("ADK_MEMORY_TRACKED_SESSIONS", "10000"))
+        # Sesiones con turnos pendientes de añadir (varios turnos seguidos se agrupan en uno)
+        self._pending_ingest = set()
+        self._ingest_task = None
+        self.ingest_stats = {"runs": 0, "events": 0, "coalesced": 0, "full_session_fallbacks": 0}
+        self.stage_timings = StageTimings()
+        # Punto de control periódico: sesiones modificadas a disco e instantánea de la memoria
+        self.checkpoint_interval = float(os.getenv("ADK_CHECKPOINT_INTERVAL_SECONDS", "60"))
+        self._checkpoint_task = None
         self._setup_llm_agent()
         self._setup_runner()
     
@@ -44,40 +67,40 @@ class ADKAgent:
             
             # Obtener modelo desde variables de entorno
             model = os.getenv("AGENT_MODEL", "gemini-2.0-flash")
-            print(f"🤖 [ADK AGENT] Usando modelo: {model}")
+            logger.info("🤖 Usando modelo: %s", model)
             
             # Crear LlmAgent con configuración estándar
             self.llm_agent = LlmAgent(
                 name="adk_agent",
                 model=model,
-                description="Eres un asistente ADK con memoria persistente usando InMemoryMemoryService.",
+                description="Eres un asistente ADK con memoria persistente entre sesiones.",
                 instruction=(
-                    "Eres un asistente ADK que recuerda información entre sesiones usando InMemoryMemoryService. "
+                    "Eres un asistente ADK que recuerda información entre sesiones. "
                     "Tienes acceso a la herramienta 'load_memory' para consultar conversaciones pasadas. "
                     "Usa la información proporcionada para personalizar tus respuestas."
                 ),
                 tools=[load_memory]  # Herramienta oficial ADK
             )
-            print("✅ [ADK AGENT] LlmAgent configurado siguiendo patrón ADK")
+            logger.info("✅ LlmAgent configurado siguiendo patrón ADK")
             
         except Exception as e:
-            print(f"❌ [ADK AGENT] Error configurando LlmAgent: {e}")
+            logger.error("❌ Error configurando LlmAgent: %s", e)
             self.llm_agent = None
     
     def _setup_runner(self):
         """Configurar el Runner siguiendo el patrón oficial de la documentación ADK."""
         try:
             from google.adk import Runner
-            from google.adk.sessions import InMemorySessionService
-            from google.adk.memory import InMemoryMemoryService
-            
-            # Usar InMemorySessionService como recomienda la documentación para desarrollo
-            self.session_service = InMemorySessionService()
-            self.memory_service = InMemoryMemoryService()
+            # Sesiones calientes en memoria (LRU con límite) y el resto volcadas a SQLite:
+            # la memoria no crece con cada usuario y las sesiones sobreviven a un reinicio
+            self.session_service = BoundedSessionService.from_env()
+            self.memory_service = self._create_memory_service()
             
-            print("✅ [ADK AGENT] Servicios configurados siguiendo patrón oficial ADK")
-            print("   📝 InMemorySessionService para sesiones")
-            print("   🧠 InMemoryMemoryService para memoria")
+            logger.info("✅ Servicios configurados siguiendo patrón oficial ADK: "
+                        "sesiones en memoria acotada (máx. %s, %g MB) con volcado a %s, "
+                        "%s para memoria",
+                        self.session_service.max_sessions, self.session_service.max_bytes / (1024 * 1024),
+                        self.session_service.db_path, type(self.memory_service).__name__)
             
             # Crear Runner con LlmAgent y servicios ADK
             self.runner = Runner(
@@ -86,22 +109,38 @@ class ADKAgent:
                 session_service=self.session_service,
                 memory_service=self.memory_service
             )
-            print("✅ [ADK AGENT] Runner configurado con servicios ADK estándar")
+            logger.info("✅ Runner configurado con servicios ADK estándar")
             
         except Exception as e:
-            print(f"❌ [ADK AGENT] Error configurando Runner: {e}")
+            logger.error("❌ Error configurando Runner: %s", e)
             self.runner = None
     
+    def _create_memory_service(self):
+        """MemoryService según ADK_MEMORY_SERVICE: sqlite (persistente, FTS5) o memory.
+        
+        En modo memory se restaura y guarda la instantánea ADK_MEMORY_SNAPSHOT
+        (vacío = InMemoryMemoryService sin instantáneas).
+        """
+        backend = os.getenv("ADK_MEMORY_SERVICE", "sqlite").lower()
+        if backend == "memory":
+            if not os.getenv("ADK_MEMORY_SNAPSHOT", "adk_agent_memory.snapshot"):
+                from google.adk.memory import InMemoryMemoryService
+                return InMemoryMemoryService()
+            return SnapshotMemoryService.from_env()
+        if backend != "sqlite":
+            raise ValueError(f"ADK_MEMORY_SERVICE '{backend}' no válido. Opciones: ('sqlite', 'memory')")
+        return SQLiteMemoryService.from_env()
+    
     async def run(self, user_id: str, message: str, session_id: str = None):
         """Ejecutar agente siguiendo el patrón oficial de la documentación ADK."""
         
-        print(f"🧠 [ADK AGENT] Ejecutando para usuario: {user_id}")
+        logger.info("🧠 Ejecutando para usuario: %s", user_id, extra={"user_id": user_id, "session_id": session_id})
         
         try:
             # PASO 1: Generar session_id si no existe
             if not session_id:
                 session_id = str(uuid.uuid4())
-                print(f"🆔 [ADK AGENT] Nuevo session_id generado: {session_id[:8]}...")
+                logger.debug("🆔 Nuevo session_id generado: %s...", session_id[:8])
             
             # PASO 2: Crear sesión siguiendo patrón oficial (una sola vez)
             if self.runner and self.session_service:
@@ -111,10 +150,10 @@ class ADKAgent:
                         user_id=user_id,
                         session_id=session_id
                     )
-                    print(f"✅ [ADK AGENT] Sesión creada: {session_id[:8]}...")
+                    logger.debug("✅ Sesión creada: %s...", session_id[:8])
                 except Exception as session_error:
                     # Si la sesión ya existe, continuar (esto es normal)
-                    print(f"ℹ️  [ADK AGENT] Sesión ya existe o error: {session_error}")
+                    logger.debug("ℹ️  Sesión ya existe o error: %s", session_error)
             
             # PASO 3: Crear contenido para ADK
             content = types.Content(
@@ -134,11 +173,10 @@ class ADKAgent:
                 ):
                     if event.is_final_response() and event.content and event.content.parts:
                         final_response_text = event.content.parts[0].text
-                        print(f"✅ [ADK AGENT] Respuesta final obtenida: {final_response_text[:100]}...")
+                        logger.debug("✅ Respuesta final obtenida: %s...", final_response_text[:100])
                 
-                # PASO 5: AGREGAR SESIÓN A MEMORIA (siguiendo patrón oficial)
-                print(f"🧠 [ADK AGENT] Agregando sesión a memoria...")
-                await self._add_session_to_memory(user_id, session_id)
+                # PASO 5: AGREGAR LOS EVENTOS NUEVOS A MEMORIA (en segundo plano, fuera de la respuesta)
+                self._schedule_memory_ingest(user_id, session_id)
                 
                 return final_response_text, session_id
             else:
@@ -146,13 +184,13 @@ class ADKAgent:
                 return self._generate_fallback_response(message), session_id
             
         except Exception as e:
-            print(f"❌ [ADK AGENT] Error: {e}")
+            logger.error("❌ Error: %s", e)
             return self._generate_fallback_response(message), session_id or str(uuid.uuid4())
     
     async def search_memory(self, user_id: str, query: str):
         """Buscar en la memoria ADK siguiendo el patrón oficial."""
         try:
-            print(f"🔍 [ADK AGENT] Buscando memoria para usuario {user_id} con query: {query}")
+            logger.debug("🔍 Buscando memoria para usuario %s con query: %s", user_id, query)
             
             if self.memory_service:
                 search_result = await self.memory_service.search_memory(
@@ -162,35 +200,143 @@ class ADKAgent:
                 )
                 
                 if search_result and hasattr(search_result, 'memories') and search_result.memories:
-                    print(f"✅ [ADK AGENT] Encontradas {len(search_result.memories)} memorias relevantes")
+                    logger.debug("✅ Encontradas %s memorias relevantes", len(search_result.memories))
                     return search_result
                 else:
-                    print("ℹ️  [ADK AGENT] No se encontraron memorias relevantes")
+                    logger.debug("ℹ️  No se encontraron memorias relevantes")
                     return None
             else:
-                print("⚠️  [ADK AGENT] Servicio de memoria no disponible")
+                logger.warning("⚠️  Servicio de memoria no disponible")
                 return None
                 
         except Exception as e:
-            print(f"❌ [ADK AGENT] Error buscando memoria: {e}")
+            logger.error("❌ Error buscando memoria: %s", e)
             return None
     
+    def _schedule_memory_ingest(self, user_id: str, session_id: str):
+        """Encolar la sesión para añadir sus eventos nuevos a memoria en segundo plano.
+        
+        Una única tarea procesa las sesiones pendientes; si una sesión recibe
+        varios turnos antes de procesarse, se añade una sola vez.
+        """
+        key = (user_id, session_id)
+        if key in self._pending_ingest:
+            self.ingest_stats["coalesced"] += 1
+            return
+        self._pending_ingest.add(key)
+        if self._ingest_task is None or self._ingest_task.done():
+            self._ingest_task = asyncio.create_task(self._ingest_pending())
+    
+    async def _ingest_pending(self):
+        """Procesar las sesiones pendientes hasta vaciar el conjunto."""
+        while self._pending_ingest:
+            user_id, session_id = self._pending_ingest.pop()
+            started = time.perf_counter()
+            await self._add_session_to_memory(user_id, session_id)
+            self.stage_timings.record("memory_ingest", time.perf_counter() - started)
+    
     async def _add_session_to_memory(self, user_id: str, session_id: str):
-        """Agregar sesión a memoria ADK siguiendo el patrón oficial."""
+        """Agregar a la memoria ADK sólo los eventos de la sesión posteriores a la última ingesta.
+        
+        Volver a añadir la sesión completa en cada turno costaría cada vez más
+        a medida que crece la conversación (O(n²) en total) e indexaría de
+        nuevo los mismos eventos.
+        """
+        key = (user_id, session_id)
+        start = self._ingested.get(key, 0)
         try:
-            # Obtener la sesión completa del session_service
-            completed_session = await self.session_service.get_session(
-                app_name="adk_agent", 
-                user_id=user_id, 
-                session_id=session_id
-            )
+            if hasattr(self.session_service, "get_events_since"):
+                events = await self.session_service.get_events_since(
+                    app_name="adk_agent", user_id=user_id, session_id=session_id, start=start
+                )
+            else:
+                session = await self.session_service.get_session(
+                    app_name="adk_agent", user_id=user_id, session_id=session_id
+                )
+                events = session.events[start:] if session else None
+            if not events:
+                return
             
-            # Agregar a memoria siguiendo el patrón oficial de la documentación
-            await self.memory_service.add_session_to_memory(completed_session)
-            print(f"🧠 [ADK AGENT] Sesión {session_id[:8]}... agregada a memoria para búsquedas futuras")
+            try:
+                if not hasattr(self.memory_service, "add_events_to_memory"):
+                    raise NotImplementedError
+                await self.memory_service.add_events_to_memory(
+                    app_name="adk_agent", user_id=user_id, events=events, session_id=session_id
+                )
+            except NotImplementedError:
+                # Servicio de memoria (o versión de ADK) sin ingesta incremental: sesión completa
+                self.ingest_stats["full_session_fallbacks"] += 1
+                completed_session = await self.session_service.get_session(
+                    app_name="adk_agent", user_id=user_id, session_id=session_id
+                )
+                await self.memory_service.add_session_to_memory(completed_session)
+            
+            self._ingested[key] = start + len(events)
+            self._ingested.move_to_end(key)
+            # Olvidar la posición de sesiones antiguas: si vuelven, se reenvían
+            # sus eventos y el servicio de memoria descarta los repetidos por id
+            while len(self._ingested) > self._max_tracked_sessions:
+                self._ingested.popitem(last=False)
+            self.ingest_stats["runs"] += 1
+            self.ingest_stats["events"] += len(events)
+            logger.debug("🧠 %s eventos nuevos de la sesión %s... agregados a memoria", len(events), session_id[:8])
             
         except Exception as e:
-            print(f"⚠️  [ADK AGENT] Error agregando sesión a memoria: {e}")
+            logger.warning("⚠️  Error agregando sesión a memoria: %s", e)
+    
+    def start_background_tasks(self):
+        """Lanzar el punto de control periódico (lo llama el servidor al arrancar)."""
+        if self.checkpoint_interval > 0 and (self._checkpoint_task is None or self._checkpoint_task.done()):
+            self._checkpoint_task = asyncio.create_task(self._checkpoint_loop())
+    
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            await self.checkpoint()
+    
+    async def checkpoint(self):
+        """Guardar el estado en proceso: sesiones modificadas e instantánea de la memoria.
+        
+        Si el proceso muere sin pasar por shutdown(), sólo se pierde lo
+        ocurrido desde el último punto de control.
+        """
+        started = time.perf_counter()
+        try:
+            if getattr(self, "session_service", None) is not None:
+                await self.session_service.flush()
+            if hasattr(getattr(self, "memory_service", None), "snapshot"):
+                await self.memory_service.snapshot()
+            self.stage_timings.record("checkpoint", time.perf_counter() - started)
+        except Exception as e:
+            self.stage_timings.record("checkpoint", time.perf_counter() - started, "error")
+            logger.warning("⚠️  Error en el punto de control: %s", e)
+    
+    async def shutdown(self):
+        """Terminar la ingesta en memoria pendiente y guardar en disco las sesiones que siguen en memoria."""
+        if self._checkpoint_task is not None:
+            self._checkpoint_task.cancel()
+            await asyncio.gather(self._checkpoint_task, return_exceptions=True)
+        if self._ingest_task is not None:
+            await asyncio.gather(self._ingest_task, return_exceptions=True)
+        if hasattr(getattr(self, "memory_service", None), "close"):
+            await self.memory_service.close()
+        if getattr(self, "session_service", None) is not None:
+            await self.session_service.close()
+    
+    def get_runtime_stats(self):
+        """Métricas en tiempo de ejecución (sesiones en memoria y en disco, ingesta en memoria)."""
+        session_service = getattr(self, "session_service", None)
+        memory_service = getattr(self, "memory_service", None)
+        return {
+            "session_service": session_service.get_stats() if session_service else None,
+            "memory_service": memory_service.get_stats() if hasattr(memory_service, "get_stats") else None,
+            "memory_ingest": {
+                **self.ingest_stats,
+                "pending": len(self._pending_ingest),
+                "tracked_sessions": len(self._ingested),
+            },
+            "stages": self.stage_timings.get_stats(),
+        }
     
     def _generate_fallback_response(self, message: str):
         """Generar respuesta de fallback cuando el agente ADK no está disponible."""
@@ -210,22 +356,23 @@ class ADKAgent:
     
     def get_memory_service_info(self):
         """Obtener información del servicio de memoria configurado."""
+        memory_type = type(getattr(self, "memory_service", None)).__name__
         return {
-            "type": "ADK InMemoryMemoryService + InMemorySessionService (Patrón Oficial)",
+            "type": f"ADK {memory_type} + SessionService acotado con volcado a disco (Patrón Oficial)",
             "features": [
-                "📝 InMemorySessionService para sesiones (recomendado para desarrollo)",
-                "🧠 InMemoryMemoryService para memoria persistente",
+                "📝 Sesiones calientes en memoria (LRU con límite), el resto en SQLite",
+                f"🧠 {memory_type} para memoria persistente (SQLite + FTS5 por defecto)",
                 "🔧 Herramienta load_memory integrada automáticamente",
-                "🔄 Agregado automático de sesiones a memoria",
-                "🔍 Búsqueda de memorias por query semántica",
+                "🔄 Agregado incremental (sólo eventos nuevos) de sesiones a memoria en segundo plano",
+                "🔍 Búsqueda de memorias por palabras clave (índice FTS5, BM25) por usuario",
                 "✅ Siguiendo patrón oficial de documentación ADK"
             ],
             "status": "✅ Configurado siguiendo patrón oficial ADK",
             "memory_workflow": [
                 "1. Usuario envía mensaje",
                 "2. ADK Runner procesa con LlmAgent + load_memory tool",
-                "3. Sesión se guarda en InMemorySessionService",
-                "4. Sesión se agrega a InMemoryMemoryService para búsquedas",
+                "3. Sesión se guarda en memoria y, al expulsarse o al apagar, en disco",
+                "4. Los eventos nuevos de la sesión se agregan a la memoria en segundo plano",
                 "5. Futuras consultas usan load_memory tool automáticamente"
             ],
             "documentation_reference": "https://google.github.io/adk-docs/sessions/memory/"
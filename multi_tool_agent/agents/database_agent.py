@@ -3,188 +3,67 @@ Agente con Base de Datos Integral - Usa SQLite completo para memoria persistente
 """
 
 import os
-import sqlite3
+import time
+import logging
 import uuid
 import asyncio
+import contextlib
 from google.genai import types
 from dotenv import load_dotenv
 
+from ..storage import create_memory_store
+from ..storage import text_search
+from ..storage.write_behind import TurnRecord, WriteBehindQueue
+from ..storage.retention import RetentionManager, RetentionWorker
+from ..logging_setup import redact_secret
+from ..memory import (ContextCache, SharedContextCache, ContextBuilder, ContextSection, ContextItem, RuleEngine,
+                      StageTimings, format_timings, ResponseCache, context_fingerprint)
+
 # Cargar variables de entorno
 load_dotenv()
 
-class DatabaseMemorySystem:
-    """Sistema de memoria persistente completo usando SQLite."""
-    
-    def __init__(self, db_path: str = "database_agent_sessions.db"):
-        self.db_path = db_path
-        self._init_db()
-        print(f"✅ [DATABASE AGENT] Base de datos inicializada: {db_path}")
-    
-    def _init_db(self):
-        """Inicializar base de datos SQLite con esquema completo."""
-        conn = sqlite3.connect(self.db_path)
-        
-        # Tabla de memorias de usuario
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS user_memories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                session_id TEXT NOT NULL,
-                key TEXT NOT NULL,
-                value TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Tabla de conversaciones
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS conversation_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                session_id TEXT NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Tabla de sesiones
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS sessions (
-                id TEXT PRIMARY KEY,
-                user_id TEXT NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                last_activity DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Tabla de contexto semántico
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS semantic_context (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                session_id TEXT NOT NULL,
-                context_type TEXT NOT NULL,
-                content TEXT NOT NULL,
-                relevance_score REAL DEFAULT 1.0,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
-    
-    def save_memory(self, user_id: str, session_id: str, key: str, value: str):
-        """Guardar memoria del usuario."""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("""
-            INSERT OR REPLACE INTO user_memories 
-            (user_id, session_id, key, value, timestamp)
-            VALUES (?, ?, ?, ?, datetime('now'))
-        """, (user_id, session_id, key, value))
-        conn.commit()
-        conn.close()
-    
-    def get_memories(self, user_id: str):
-        """Obtener todas las memorias de un usuario."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.execute("""
-            SELECT DISTINCT key, value, timestamp 
-            FROM user_memories 
-            WHERE user_id = ? 
-            ORDER BY timestamp DESC
-        """, (user_id,))
-        memories = cursor.fetchall()
-        conn.close()
-        return memories
-    
-    def log_conversation(self, user_id: str, session_id: str, role: str, content: str):
-        """Registrar conversación."""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("""
-            INSERT INTO conversation_log 
-            (user_id, session_id, role, content, timestamp)
-            VALUES (?, ?, ?, ?, datetime('now'))
-        """, (user_id, session_id, role, content))
-        conn.commit()
-        conn.close()
-    
-    def get_or_create_session(self, user_id: str, session_id: str = None):
-        """Obtener sesión existente o crear nueva."""
-        if not session_id:
-            session_id = str(uuid.uuid4())
-        
-        conn = sqlite3.connect(self.db_path)
-        
-        # Verificar si la sesión existe
-        cursor = conn.execute("""
-            SELECT id FROM sessions WHERE id = ?
-        """, (session_id,))
-        
-        if not cursor.fetchone():
-            # Crear nueva sesión
-            conn.execute("""
-                INSERT INTO sessions (id, user_id, created_at, last_activity)
-                VALUES (?, ?, datetime('now'), datetime('now'))
-            """, (session_id, user_id))
-        else:
-            # Actualizar última actividad
-            conn.execute("""
-                UPDATE sessions SET last_activity = datetime('now')
-                WHERE id = ?
-            """, (session_id,))
-        
-        conn.commit()
-        conn.close()
-        return session_id
-    
-    def get_conversation_history(self, user_id: str, limit: int = 10):
-        """Obtener historial de conversaciones."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.execute("""
-            SELECT role, content, timestamp 
-            FROM conversation_log 
-            WHERE user_id = ? 
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        """, (user_id, limit))
-        history = cursor.fetchall()
-        conn.close()
-        return history
-    
-    def search_semantic_context(self, user_id: str, query: str):
-        """Búsqueda semántica básica en contexto."""
-        conn = sqlite3.connect(self.db_path)
-        
-        # Búsqueda simple por palabras clave
-        query_terms = query.lower().split()
-        conditions = []
-        params = [user_id]
-        
-        for term in query_terms:
-            conditions.append("content LIKE ?")
-            params.append(f"%{term}%")
-        
-        where_clause = " AND ".join(conditions)
-        
-        cursor = conn.execute(f"""
-            SELECT content, relevance_score, timestamp 
-            FROM semantic_context 
-            WHERE user_id = ? AND ({where_clause})
-            ORDER BY relevance_score DESC, timestamp DESC
-            LIMIT 5
-        """, params)
-        
-        results = cursor.fetchall()
-        conn.close()
-        return results
+logger = logging.getLogger(__name__)
 
 class DatabaseAgent:
     """Agente que usa base de datos integral para memoria persistente siguiendo el patrón LlmAgent."""
     
     def __init__(self):
         self._setup_environment()
-        self.memory_system = DatabaseMemorySystem()
+        # Almacén de memoria asíncrono (SQLite, en memoria o PostgreSQL según MEMORY_STORE_BACKEND)
+        self.memory = create_memory_store()
+        # Sistema SQLite subyacente (sólo con el backend sqlite)
+        self.memory_system = getattr(self.memory, "memory_system", None)
+        # Caché de segmentos de contexto por usuario (se invalida al confirmar escrituras)
+        self.context_cache = self._setup_context_cache()
+        # Reglas de extracción de memorias, compiladas una sola vez
+        self.extractor = RuleEngine.from_config(os.getenv("MEMORY_EXTRACTION_RULES"))
+        # Ensamblado del contexto con presupuesto de tokens
+        self.context_builder = ContextBuilder(
+            budget_tokens=int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000")),
+            max_item_tokens=int(os.getenv("CONTEXT_MAX_ITEM_TOKENS", "200")),
+            priority=os.getenv("CONTEXT_SECTION_PRIORITY", "memories,history,semantic").split(","),
+        )
+        # Tiempo máximo de cada lectura de contexto: si se agota, el turno sigue sin esa sección
+        self.lookup_timeouts = {
+            segment: float(os.getenv(f"CONTEXT_{segment.upper()}_TIMEOUT_MS", default)) / 1000
+            for segment, default in (("memories", "1000"), ("history", "1000"), ("semantic", "500"))
+        }
+        # Latencia de cada etapa del turno (para /health)
+        self.stage_timings = StageTimings()
+        # Escrituras de turnos en streaming que siguen en curso tras cerrar el stream
+        self._pending_saves = set()
+        # Caché opcional de respuestas por mensaje normalizado + huella del contexto
+        self.response_cache = ResponseCache.from_env("database")
+        # Cola write-behind: agrupa las escrituras de cada turno y las confirma por lotes
+        self.write_queue = WriteBehindQueue(
+            self.memory.save_turns,
+            durability=os.getenv("DATABASE_AGENT_DURABILITY", "sync"),
+            max_size=int(os.getenv("DATABASE_AGENT_WRITE_QUEUE_SIZE", "1000")),
+            on_commit=self._on_turns_committed,
+            partition_key=self.memory.shard_key,
+        )
+        # Retención, archivado y recuperación de espacio en segundo plano (backend sqlite)
+        self.retention = self._setup_retention()
         self._setup_llm_agent()
         self._setup_runner()
     
@@ -205,8 +84,69 @@ class DatabaseAgent:
         # FORZAR uso de Google AI Studio
         os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "FALSE"
 
-        print(f"✅ [DATABASE AGENT] API Key cargada: {api_key[:10]}...{api_key[-5:]}")
-        print("🔧 [DATABASE AGENT] Configurado para usar Google AI Studio (NO Vertex AI)")
+        logger.info("✅ API Key cargada: %s", redact_secret(api_key))
+        logger.info("🔧 Configurado para usar Google AI Studio (NO Vertex AI)")
+    
+    def _setup_context_cache(self):
+        """Configurar la caché de contexto: memory (por proceso), shared (entre workers) u off."""
+        backend = os.getenv("CONTEXT_CACHE_BACKEND", "memory").lower()
+        max_entries = int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", "10000"))
+        ttl_seconds = float(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "300"))
+        
+        if backend == "off":
+            logger.info("ℹ️  Caché de contexto desactivada")
+            return None
+        if backend == "shared":
+            cache_path = os.getenv("CONTEXT_CACHE_SHARED_PATH", "context_cache.db")
+            logger.info("✅ Caché de contexto compartida: %s", cache_path)
+            return SharedContextCache(cache_path, max_entries=max_entries, ttl_seconds=ttl_seconds)
+        
+        logger.info("✅ Caché de contexto en memoria (%s entradas, TTL %.0fs)", max_entries, ttl_seconds)
+        return ContextCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    
+    def _setup_retention(self):
+        """Configurar la tarea periódica de retención (RETENTION_INTERVAL_SECONDS=0 la desactiva)."""
+        interval = float(os.getenv("RETENTION_INTERVAL_SECONDS", "600"))
+        if self.memory_system is None or interval <= 0:
+            return None
+        manager = RetentionManager(self.memory_system, on_expire=self._on_rows_expired)
+        policies = ", ".join(
+            f"{p.table} (días={p.max_age_days:g}, filas/usuario={p.max_rows_per_user})" for p in manager.policies
+        ) or "sin políticas, sólo recuperación de espacio"
+        logger.info("✅ Retención cada %.0fs: %s", interval, policies)
+        return RetentionWorker(manager, interval)
+    
+    def _on_rows_expired(self, table, user_ids):
+        """Las filas caducadas no deben seguir en el contexto cacheado."""
+        segment = {"conversation_log": "history", "semantic_context": "semantic"}.get(table)
+        if self.context_cache is None or segment is None:
+            return
+        for user_id in user_ids:
+            self.context_cache.invalidate(user_id, [segment])
+    
+    def start_background_tasks(self):
+        """Arrancar las tareas periódicas (se llama con el event loop del servidor en marcha)."""
+        if self.retention is not None:
+            self.retention.start()
+    
+    async def _on_turns_committed(self, records):
+        """Invalidar exactamente los segmentos que ha modificado cada turno confirmado."""
+        if self.context_cache is None:
+            return
+        await self._cache_call(self._invalidate_turns, records)
+    
+    def _invalidate_turns(self, records):
+        for record in records:
+            segments = ["history", "semantic"]
+            if record.memories:
+                segments.append("memories")
+            self.context_cache.invalidate(record.user_id, segments)
+    
+    async def _cache_call(self, method, *args):
+        """Llamar a la caché de contexto; la compartida (SQLite) desde un hilo, sin bloquear el event loop."""
+        if self.context_cache.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
     
     def _setup_llm_agent(self):
         """Configurar el LlmAgent siguiendo el patrón estándar de ADK."""
@@ -216,7 +156,7 @@ class DatabaseAgent:
             
             # Obtener modelo desde variables de entorno
             model = os.getenv("AGENT_MODEL", "gemini-2.0-flash")
-            print(f"🤖 [DATABASE AGENT] Usando modelo: {model}")
+            logger.info("🤖 Usando modelo: %s", model)
             
             # Crear LlmAgent con configuración estándar (sin herramientas por ahora)
             self.llm_agent = LlmAgent(
@@ -230,22 +170,22 @@ class DatabaseAgent:
                 )
                 # tools=[load_memory]  # Comentado temporalmente para evitar function calls
             )
-            print("✅ [DATABASE AGENT] LlmAgent configurado siguiendo patrón ADK")
+            logger.info("✅ LlmAgent configurado siguiendo patrón ADK")
             
         except Exception as e:
-            print(f"❌ [DATABASE AGENT] Error configurando LlmAgent: {e}")
+            logger.error("❌ Error configurando LlmAgent: %s", e)
             self.llm_agent = None
     
     def _setup_runner(self):
         """Configurar el Runner con servicios personalizados."""
         try:
             from google.adk import Runner
+            from google.adk.agents.run_config import RunConfig, StreamingMode
             from google.adk.sessions import DatabaseSessionService
             from google.adk.memory import InMemoryMemoryService
             
             # Configurar servicios personalizados con base de datos separada para ADK
-            db_url = "sqlite:///./database_agent_adk_sessions.db"
-            self.session_service = DatabaseSessionService(db_url=db_url)
+            self.session_service = self._create_session_service(DatabaseSessionService)
             
             # Crear Runner con LlmAgent y servicios personalizados
             self.runner = Runner(
@@ -253,171 +193,438 @@ class DatabaseAgent:
                 app_name="database_agent",
                 session_service=self.session_service,
             )
-            print("✅ [DATABASE AGENT] Runner configurado con servicios personalizados")
+            # run_stream(): eventos parciales con el texto a medida que llega
+            self.stream_config = RunConfig(streaming_mode=StreamingMode.SSE)
+            logger.info("✅ Runner configurado con servicios personalizados")
             
         except Exception as e:
-            print(f"❌ [DATABASE AGENT] Error configurando Runner: {e}")
+            logger.error("❌ Error configurando Runner: %s", e)
             self.runner = None
+            self.stream_config = None
+    
+    def _create_session_service(self, service_class):
+        """Crear el DatabaseSessionService de ADK.
+        
+        Las versiones recientes de ADK exigen un driver SQLite asíncrono y las
+        anteriores uno síncrono; se prueba primero la URL configurada.
+        """
+        db_file = "./database_agent_adk_sessions.db"
+        candidate_urls = [
+            os.getenv("DATABASE_AGENT_ADK_DB_URL", f"sqlite:///{db_file}"),
+            f"sqlite+aiosqlite:///{db_file}",
+        ]
+        last_error = None
+        for db_url in candidate_urls:
+            try:
+                return service_class(db_url=db_url)
+            except Exception as e:
+                last_error = e
+        raise last_error
     
     async def run(self, user_id: str, message: str, session_id: str = None):
         """Ejecutar agente siguiendo el patrón estándar de ADK."""
         
-        print(f"🧠 [DATABASE AGENT] Ejecutando para usuario: {user_id}")
+        logger.debug("🧠 Ejecutando para usuario: %s", user_id)
+        turn_started = time.perf_counter()
         
         try:
             # PASO 1: Generar session_id si no existe
             if not session_id:
                 session_id = str(uuid.uuid4())
-                print(f"🆔 [DATABASE AGENT] Nuevo session_id generado: {session_id[:8]}...")
-            
-            # PASO 2: CREAR SESIÓN EN ADK ANTES DE EJECUTAR
-            if self.runner and self.session_service:
-                try:
-                    # Crear sesión en ADK
-                    await self.session_service.create_session(
-                        app_name="database_agent",
-                        user_id=user_id,
-                        session_id=session_id
-                    )
-                    print(f"✅ [DATABASE AGENT] Sesión creada en ADK: {session_id[:8]}...")
-                except Exception as session_error:
-                    print(f"⚠️  [DATABASE AGENT] Error creando sesión: {session_error}")
-                    # Continuar sin sesión ADK si falla
-            
-            # PASO 3: Preparar contexto de memoria personalizada
-            memory_context = self._prepare_memory_context(user_id, message)
-            
-            # PASO 4: Crear mensaje con contexto personalizado
-            full_message = memory_context + f"Usuario: {message}"
+                logger.debug("🆔 Nuevo session_id generado: %s...", session_id[:8])
             
-            # PASO 5: Crear contenido para ADK
-            content = types.Content(
-                role='user', 
-                parts=[types.Part(text=full_message)]
-            )
+            # PASO 2 a 5: sesión en ADK y mensaje con el contexto de memoria personalizada
+            timings = {}
+            content, fingerprint = await self._prepare_turn(user_id, message, session_id, timings)
             
-            # PASO 6: Ejecutar con Runner estándar de ADK
+            # PASO 6: Ejecutar con el Runner asíncrono de ADK (no bloquea el event loop)
             if self.runner:
-                events = self.runner.run(
-                    user_id=user_id,
-                    session_id=session_id,
-                    new_message=content
-                )
-                
-                # PASO 6: Procesar respuesta siguiendo patrón ADK
-                response = await self._process_adk_response(events)
+                # Mismo mensaje con el mismo contexto: respuesta cacheada sin llamar al modelo
+                response = self._cached_response(message, fingerprint)
+                if response is None:
+                    events = self.runner.run_async(
+                        user_id=user_id,
+                        session_id=session_id,
+                        new_message=content
+                    )
+                    
+                    # PASO 6: Procesar respuesta siguiendo patrón ADK
+                    started = time.perf_counter()
+                    response = await self._process_adk_response(events)
+                    self._record_stage(timings, "llm", started)
+                    if response:
+                        self._store_response(message, fingerprint, response)
+                    else:
+                        response = self._generate_fallback_response("")
+                # Sin streaming el primer token llega con la respuesta completa
+                self._record_stage(timings, "ttft", turn_started)
                 
                 # PASO 7: Guardar información personalizada
-                self._save_personal_memory(user_id, session_id, message, response)
+                started = time.perf_counter()
+                await self._save_personal_memory(user_id, session_id, message, response)
+                self._record_stage(timings, "save", started)
                 
+                self._log_turn(user_id, session_id, timings)
                 return response, session_id
             else:
                 # Fallback si no hay runner
                 return self._generate_fallback_response(message), session_id
             
         except Exception as e:
-            print(f"❌ [DATABASE AGENT] Error: {e}")
+            logger.error("❌ Error: %s", e)
             return self._generate_fallback_response(message), session_id or str(uuid.uuid4())
     
-    def _prepare_memory_context(self, user_id: str, message: str):
-        """Preparar contexto de memoria personalizada."""
-        context_parts = []
+    async def run_stream(self, user_id: str, message: str, session_id: str = None):
+        """Ejecutar un turno enviando el texto a medida que lo genera el modelo.
         
-        # Obtener memorias personales
-        memories = self.memory_system.get_memories(user_id)
-        if memories:
-            memory_context = "\n--- INFORMACIÓN PERSONAL RECORDADA ---\n"
-            for key, value, timestamp in memories:
-                memory_context += f"- {key}: {value}\n"
-            memory_context += "--- FIN INFORMACIÓN ---\n\n"
-            context_parts.append(memory_context)
+        Genera eventos ``{"type": "session" | "delta" | "done", ...}``. La
+        memoria del turno se guarda en segundo plano al cerrar el stream: el
+        cliente no espera a la escritura. Si el cliente se va antes de
+        terminar, el turno no se guarda (igual que /chat).
+        """
+        logger.debug("🧠 Ejecutando en streaming para usuario: %s", user_id)
+        turn_started = time.perf_counter()
+        session_id = session_id or str(uuid.uuid4())
+        yield {"type": "session", "session_id": session_id}
         
-        # Obtener historial de conversaciones
-        conversation_history = self.memory_system.get_conversation_history(user_id, limit=5)
-        if conversation_history:
-            history_context = "\n--- HISTORIAL DE CONVERSACIÓN ---\n"
-            for role, content, timestamp in reversed(conversation_history):
-                history_context += f"{role.upper()}: {content}\n"
-            history_context += "--- FIN HISTORIAL ---\n\n"
-            context_parts.append(history_context)
+        timings = {}
+        chunks = []
+        completed = False
+        try:
+            content, fingerprint = await self._prepare_turn(user_id, message, session_id, timings)
+            cached = self._cached_response(message, fingerprint) if self.runner else None
+            if cached is not None:
+                self._record_stage(timings, "ttft", turn_started)
+                chunks.append(cached)
+                completed = True
+                yield {"type": "delta", "text": cached}
+            elif self.runner:
+                events = self.runner.run_async(
+                    user_id=user_id,
+                    session_id=session_id,
+                    new_message=content,
+                    run_config=self.stream_config,
+                )
+                started = time.perf_counter()
+                async with contextlib.aclosing(self._stream_adk_response(events)) as stream:
+                    async for text in stream:
+                        if not chunks:
+                            self._record_stage(timings, "ttft", turn_started)
+                        chunks.append(text)
+                        yield {"type": "delta", "text": text}
+                self._record_stage(timings, "llm", started)
+                completed = bool(chunks)
+                if completed:
+                    self._store_response(message, fingerprint, "".join(chunks))
+        except Exception as e:
+            logger.error("❌ Error en streaming: %s", e)
         
-        # Búsqueda semántica en contexto
-        semantic_results = self.memory_system.search_semantic_context(user_id, message)
-        if semantic_results:
-            semantic_context = "\n--- CONTEXTO SEMÁNTICO RELEVANTE ---\n"
-            for content, score, timestamp in semantic_results:
-                semantic_context += f"📝 {content} (relevancia: {score:.2f})\n"
-            semantic_context += "--- FIN CONTEXTO SEMÁNTICO ---\n\n"
-            context_parts.append(semantic_context)
+        if not chunks:
+            # Sin runner o sin texto del modelo: respuesta de fallback en un solo fragmento
+            chunks.append(self._generate_fallback_response(message))
+            self._record_stage(timings, "ttft", turn_started, "fallback")
+            yield {"type": "delta", "text": chunks[0]}
         
-        return "".join(context_parts)
+        response = "".join(chunks)
+        # Sólo se guardan las respuestas completas del modelo (no el fallback ni un texto cortado)
+        if completed:
+            self._save_in_background(user_id, session_id, message, response)
+        self._log_turn(user_id, session_id, timings, streaming=True)
+        yield {
+            "type": "done",
+            "session_id": session_id,
+            "response": response,
+            "ttft_ms": round(timings["ttft"][0] * 1000, 1),
+        }
+    
+    async def _stream_adk_response(self, events):
+        """Fragmentos de texto de los eventos de ADK en modo streaming (SSE).
+        
+        Los eventos ``partial`` traen el texto nuevo; el evento final repite la
+        respuesta completa y sólo se usa si no llegó ningún fragmento (modelo
+        o agente sin streaming).
+        """
+        streamed = False
+        try:
+            async for event in events:
+                parts = event.content.parts if event.content and event.content.parts else []
+                text = "".join(part.text for part in parts if part.text and not part.thought)
+                if event.partial:
+                    if text:
+                        streamed = True
+                        yield text
+                    continue
+                if event.is_final_response():
+                    if text and not streamed:
+                        yield text
+                    if text or streamed:
+                        break
+        finally:
+            # Liberar el generador del Runner (y la llamada al modelo en curso)
+            await events.aclose()
+    
+    def _save_in_background(self, user_id: str, session_id: str, message: str, response: str):
+        """Guardar el turno sin que el stream lo espere; shutdown() espera a las pendientes."""
+        async def save():
+            started = time.perf_counter()
+            await self._save_personal_memory(user_id, session_id, message, response)
+            self.stage_timings.record("save", time.perf_counter() - started)
+        
+        task = asyncio.create_task(save())
+        self._pending_saves.add(task)
+        task.add_done_callback(self._pending_saves.discard)
+    
+    async def _prepare_turn(self, user_id: str, message: str, session_id: str, timings):
+        """Crear la sesión en ADK y el mensaje con el contexto de memoria, a la vez.
+        
+        Devuelve el contenido para ADK y la huella del contexto para la caché de
+        respuestas (None si el turno no puede usarla).
+        """
+        new_session, memory_context = await asyncio.gather(
+            self._create_adk_session(user_id, session_id, timings),
+            self._prepare_memory_context(user_id, message, timings),
+        )
+        
+        # Mensaje con contexto personalizado como contenido para ADK
+        full_message = memory_context + f"Usuario: {message}"
+        content = types.Content(
+            role='user', 
+            parts=[types.Part(text=full_message)]
+        )
+        
+        fingerprint = None
+        if self.response_cache is not None:
+            if new_session:
+                model = self.llm_agent.model
+                model_name = model if isinstance(model, str) else model.model
+                fingerprint = context_fingerprint(model_name, self.llm_agent.instruction, memory_context)
+            else:
+                # En una sesión que continúa el modelo también ve los eventos
+                # anteriores de ADK, que no forman parte de la huella
+                self.response_cache.bypass()
+        return content, fingerprint
+    
+    def _cached_response(self, message: str, fingerprint):
+        if fingerprint is None:
+            return None
+        response = self.response_cache.get(message, fingerprint)
+        if response is not None:
+            logger.debug("🗃️  Respuesta servida desde la caché (sin llamada al modelo)")
+        return response
+    
+    def _store_response(self, message: str, fingerprint, response: str):
+        if fingerprint is not None:
+            self.response_cache.set(message, fingerprint, response)
+    
+    async def _create_adk_session(self, user_id: str, session_id: str, timings):
+        """Crear la sesión en ADK antes de ejecutar (si falla se continúa sin ella).
+        
+        Devuelve True si la sesión es nueva (sin eventos anteriores).
+        """
+        if not (self.runner and self.session_service):
+            return False
+        started = time.perf_counter()
+        try:
+            await self.session_service.create_session(
+                app_name="database_agent",
+                user_id=user_id,
+                session_id=session_id
+            )
+            logger.debug("✅ Sesión creada en ADK: %s...", session_id[:8])
+            self._record_stage(timings, "session", started)
+            return True
+        except Exception as session_error:
+            logger.warning("⚠️  Error creando sesión: %s", session_error)
+            self._record_stage(timings, "session", started, "error")
+            return False
+    
+    def _log_turn(self, user_id: str, session_id: str, timings, streaming: bool = False):
+        """Un registro INFO por turno con la latencia de cada etapa como campos."""
+        logger.info("⏱️  Etapas: %s", format_timings(timings), extra={
+            "user_id": user_id,
+            "session_id": session_id,
+            "streaming": streaming,
+            "stages_ms": {stage: round(seconds * 1000, 1) for stage, (seconds, _) in timings.items()},
+        })
+    
+    def _record_stage(self, timings, stage: str, started: float, outcome: str = "ok"):
+        elapsed = time.perf_counter() - started
+        timings[stage] = (elapsed, outcome)
+        self.stage_timings.record(stage, elapsed, outcome)
+    
+    async def _prepare_memory_context(self, user_id: str, message: str, timings=None):
+        """Preparar contexto de memoria personalizada dentro del presupuesto de tokens.
+        
+        Las tres lecturas son independientes y se lanzan a la vez; cada una
+        tiene su propio tiempo máximo y, si se agota, su sección queda vacía.
+        """
+        timings = {} if timings is None else timings
+        memories, conversation_history, semantic_results = await asyncio.gather(
+            # Memorias personales (las más recientes primero)
+            self._timed_lookup(timings, "memories", self._cached_segment(
+                user_id, "memories", lambda: self.memory.get_memories(user_id)
+            )),
+            # Historial de conversaciones (en orden cronológico; pesan más los recientes)
+            self._timed_lookup(timings, "history", self._cached_segment(
+                user_id, "history", lambda: self.memory.get_conversation_history(user_id, limit=5)
+            )),
+            # Búsqueda semántica en contexto
+            self._timed_lookup(timings, "semantic", self._cached_segment(
+                user_id, "semantic", lambda: self.memory.search_semantic_context(user_id, message),
+                variant=" ".join(text_search.normalize_text(message).split()),
+            )),
+        )
+        
+        started = time.perf_counter()
+        sections = [
+            ContextSection(
+                "memories",
+                "\n--- INFORMACIÓN PERSONAL RECORDADA ---\n",
+                "--- FIN INFORMACIÓN ---\n\n",
+                [ContextItem(f"- {key}: {value}", score=-position)
+                 for position, (key, value, timestamp) in enumerate(memories)],
+            ),
+            ContextSection(
+                "history",
+                "\n--- HISTORIAL DE CONVERSACIÓN ---\n",
+                "--- FIN HISTORIAL ---\n\n",
+                [ContextItem(f"{role.upper()}: {content}", score=position)
+                 for position, (role, content, timestamp) in enumerate(reversed(conversation_history))],
+            ),
+            ContextSection(
+                "semantic",
+                "\n--- CONTEXTO SEMÁNTICO RELEVANTE ---\n",
+                "--- FIN CONTEXTO SEMÁNTICO ---\n\n",
+                [ContextItem(f"📝 {content} (relevancia: {score:.2f})", score=score)
+                 for content, score, timestamp in semantic_results],
+            ),
+        ]
+        
+        context, metrics = self.context_builder.build(sections)
+        self._record_stage(timings, "build", started)
+        if metrics["sections"]:
+            usage = ", ".join(f"{name}={section['tokens']}" for name, section in metrics["sections"].items())
+            logger.debug("📏 Contexto: %s/%s tokens (%s)", metrics['tokens'], metrics['budget'], usage)
+        return context
+    
+    async def _timed_lookup(self, timings, segment: str, lookup):
+        """Ejecutar una lectura de contexto con su tiempo máximo; devuelve [] si falla o se agota."""
+        started = time.perf_counter()
+        task = asyncio.ensure_future(lookup)
+        timeout = self.lookup_timeouts.get(segment) or None
+        try:
+            # shield: al agotarse el tiempo la lectura sigue y deja su resultado en caché
+            rows = await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            task.add_done_callback(_discard_result)
+            logger.warning("⏳ Lectura '%s' omitida: más de %.0f ms", segment, timeout * 1000)
+            self._record_stage(timings, segment, started, "timeout")
+            return []
+        except Exception as e:
+            logger.warning("⚠️  Error leyendo '%s': %s", segment, e)
+            self._record_stage(timings, segment, started, "error")
+            return []
+        self._record_stage(timings, segment, started)
+        return rows
+    
+    async def _cached_segment(self, user_id: str, segment: str, load, variant: str = ""):
+        """Leer un segmento de contexto de la caché o de la base de datos."""
+        if self.context_cache is None:
+            return await load()
+        
+        cached = await self._cache_call(self.context_cache.get, user_id, segment, variant)
+        if cached is not None:
+            return cached
+        
+        generation = await self._cache_call(self.context_cache.current_generation, user_id)
+        rows = await load()
+        await self._cache_call(self.context_cache.set, user_id, segment, rows, variant, generation)
+        return rows
     
     async def _process_adk_response(self, events):
-        """Procesar eventos del agente siguiendo patrón ADK."""
+        """Procesar eventos del agente siguiendo patrón ADK.
+        
+        Consume el stream asíncrono de eventos hasta la primera respuesta final y
+        lo cierra en ese momento, también si la petición se cancela. Devuelve ""
+        si el modelo no generó texto.
+        """
         response = ""
-        print(f"🔍 [DATABASE AGENT] Procesando eventos del agente...")
+        logger.debug("🔍 Procesando eventos del agente...")
         
         try:
-            for event in events:
-                print(f"🔍 [DATABASE AGENT] Evento: {type(event).__name__}")
+            async for event in events:
+                logger.debug("🔍 Evento: %s", type(event).__name__)
                 
                 # Manejar diferentes tipos de eventos siguiendo patrón ADK
                 if hasattr(event, 'is_final_response') and callable(event.is_final_response):
                     if event.is_final_response():
-                        print("✅ [DATABASE AGENT] Evento final detectado")
+                        logger.debug("✅ Evento final detectado")
                         if hasattr(event, 'content') and event.content:
                             if hasattr(event.content, 'parts') and event.content.parts:
                                 response = event.content.parts[0].text
-                                print(f"📝 [DATABASE AGENT] Respuesta extraída: {response[:100]}...")
+                                logger.debug("📝 Respuesta extraída: %s...", response[:100])
                                 if response and response.strip():
                                     break
                 
                 elif hasattr(event, 'content') and event.content:
-                    print(f"📄 [DATABASE AGENT] Evento con contenido encontrado")
+                    logger.debug("📄 Evento con contenido encontrado")
                     if hasattr(event.content, 'parts') and event.content.parts:
                         for j, part in enumerate(event.content.parts):
                             if hasattr(part, 'text') and part.text:
                                 potential_response = part.text
-                                print(f"📝 [DATABASE AGENT] Parte {j+1}: {potential_response[:100]}...")
+                                logger.debug("📝 Parte %s: %s...", j+1, potential_response[:100])
                                 if potential_response and potential_response.strip():
                                     response = potential_response
-                                    print(f"✅ [DATABASE AGENT] Respuesta encontrada en parte {j+1}")
+                                    logger.debug("✅ Respuesta encontrada en parte %s", j+1)
                                     break
                         if response:
                             break
                 
                 elif hasattr(event, 'text') and event.text:
                     response = event.text
-                    print(f"✅ [DATABASE AGENT] Respuesta encontrada en event.text: {response[:100]}...")
+                    logger.debug("✅ Respuesta encontrada en event.text: %s...", response[:100])
                     break
                     
         except Exception as event_error:
-            print(f"⚠️  [DATABASE AGENT] Error procesando eventos: {event_error}")
+            logger.warning("⚠️  Error procesando eventos: %s", event_error)
             response = ""
+        finally:
+            # Liberar el generador del Runner (y la llamada al modelo en curso)
+            await events.aclose()
         
-        # Si no se encontró respuesta, usar fallback
+        # Sin respuesta: run() usa el fallback (y no lo guarda en la caché de respuestas)
         if not response or not response.strip():
-            print("⚠️  [DATABASE AGENT] No se pudo extraer respuesta del agente, usando fallback")
-            response = self._generate_fallback_response("")
+            logger.warning("⚠️  No se pudo extraer respuesta del agente, usando fallback")
+            return ""
         
         return response
     
-    def _save_personal_memory(self, user_id: str, session_id: str, message: str, response: str):
-        """Guardar información personalizada en la base de datos."""
+    async def _save_personal_memory(self, user_id: str, session_id: str, message: str, response: str):
+        """Guardar información personalizada en la base de datos.
+        
+        Todas las escrituras del turno viajan juntas en un TurnRecord que la cola
+        write-behind confirma en una única transacción.
+        """
         try:
+            record = TurnRecord(user_id=user_id, session_id=session_id)
+            
             # Registrar conversación
-            self.memory_system.log_conversation(user_id, session_id, "user", message)
+            record.messages.append(("user", message))
             if response:
-                self.memory_system.log_conversation(user_id, session_id, "agent", response)
+                record.messages.append(("agent", response))
+            
+            # Extraer información del mensaje
+            record.memories.extend(self._extract_memories(message))
             
-            # Extraer y guardar información del mensaje
-            self._extract_and_save_memories(user_id, session_id, message)
+            # Contexto semántico para búsquedas futuras
+            record.semantic.append(("user_message", message, 1.0))
+            if response:
+                record.semantic.append(("agent_response", response, 0.8))
             
-            # Guardar contexto semántico
-            self._save_semantic_context(user_id, session_id, message, response)
+            await self.write_queue.submit(record)
             
         except Exception as e:
-            print(f"⚠️  [DATABASE AGENT] Error guardando memoria personalizada: {e}")
+            logger.warning("⚠️  Error guardando memoria personalizada: %s", e)
     
     async def _generate_response(self, full_message: str):
         """Generar respuesta usando el modelo Gemini."""
@@ -425,68 +632,16 @@ class DatabaseAgent:
             response = await self.model.generate_content_async(full_message)
             return response.text
         except Exception as e:
-            print(f"❌ [DATABASE AGENT] Error generando respuesta: {e}")
+            logger.error("❌ Error generando respuesta: %s", e)
             return None
     
-    def _extract_and_save_memories(self, user_id: str, session_id: str, message: str):
-        """Extraer información del mensaje y guardarla."""
-        message_lower = message.lower()
-        
-        # Extraer nombre
-        if "me llamo" in message_lower:
-            import re
-            match = re.search(r'me llamo (\w+)', message_lower)
-            if match:
-                name = match.group(1)
-                self.memory_system.save_memory(user_id, session_id, "nombre", name.capitalize())
-                print(f"💾 [DATABASE AGENT] Nombre extraído: {name}")
-        
-        # Extraer edad
-        if "tengo" in message_lower and "años" in message_lower:
-            import re
-            match = re.search(r'tengo (\d+) años', message_lower)
-            if match:
-                age = match.group(1)
-                self.memory_system.save_memory(user_id, session_id, "edad", age)
-                print(f"💾 [DATABASE AGENT] Edad extraída: {age}")
-        
-        # Extraer preferencias
-        preference_keywords = ["me gusta", "prefiero", "favorito", "disfruto"]
-        for keyword in preference_keywords:
-            if keyword in message_lower:
-                # Extraer la frase completa después del keyword
-                import re
-                match = re.search(f'{keyword} (.+)', message_lower)
-                if match:
-                    preference = match.group(1).strip()
-                    self.memory_system.save_memory(user_id, session_id, f"preferencia_{keyword}", preference)
-                    print(f"💾 [DATABASE AGENT] Preferencia extraída: {preference}")
-    
-    def _save_semantic_context(self, user_id: str, session_id: str, message: str, response: str):
-        """Guardar contexto semántico para búsquedas futuras."""
-        try:
-            conn = sqlite3.connect(self.memory_system.db_path)
-            
-            # Guardar contexto del mensaje
-            conn.execute("""
-                INSERT INTO semantic_context 
-                (user_id, session_id, context_type, content, relevance_score)
-                VALUES (?, ?, ?, ?, ?)
-            """, (user_id, session_id, "user_message", message, 1.0))
-            
-            # Guardar contexto de la respuesta
-            if response:
-                conn.execute("""
-                    INSERT INTO semantic_context 
-                    (user_id, session_id, context_type, content, relevance_score)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (user_id, session_id, "agent_response", response, 0.8))
-            
-            conn.commit()
-            conn.close()
-            
-        except Exception as e:
-            print(f"⚠️  [DATABASE AGENT] Error guardando contexto semántico: {e}")
+    def _extract_memories(self, message: str):
+        """Extraer información personal del mensaje como pares (clave, valor)."""
+        memories = self.extractor.extract(message)
+        if memories:
+            extracted = ", ".join(f"{key}={value}" for key, value in memories)
+            logger.debug("💾 Memorias extraídas: %s", extracted)
+        return memories
     
     def _generate_fallback_response(self, message: str):
         """Generar respuesta de fallback cuando el modelo no está disponible."""
@@ -496,7 +651,7 @@ class DatabaseAgent:
         memories = []
         try:
             # Intentar obtener memorias del sistema de memoria
-            if hasattr(self, 'memory_system'):
+            if self.memory_system is not None:
                 memories = self.memory_system.get_memories("fallback_user")
         except:
             pass
@@ -525,13 +680,40 @@ class DatabaseAgent:
         else:
             return f"He recibido tu mensaje: '{message}'. Soy tu asistente con memoria persistente en base de datos. ¿En qué puedo ayudarte?"
     
+    async def shutdown(self):
+        """Confirmar los turnos pendientes y cerrar la base de datos."""
+        if self._pending_saves:
+            await asyncio.gather(*self._pending_saves, return_exceptions=True)
+        if self.retention is not None:
+            await self.retention.close()
+        await self.write_queue.close()
+        await self.memory.close()
+        if self.context_cache is not None:
+            await self._cache_call(self.context_cache.close)
+        logger.info("✅ Escrituras pendientes confirmadas y base de datos cerrada")
+    
+    def get_runtime_stats(self):
+        """Métricas en tiempo de ejecución (cola de escritura, cachés, retención y etapas)."""
+        stages = self.stage_timings.get_stats()
+        return {
+            "write_queue": self.write_queue.get_stats(),
+            "context_cache": self.context_cache.get_stats() if self.context_cache else None,
+            "context_builder": self.context_builder.get_stats(),
+            "retention": self.retention.get_stats() if self.retention else None,
+            "response_cache": self.response_cache.get_stats() if self.response_cache else None,
+            # Tiempo hasta el primer fragmento de texto: la latencia que percibe el usuario
+            "ttft": stages.get("ttft"),
+            "stages": stages,
+        }
+    
     def get_memory_service_info(self):
         """Obtener información del servicio de memoria configurado."""
+        store_info = self.memory.get_info()
         return {
-            "type": "Database SQLite System",
+            "type": f"Database System ({store_info['backend']})",
             "features": [
-                "🗄️ Base de datos SQLite completa",
-                "🧠 Búsqueda semántica básica",
+                f"🗄️ Almacén de memoria {store_info['backend']}",
+                f"🧠 Búsqueda semántica ({store_info['semantic_search']})",
                 "📝 Historial de conversaciones",
                 "💾 Memoria persistente local",
                 "🔍 Contexto semántico personalizado",
@@ -540,5 +722,10 @@ class DatabaseAgent:
             "status": "✅ Configurado y funcionando"
         }
 
+def _discard_result(task):
+    """Recoger el resultado de una lectura abandonada para que su error no quede sin consultar."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("⚠️  Lectura abandonada terminó con error: %s", task.exception())
+
 # Instancia global del agente
 # Instancia del agente se crea dinámicamente cuando se necesita
@@ -4,13 +4,32 @@ Basado en: https://google.github.io/adk-docs/sessions/express-mode/
 """
 
 import os
+import time
 import uuid
 import asyncio
+import logging
+import importlib.util
+import httpx
 from dotenv import load_dotenv
 
+from ..logging_setup import redact_secret
+from ..memory import BackgroundMemoryWriter, MemoryWrite, ResponseCache, context_fingerprint
+from ..memory.stage_timings import StageTimings
+
 # Cargar variables de entorno
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Respuestas de error de _generate_response (no se guardan en la caché de respuestas)
+NO_RESPONSE = "No pude generar una respuesta."
+GENERATION_ERROR = "Lo siento, no pude generar una respuesta en este momento."
+
+# google-genai usa aiohttp para client.aio si está instalado y httpx si no
+SDK_USES_AIOHTTP = importlib.util.find_spec("aiohttp") is not None
+# Excepciones de timeout de cada transporte (las de aiohttp derivan de asyncio.TimeoutError)
+TIMEOUT_ERRORS = (httpx.TimeoutException, asyncio.TimeoutError)
+
 class VertexAgent:
     """Agente que implementa Vertex AI Express Mode según la documentación oficial."""
     
@@ -30,13 +49,26 @@ class VertexAgent:
         os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "TRUE"
         os.environ["GOOGLE_API_KEY"] = vertex_api_key  # Usar la API key específica de Vertex
         
-        print(f"✅ [VERTEX AGENT] API Key cargada: {vertex_api_key[:10]}...{vertex_api_key[-5:]}")
-        print(f"✅ [VERTEX AGENT] Agent Engine ID: {self.agent_engine_id}")
-        print(f"🤖 [VERTEX AGENT] Modelo: {self.model}")
-        print("🔧 [VERTEX AGENT] Configurado para usar Vertex AI")
+        logger.info("✅ API Key cargada: %s", redact_secret(vertex_api_key))
+        logger.info("✅ Agent Engine ID: %s", self.agent_engine_id)
+        logger.info("🤖 Modelo: %s", self.model)
+        logger.info("🔧 Configurado para usar Vertex AI")
         
         # Configurar servicios Vertex AI Express Mode
         self._setup_vertex_services()
+        # Un único cliente genai para todo el proceso (autenticación y conexiones
+        # reutilizadas); como mucho VERTEX_MAX_CONCURRENCY llamadas al modelo a la vez
+        self.request_timeout = float(os.getenv("VERTEX_TIMEOUT_SECONDS", "30"))
+        self.max_concurrency = int(os.getenv("VERTEX_MAX_CONCURRENCY", "16"))
+        self._generation_slots = asyncio.Semaphore(self.max_concurrency)
+        self._llm_in_flight = 0  # llamadas en curso o esperando turno
+        self.genai_client = self._create_genai_client()
+        self.stage_timings = StageTimings()
+        # Los turnos se guardan en el Memory Bank en segundo plano (reintentos y dead-letter)
+        self.memory_writer = BackgroundMemoryWriter.from_env(
+            self._write_memory, "VERTEX_MEMORY", "vertex_memory_dead_letter.jsonl")
+        # Caché opcional de respuestas por mensaje normalizado + contexto de memoria
+        self.response_cache = ResponseCache.from_env("vertex")
     
     def _setup_vertex_services(self):
         """Configurar servicios de memoria según la documentación oficial del ADK."""
@@ -53,37 +85,70 @@ class VertexAgent:
                     location="us-central1", 
                     agent_engine_id=self.agent_engine_id
                 )
-                print("✅ [VERTEX AGENT] VertexAiMemoryBankService configurado")
-                print("   🧠 Búsqueda semántica avanzada")
-                print("   💾 Memoria persistente en Google Cloud")
-                print("   ☁️  Vertex AI Memory Bank")
-                print("   🔐 Autenticación OAuth2")
+                logger.info("✅ VertexAiMemoryBankService configurado: búsqueda semántica avanzada, "
+                            "memoria persistente en Google Cloud (Vertex AI Memory Bank), autenticación OAuth2")
                 
             else:
                 # Fallback a InMemoryMemoryService para desarrollo
                 from google.adk.memory import InMemoryMemoryService
                 
                 self.memory_service = InMemoryMemoryService()
-                print("✅ [VERTEX AGENT] InMemoryMemoryService configurado")
-                print("   🧠 Búsqueda por palabras clave")
-                print("   💾 Memoria temporal (se pierde al reiniciar)")
-                print("   📚 Ideal para desarrollo y pruebas")
+                logger.info("✅ InMemoryMemoryService configurado: búsqueda por palabras clave, "
+                            "memoria temporal (se pierde al reiniciar), ideal para desarrollo y pruebas")
                 
         except Exception as e:
-            print(f"❌ [VERTEX AGENT] Error configurando servicios de memoria: {e}")
+            logger.error("❌ Error configurando servicios de memoria: %s", e)
             # Fallback a InMemoryMemoryService
             try:
                 from google.adk.memory import InMemoryMemoryService
                 self.memory_service = InMemoryMemoryService()
-                print("✅ [VERTEX AGENT] Fallback a InMemoryMemoryService")
+                logger.info("✅ Fallback a InMemoryMemoryService")
             except Exception as e2:
-                print(f"❌ [VERTEX AGENT] Error crítico: {e2}")
+                logger.error("❌ Error crítico: %s", e2)
                 self.memory_service = None
     
+    def _create_genai_client(self):
+        """Cliente genai de Vertex AI con timeout y pool de conexiones keep-alive.
+        
+        VERTEX_BASE_URL permite apuntar a otro endpoint (proxy, endpoint privado).
+        El tamaño del pool (``httpx.Limits``) sólo se aplica con el transporte httpx
+        del SDK; si aiohttp está instalado el SDK lo usa con su propio pool y las
+        llamadas simultáneas quedan acotadas sólo por el semáforo del agente.
+        """
+        from google import genai
+        from google.genai import types
+        
+        # Configurar variable de entorno si no está configurada
+        if not os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
+            credentials_path = r"C:\Users\PC\AppData\Local\Packages\PythonSoftwareFoundation.Python.3.13_qbz5n2kfra8p0\LocalCache\Roaming\gcloud\application_default_credentials.json"
+            if os.path.exists(credentials_path):
+                os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = credentials_path
+        
+        async_client_args = None
+        if SDK_USES_AIOHTTP:
+            logger.info("ℹ️  aiohttp instalado: el SDK no usa httpx y el límite de conexiones no se aplica "
+                        "(el semáforo sigue acotando a %s llamadas)", self.max_concurrency)
+        else:
+            # Tantas conexiones abiertas como llamadas simultáneas permitidas
+            async_client_args = {"limits": httpx.Limits(max_connections=self.max_concurrency,
+                                                        max_keepalive_connections=self.max_concurrency)}
+        http_options = types.HttpOptions(
+            timeout=int(self.request_timeout * 1000),
+            base_url=os.getenv("VERTEX_BASE_URL") or None,
+            async_client_args=async_client_args,
+        )
+        # Crear cliente con autenticación OAuth2 y proyecto configurado
+        return genai.Client(
+            vertexai=True,
+            project="proyect-470810",
+            location="us-central1",
+            http_options=http_options,
+        )
+    
     async def run(self, user_id: str, message: str, session_id: str = None) -> tuple[str, str]:
         """Ejecutar el agente usando servicios de memoria según la documentación oficial del ADK."""
         try:
-            print(f"🧠 [VERTEX AGENT] Ejecutando para usuario: {user_id}")
+            logger.info("🧠 Ejecutando para usuario: %s", user_id, extra={"user_id": user_id, "session_id": session_id})
             
             if not self.memory_service:
                 return "Error: Servicio de memoria no configurado correctamente.", session_id or str(uuid.uuid4())[:8]
@@ -91,21 +156,29 @@ class VertexAgent:
             # Generar session_id si no existe
             if not session_id:
                 session_id = str(uuid.uuid4())[:8]
-                print(f"🆔 [VERTEX AGENT] Nuevo session_id generado: {session_id}")
+                logger.debug("🆔 Nuevo session_id generado: %s", session_id)
             
             # Buscar memoria relevante según la documentación oficial
             memory_context = await self._search_memory(user_id, message)
             
-            # Generar respuesta usando Vertex AI directamente
-            response = await self._generate_response(message, memory_context)
+            # Generar respuesta usando Vertex AI directamente (o la cacheada para el mismo
+            # mensaje y el mismo contexto de memoria: el prompt sólo depende de ambos)
+            fingerprint = context_fingerprint(self.model, memory_context)
+            response = self.response_cache.get(message, fingerprint) if self.response_cache else None
+            if response is not None:
+                logger.debug("🗃️  Respuesta servida desde la caché (sin llamada al modelo)")
+            else:
+                response = await self._generate_response(message, memory_context)
+                if self.response_cache and response not in (NO_RESPONSE, GENERATION_ERROR):
+                    self.response_cache.set(message, fingerprint, response)
             
-            # Guardar conversación en memoria según la documentación oficial
-            await self._save_to_memory(user_id, message, response, session_id)
+            # Guardar conversación en memoria según la documentación oficial, sin que la respuesta lo espere
+            self.memory_writer.submit(MemoryWrite(user_id, session_id, message, response))
             
             return response, session_id
             
         except Exception as e:
-            print(f"⚠️  [VERTEX AGENT] Error: {e}")
+            logger.warning("⚠️  Error: %s", e)
             return "Lo siento, no pude procesar tu mensaje en este momento.", session_id or str(uuid.uuid4())[:8]
     
     async def _search_memory(self, user_id: str, query: str) -> str:
@@ -123,7 +196,7 @@ class VertexAgent:
                 # Para VertexAiMemoryBankService
                 memory_list = memories.memories
                 if memory_list:
-                    print(f"🧠 [VERTEX AGENT] Memoria encontrada: {len(memory_list)} elementos")
+                    logger.debug("🧠 Memoria encontrada: %s elementos", len(memory_list))
                     # Extraer el contenido de texto de los objetos Content
                     memory_texts = []
                     for mem in memory_list[:3]:  # Top 3
@@ -140,35 +213,21 @@ class VertexAgent:
                     return "\n".join(memory_texts)
             elif memories:
                 # Para InMemoryMemoryService
-                print(f"🧠 [VERTEX AGENT] Memoria encontrada: {len(memories)} elementos")
+                logger.debug("🧠 Memoria encontrada: %s elementos", len(memories))
                 return "\n".join([getattr(mem, 'content', str(mem)) for mem in memories[:3]])  # Top 3
             
-            print("🧠 [VERTEX AGENT] No se encontró memoria relevante")
+            logger.debug("🧠 No se encontró memoria relevante")
             return ""
                         
         except Exception as e:
-            print(f"⚠️  [VERTEX AGENT] Error buscando memoria: {e}")
+            logger.warning("⚠️  Error buscando memoria: %s", e)
             return ""
     
     async def _generate_response(self, message: str, memory_context: str) -> str:
-        """Generar respuesta usando Vertex AI con autenticación OAuth2."""
+        """Generar respuesta usando Vertex AI con autenticación OAuth2 (API asíncrona del cliente compartido)."""
+        started = time.perf_counter()
+        self._llm_in_flight += 1
         try:
-            from google import genai
-            import os
-            
-            # Configurar variable de entorno si no está configurada
-            if not os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
-                credentials_path = r"C:\Users\PC\AppData\Local\Packages\PythonSoftwareFoundation.Python.3.13_qbz5n2kfra8p0\LocalCache\Roaming\gcloud\application_default_credentials.json"
-                if os.path.exists(credentials_path):
-                    os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = credentials_path
-            
-            # Crear cliente con autenticación OAuth2 y proyecto configurado
-            client = genai.Client(
-                vertexai=True,
-                project="proyect-470810",
-                location="us-central1"
-            )
-            
             # Construir prompt con contexto de memoria
             system_prompt = """Eres un asistente Vertex AI con memoria persistente. 
             Tienes acceso al contexto de conversaciones anteriores para proporcionar respuestas más personalizadas y relevantes."""
@@ -180,68 +239,86 @@ Mensaje actual del usuario: {message}
 
 Responde de manera útil y personalizada, considerando el contexto de memoria si está disponible."""
 
-            # Generar respuesta usando la API REST de Vertex AI
-            response = client.models.generate_content(
-                model=self.model,
-                contents=[
-                    {"role": "user", "parts": [{"text": system_prompt}]},
-                    {"role": "user", "parts": [{"text": user_prompt}]}
-                ]
-            )
+            # Generar respuesta usando la API REST de Vertex AI sin bloquear el event loop
+            async with self._generation_slots:
+                response = await self.genai_client.aio.models.generate_content(
+                    model=self.model,
+                    contents=[
+                        {"role": "user", "parts": [{"text": system_prompt}]},
+                        {"role": "user", "parts": [{"text": user_prompt}]}
+                    ]
+                )
             
-            return response.text if response.text else "No pude generar una respuesta."
+            self.stage_timings.record("llm", time.perf_counter() - started)
+            return response.text if response.text else NO_RESPONSE
             
         except Exception as e:
-            print(f"❌ [VERTEX AGENT] Error generando respuesta: {e}")
-            return "Lo siento, no pude generar una respuesta en este momento."
+            outcome = "timeout" if isinstance(e, TIMEOUT_ERRORS) else "error"
+            self.stage_timings.record("llm", time.perf_counter() - started, outcome)
+            logger.error("❌ Error generando respuesta (%s): %s", outcome, e)
+            return GENERATION_ERROR
+        finally:
+            self._llm_in_flight -= 1
     
-    async def _save_to_memory(self, user_id: str, message: str, response: str, session_id: str):
-        """Guardar conversación en memoria usando el servicio configurado según la documentación oficial del ADK."""
-        try:
-            from google.adk.sessions import Session
-            
-            # Crear una sesión temporal para guardar en memoria
-            app_name = self.agent_engine_id or "default_app"
-            
-            # Crear sesión temporal siguiendo exactamente la documentación oficial
-            temp_session = Session(
-                app_name=app_name,
-                user_id=user_id,
-                id=session_id
-            )
-            
-            # Crear eventos con la estructura correcta para VertexAiMemoryBankService
-            # Los eventos deben tener un atributo 'content' con método model_dump()
-            from google.genai.types import Content, Part
-            
-            # Crear objetos Content que tengan el método model_dump()
-            user_content = Content(parts=[Part(text=message)], role="user")
-            assistant_content = Content(parts=[Part(text=response)], role="assistant")
-            
-            # Crear eventos que tengan el atributo 'content' esperado por el servicio
-            user_event = type('Event', (), {
-                'content': user_content
-            })()
-            
-            assistant_event = type('Event', (), {
-                'content': assistant_content
-            })()
-            
-            # Agregar eventos a la sesión
-            temp_session.events.append(user_event)
-            temp_session.events.append(assistant_event)
-            
-            # Guardar sesión en memoria usando el servicio configurado
-            await self.memory_service.add_session_to_memory(temp_session)
-            print("💾 [VERTEX AGENT] Conversación guardada en memoria")
-            
-        except Exception as e:
-            print(f"⚠️  [VERTEX AGENT] Error guardando en memoria: {e}")
-            print(f"   Detalles del error: {type(e).__name__}")
-            
-            # Si falla, simplemente no guardar en memoria por ahora
-            # El agente seguirá funcionando sin memoria
-            print("🔄 [VERTEX AGENT] Continuando sin guardar en memoria...")
+    async def _write_memory(self, item: MemoryWrite):
+        """Guardar un turno en memoria usando el servicio configurado según la documentación oficial del ADK.
+        
+        Lo llama BackgroundMemoryWriter fuera del camino de la respuesta; si
+        falla, la excepción se propaga para que lo reintente.
+        """
+        from google.adk.sessions import Session
+        from google.genai.types import Content, Part
+        
+        # Crear una sesión temporal para guardar en memoria
+        app_name = self.agent_engine_id or "default_app"
+        
+        # Crear sesión temporal siguiendo exactamente la documentación oficial
+        temp_session = Session(
+            app_name=app_name,
+            user_id=item.user_id,
+            id=item.session_id
+        )
+        
+        # Crear eventos con la estructura correcta para VertexAiMemoryBankService
+        # Los eventos deben tener un atributo 'content' con método model_dump()
+        user_content = Content(parts=[Part(text=item.message)], role="user")
+        assistant_content = Content(parts=[Part(text=item.response)], role="assistant")
+        
+        # Crear eventos que tengan el atributo 'content' esperado por el servicio
+        user_event = type('Event', (), {
+            'content': user_content
+        })()
+        
+        assistant_event = type('Event', (), {
+            'content': assistant_content
+        })()
+        
+        # Agregar eventos a la sesión
+        temp_session.events.append(user_event)
+        temp_session.events.append(assistant_event)
+        
+        # Guardar sesión en memoria usando el servicio configurado
+        await self.memory_service.add_session_to_memory(temp_session)
+        logger.debug("💾 Conversación guardada en memoria", extra={"user_id": item.user_id, "session_id": item.session_id})
+    
+    def get_runtime_stats(self):
+        """Métricas en tiempo de ejecución (caché de respuestas, llamadas al modelo, escrituras en memoria)."""
+        return {
+            "response_cache": self.response_cache.get_stats() if self.response_cache else None,
+            "memory_writer": self.memory_writer.get_stats(),
+            "llm": {
+                "max_concurrency": self.max_concurrency,
+                "timeout_seconds": self.request_timeout,
+                "in_flight": self._llm_in_flight,
+            },
+            "stages": self.stage_timings.get_stats(),
+        }
+    
+    async def shutdown(self):
+        """Terminar las escrituras en memoria pendientes y cerrar las conexiones del cliente genai."""
+        await self.memory_writer.close()
+        await self.genai_client.aio.aclose()
+        self.genai_client.close()
     
     def get_memory_service_info(self) -> dict:
         """Obtener información del servicio de memoria."""
@@ -0,0 +1,202 @@
+"""
+Logging estructurado compartido por el servidor y los agentes.
+
+Cada módulo usa ``logging.getLogger(__name__)``; ``configure_logging`` (una
+vez, al arrancar el proceso) conecta todos los loggers a:
+
+- un ``QueueHandler`` no bloqueante: el hilo que registra sólo encola el
+  registro; un ``QueueListener`` en otro hilo lo formatea y lo escribe en
+  stdout. Si la cola se llena, los registros se descartan y se cuentan en
+  lugar de bloquear el event loop,
+- formato JSON (una línea por registro, con los campos pasados en ``extra``)
+  o texto para desarrollo,
+- niveles por módulo (``LOG_LEVELS=multi_tool_agent.agents=DEBUG,...``),
+- muestreo de las líneas DEBUG de alto volumen (1 de cada N por punto de
+  llamada),
+- redacción de secretos: los valores de las API keys y tokens configurados
+  se sustituyen por su forma abreviada (``AIzaSyABCD...wxyz5``), la misma
+  que mostraban los banners de arranque.
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+# Variables de entorno cuyos valores nunca deben aparecer completos en los logs
+SECRET_ENV_VARS = ("GOOGLE_API_KEY", "GOOGLE_API_KEY_VERTEX", "ADMIN_API_TOKEN", "MEMORY_STORE_POSTGRES_DSN")
+
+# Atributos propios de LogRecord: el resto son campos de ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+_handler = None
+_lock = threading.Lock()
+
+
+def redact_secret(value: str) -> str:
+    """``"AIzaSyD...KEY12345"`` -> ``"AIzaSyD...12345"``: sólo el principio y el final."""
+    if not value:
+        return ""
+    if len(value) <= 15:
+        return "***"
+    return f"{value[:10]}...{value[-5:]}"
+
+
+class RedactionFilter(logging.Filter):
+    """Sustituir en el mensaje los valores de los secretos configurados por su forma abreviada.
+
+    Los secretos se leen del entorno una vez, al crear el filtro. El mensaje
+    queda ya formateado en el registro: los pasos siguientes no lo repiten.
+    """
+
+    def __init__(self, env_vars=SECRET_ENV_VARS):
+        super().__init__()
+        secrets = {os.getenv(name) for name in env_vars}
+        self.replacements = [(secret, redact_secret(secret)) for secret in secrets if secret and len(secret) >= 8]
+
+    def filter(self, record):
+        message = record.getMessage()
+        for secret, redacted in self.replacements:
+            if secret in message:
+                message = message.replace(secret, redacted)
+        record.msg, record.args = message, None
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Dejar pasar 1 de cada ``every`` registros DEBUG por punto de llamada.
+
+    Los registros que pasan llevan ``sampled_every`` para poder reescalar los
+    conteos al analizar los logs. INFO y superiores no se muestrean.
+    """
+
+    def __init__(self, every: int = 1):
+        super().__init__()
+        self.every = max(1, every)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno != logging.DEBUG or self.every == 1:
+            return True
+        site = (record.name, record.lineno)
+        with self._lock:
+            counter = self._counters.get(site)
+            if counter is None:
+                counter = self._counters[site] = itertools.count()
+        if next(counter) % self.every:
+            return False
+        record.sampled_every = self.every
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro: ts, level, logger, msg, campos de ``extra`` y excepción."""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que descarta (y cuenta) registros si la cola está llena."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Cola en el mismo proceso: sin copiar ni volver a formatear el registro
+        # (RedactionFilter ya dejó el mensaje formateado y la excepción se
+        # formatea en el hilo del listener)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_levels(spec: str):
+    """``"multi_tool_agent.agents=DEBUG,server=WARNING"`` -> ``{"multi_tool_agent.agents": "DEBUG", ...}``."""
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: str = None, fmt: str = None, levels: str = None,
+                      debug_sample_every: int = None, queue_size: int = None):
+    """Configurar el logging del proceso (idempotente).
+
+    Los argumentos sustituyen a LOG_LEVEL, LOG_FORMAT (json o text),
+    LOG_LEVELS, LOG_DEBUG_SAMPLE_EVERY y LOG_QUEUE_SIZE.
+    """
+    global _listener, _handler
+    with _lock:
+        if _listener is not None:
+            return _handler
+
+        level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+        fmt = (fmt or os.getenv("LOG_FORMAT", "json")).lower()
+        levels = parse_levels(levels if levels is not None else os.getenv("LOG_LEVELS", ""))
+        debug_sample_every = debug_sample_every or int(os.getenv("LOG_DEBUG_SAMPLE_EVERY", "10"))
+        queue_size = queue_size or int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        if fmt == "text":
+            stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        else:
+            stream_handler.setFormatter(JsonFormatter())
+
+        _handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        _handler.addFilter(DebugSampler(debug_sample_every))
+        _handler.addFilter(RedactionFilter())
+
+        root = logging.getLogger()
+        root.handlers = [_handler]
+        root.setLevel(level)
+        for name, module_level in levels.items():
+            logging.getLogger(name).setLevel(module_level)
+
+        _listener = logging.handlers.QueueListener(_handler.queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        # Vaciar la cola al salir para no perder los últimos registros
+        atexit.register(shutdown_logging)
+        return _handler
+
+
+def shutdown_logging():
+    """Escribir los registros pendientes y parar el hilo del listener."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def get_logging_stats():
+    """Registros descartados por cola llena (para /health)."""
+    if _handler is None:
+        return None
+    return {"queued": _handler.queue.qsize(), "dropped": _handler.dropped}
@@ -0,0 +1,16 @@
+"""
+Lógica de memoria del lado del agente: construcción y caché del contexto del prompt,
+caché de respuestas del modelo y escritura en segundo plano en la memoria remota.
+"""
+
+from .context_cache import ContextCache, SharedContextCache
+from .context_builder import ContextBuilder, ContextSection, ContextItem, estimate_tokens
+from .extraction import ExtractionRule, RuleEngine, load_rules
+from .stage_timings import StageTimings, format_timings
+from .response_cache import ResponseCache, normalize_message, context_fingerprint, track_cache_status
+from .memory_writer import BackgroundMemoryWriter, MemoryWrite
+
+__all__ = ['ContextCache', 'SharedContextCache', 'ContextBuilder', 'ContextSection', 'ContextItem', 'estimate_tokens',
+           'ExtractionRule', 'RuleEngine', 'load_rules', 'StageTimings', 'format_timings',
+           'ResponseCache', 'normalize_message', 'context_fingerprint', 'track_cache_status',
+           'BackgroundMemoryWriter', 'MemoryWrite']
@@ -0,0 +1,164 @@
+"""
+Construcción del contexto de memoria del prompt con un presupuesto de tokens.
+
+Cada sección (memorias personales, historial, contexto semántico) aporta
+elementos con una puntuación. Las secciones se atienden por prioridad y, dentro
+de cada una, los elementos por puntuación: lo que no cabe en el presupuesto se
+trunca o se descarta, siempre en el mismo orden para las mismas entradas. El
+texto final conserva el orden de presentación de las secciones y de los
+elementos.
+
+Los tokens se estiman localmente (sin llamar al modelo): cada palabra cuenta
+``ceil(len / CHARS_PER_TOKEN)`` tokens y cada signo de puntuación o emoji uno,
+una aproximación cercana a los tokenizadores de subpalabras en español.
+"""
+
+import math
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import List
+
+CHARS_PER_TOKEN = 4
+
+# Un elemento truncado debe conservar al menos estos tokens para merecer la pena
+MIN_TRUNCATED_TOKENS = 12
+
+TRUNCATION_MARK = "…"
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación local del número de tokens de un texto."""
+    return sum(math.ceil(len(piece) / CHARS_PER_TOKEN) for piece in _TOKEN_RE.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Recortar un texto para que no supere ``max_tokens`` (marca incluida)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    budget = max_tokens - estimate_tokens(TRUNCATION_MARK)
+    used = 0
+    end = 0
+    for match in _TOKEN_RE.finditer(text):
+        cost = math.ceil(len(match.group()) / CHARS_PER_TOKEN)
+        if used + cost > budget:
+            break
+        used += cost
+        end = match.end()
+    return text[:end].rstrip() + TRUNCATION_MARK
+
+
+@dataclass
+class ContextItem:
+    """Una línea de una sección con su puntuación (mayor = más importante)."""
+    text: str
+    score: float = 0.0
+
+
+@dataclass
+class ContextSection:
+    """Sección del contexto: cabecera, pie y elementos en orden de presentación."""
+    name: str
+    header: str
+    footer: str
+    items: List[ContextItem] = field(default_factory=list)
+
+
+class ContextBuilder:
+    """Ensambla secciones dentro de un presupuesto de tokens y acumula métricas."""
+
+    def __init__(self, budget_tokens: int = 2000, max_item_tokens: int = 200, priority=None):
+        self.budget_tokens = budget_tokens
+        self.max_item_tokens = max_item_tokens
+        # Nombres de sección de mayor a menor prioridad; las no listadas van al final
+        self.priority = list(priority or [])
+        self._lock = threading.Lock()
+        self._stats = {"builds": 0, "tokens": 0, "budget_exhausted": 0, "sections": {}}
+
+    def build(self, sections):
+        """Devolver ``(texto, métricas)`` del contexto para estas secciones.
+
+        Las métricas indican, por sección, los tokens usados y cuántos elementos
+        se han incluido, truncado o descartado.
+        """
+        sections = [section for section in sections if section.items]
+        order = {name: position for position, name in enumerate(self.priority)}
+        by_priority = sorted(
+            range(len(sections)),
+            key=lambda i: (order.get(sections[i].name, len(order)), i),
+        )
+
+        remaining = self.budget_tokens
+        rendered = {}
+        metrics = {"budget": self.budget_tokens, "tokens": 0, "sections": {}}
+        for index in by_priority:
+            section = sections[index]
+            lines, section_metrics, remaining = self._fill_section(section, remaining)
+            metrics["sections"][section.name] = section_metrics
+            metrics["tokens"] += section_metrics["tokens"]
+            if lines:
+                rendered[index] = section.header + "".join(f"{line}\n" for line in lines) + section.footer
+
+        self._record(metrics)
+        return "".join(rendered[i] for i in sorted(rendered)), metrics
+
+    def _fill_section(self, section, remaining):
+        """Elegir los elementos de una sección que caben en ``remaining`` tokens."""
+        overhead = estimate_tokens(section.header) + estimate_tokens(section.footer)
+        metrics = {"tokens": 0, "items": len(section.items), "included": 0, "truncated": 0, "dropped": 0}
+        if remaining - overhead < MIN_TRUNCATED_TOKENS:
+            metrics["dropped"] = len(section.items)
+            return [], metrics, remaining
+
+        available = remaining - overhead
+        # Mayor puntuación primero; a igualdad, el orden original
+        by_score = sorted(range(len(section.items)), key=lambda i: (-section.items[i].score, i))
+        chosen = {}
+        for position in by_score:
+            text = truncate_to_tokens(section.items[position].text, self.max_item_tokens)
+            cost = estimate_tokens(text)
+            if cost > available:
+                if available < MIN_TRUNCATED_TOKENS:
+                    metrics["dropped"] += 1
+                    continue
+                text = truncate_to_tokens(text, available)
+                cost = estimate_tokens(text)
+            if text != section.items[position].text:
+                metrics["truncated"] += 1
+            chosen[position] = text
+            available -= cost
+
+        if not chosen:
+            return [], metrics, remaining
+
+        metrics["included"] = len(chosen)
+        metrics["tokens"] = remaining - available
+        return [chosen[i] for i in sorted(chosen)], metrics, remaining - metrics["tokens"]
+
+    def _record(self, metrics):
+        with self._lock:
+            self._stats["builds"] += 1
+            self._stats["tokens"] += metrics["tokens"]
+            if any(section["dropped"] for section in metrics["sections"].values()):
+                self._stats["budget_exhausted"] += 1
+            for name, section in metrics["sections"].items():
+                totals = self._stats["sections"].setdefault(
+                    name, {"tokens": 0, "included": 0, "truncated": 0, "dropped": 0}
+                )
+                for key in totals:
+                    totals[key] += section[key]
+
+    def get_stats(self):
+        """Métricas acumuladas: tokens medios por construcción y por sección."""
+        with self._lock:
+            builds = self._stats["builds"]
+            return {
+                "budget": self.budget_tokens,
+                "builds": builds,
+                "avg_tokens": round(self._stats["tokens"] / builds, 1) if builds else 0.0,
+                "budget_exhausted": self._stats["budget_exhausted"],
+                "sections": {name: dict(totals) for name, totals in self._stats["sections"].items()},
+            }
@@ -0,0 +1,292 @@
+"""
+Caché de los segmentos de contexto de memoria por usuario.
+
+Cada segmento ("memories", "history", "semantic") guarda las filas ya leídas
+de la base de datos para construir esa sección del prompt. Las entradas tienen
+TTL y un tamaño máximo con expulsión LRU, y se invalidan de forma precisa
+cuando se confirma una escritura de ese usuario.
+
+``ContextCache`` vive en el proceso. ``SharedContextCache`` guarda las entradas
+en un fichero SQLite compartido para despliegues con varios workers, de modo
+que una invalidación en un worker se ve en todos. Sus métodos hacen E/S
+bloqueante (``blocking = True``): el agente los llama desde un hilo, salvo
+``get_stats``, que sólo lee contadores en memoria.
+"""
+
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from ..storage import SQLiteConnectionManager
+
+SEGMENTS = ("memories", "history", "semantic")
+
+
+class CacheStats:
+    """Contadores de aciertos y fallos por segmento."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = {segment: 0 for segment in SEGMENTS}
+        self.misses = {segment: 0 for segment in SEGMENTS}
+        self.invalidations = 0
+        self.evictions = 0
+
+    def record(self, segment: str, hit: bool):
+        with self._lock:
+            counters = self.hits if hit else self.misses
+            counters[segment] = counters.get(segment, 0) + 1
+
+    def as_dict(self):
+        total_hits = sum(self.hits.values())
+        total = total_hits + sum(self.misses.values())
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "hit_ratio": round(total_hits / total, 3) if total else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+
+class GenerationTracker:
+    """Generación de invalidación por usuario (acotada).
+
+    Una lectura anota la generación antes de consultar la base de datos y sólo
+    guarda el resultado si no ha cambiado: así una lectura que se cruza con un
+    commit no deja en caché datos anteriores a la escritura.
+    """
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        self._generations = OrderedDict()
+
+    def current(self, user_id: str) -> int:
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def bump(self, user_id: str):
+        with self._lock:
+            # Valores siempre nuevos: un usuario expulsado nunca reutiliza una generación
+            self._generations[user_id] = next(self._counter)
+            self._generations.move_to_end(user_id)
+            while len(self._generations) > self.max_users:
+                self._generations.popitem(last=False)
+
+
+class ContextCache:
+    """Caché LRU + TTL en memoria del proceso."""
+
+    backend = "memory"
+    blocking = False
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self.generations = GenerationTracker(max_entries)
+        self._lock = threading.Lock()
+        # (user_id, segment, variant) -> (expires_at, value)
+        self._entries = OrderedDict()
+        # user_id -> claves de ese usuario, para invalidar sin recorrer toda la caché
+        self._user_keys = {}
+
+    def current_generation(self, user_id: str) -> int:
+        """Generación de invalidación del usuario, para pasarla a ``set``."""
+        return self.generations.current(user_id)
+
+    def get(self, user_id: str, segment: str, variant: str = ""):
+        """Devolver el valor cacheado o None si no existe o ha caducado."""
+        key = (user_id, segment, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        self.stats.record(segment, entry is not None)
+        return entry[1] if entry is not None else None
+
+    def set(self, user_id: str, segment: str, value, variant: str = "", generation: int = None):
+        """Guardar un segmento, expulsando los menos usados si se supera el límite."""
+        if generation is not None and generation != self.generations.current(user_id):
+            return
+        key = (user_id, segment, variant)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats.evictions += 1
+
+    def invalidate(self, user_id: str, segments=SEGMENTS):
+        """Eliminar los segmentos indicados de un usuario (todas sus variantes)."""
+        self.generations.bump(user_id)
+        with self._lock:
+            for key in list(self._user_keys.get(user_id, ())):
+                if key[1] in segments:
+                    self._remove(key)
+            self.stats.invalidations += 1
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        user_keys = self._user_keys.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._user_keys[key[0]]
+
+    def get_stats(self):
+        stats = self.stats.as_dict()
+        stats.update({"backend": self.backend, "entries": len(self._entries), "max_entries": self.max_entries})
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+
+class SharedContextCache:
+    """Caché compartida entre procesos sobre un fichero SQLite.
+
+    Los valores se serializan en JSON, por lo que las tuplas vuelven como listas
+    (se desempaquetan igual). Los contadores de aciertos son por proceso.
+
+    La generación de invalidación de cada usuario también está en el fichero:
+    ``set`` la comprueba en su transacción, así que un worker no puede guardar
+    datos leídos antes de que otro worker invalidara al usuario.
+
+    ``get_stats`` no hace E/S: el número de entradas lo mantienen ``set`` e
+    ``invalidate`` dentro de sus transacciones y se recuenta en cada recorte,
+    así que las entradas de otros workers aparecen con ese retraso.
+    """
+
+    backend = "shared"
+    blocking = True
+
+    def __init__(self, db_path: str = "context_cache.db", max_entries: int = 10000,
+                 ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        # Es una caché: no hace falta sincronizar en disco cada escritura
+        self.db = SQLiteConnectionManager(db_path, readers=2, synchronous="OFF",
+                                          cache_size_kb=4096, mmap_size_mb=64)
+        with self.db.write() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS context_cache (
+                    user_id TEXT NOT NULL,
+                    segment TEXT NOT NULL,
+                    variant TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (user_id, segment, variant)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_context_cache_last_access
+                ON context_cache (last_access)
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS context_cache_generations (
+                    user_id TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL,
+                    bumped_at REAL NOT NULL
+                ) WITHOUT ROWID
+            """)
+            self.entries = conn.execute("SELECT COUNT(*) FROM context_cache").fetchone()[0]
+        self._writes_since_trim = 0
+
+    def current_generation(self, user_id: str) -> int:
+        """Generación de invalidación del usuario compartida por todos los workers."""
+        with self.db.read() as conn:
+            return self._generation(conn, user_id)
+
+    @staticmethod
+    def _generation(conn, user_id):
+        row = conn.execute("SELECT generation FROM context_cache_generations WHERE user_id = ?",
+                           (user_id,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def get(self, user_id: str, segment: str, variant: str = ""):
+        """Devolver el valor cacheado o None si no existe o ha caducado."""
+        # time.time(): el reloj debe ser comparable entre procesos
+        with self.db.read() as conn:
+            row = conn.execute("""
+                SELECT value FROM context_cache
+                WHERE user_id = ? AND segment = ? AND variant = ? AND expires_at >= ?
+            """, (user_id, segment, variant, time.time())).fetchone()
+        self.stats.record(segment, row is not None)
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, user_id: str, segment: str, value, variant: str = "", generation: int = None):
+        """Guardar un segmento y recortar la caché periódicamente."""
+        now = time.time()
+        with self.db.write() as conn:
+            # En la misma transacción que la escritura: ninguna invalidación puede colarse entre ambas
+            if generation is not None and generation != self._generation(conn, user_id):
+                return
+            exists = conn.execute("""
+                SELECT 1 FROM context_cache WHERE user_id = ? AND segment = ? AND variant = ?
+            """, (user_id, segment, variant)).fetchone()
+            conn.execute("""
+                INSERT OR REPLACE INTO context_cache
+                (user_id, segment, variant, value, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (user_id, segment, variant, json.dumps(value), now + self.ttl_seconds, now))
+            if exists is None:
+                self.entries += 1
+
+            self._writes_since_trim += 1
+            if self._writes_since_trim >= max(1, self.max_entries // 10):
+                self._writes_since_trim = 0
+                self._trim(conn, now)
+
+    def _trim(self, conn, now):
+        """Eliminar entradas caducadas y las más antiguas por encima del límite."""
+        conn.execute("DELETE FROM context_cache WHERE expires_at < ?", (now,))
+        # Las lecturas no actualizan last_access (serían escrituras): se expulsa
+        # por antigüedad de la última escritura
+        evicted = conn.execute("""
+            DELETE FROM context_cache
+            WHERE last_access < (
+                SELECT last_access FROM context_cache ORDER BY last_access DESC LIMIT 1 OFFSET ?
+            )
+        """, (self.max_entries - 1,)).rowcount
+        self.stats.evictions += max(evicted, 0)
+        # Una generación sólo protege lecturas en curso: pasado el TTL ya no hace falta
+        conn.execute("DELETE FROM context_cache_generations WHERE bumped_at < ?", (now - self.ttl_seconds,))
+        # Recuento exacto, con las entradas de todos los workers
+        self.entries = conn.execute("SELECT COUNT(*) FROM context_cache").fetchone()[0]
+
+    def invalidate(self, user_id: str, segments=SEGMENTS):
+        """Eliminar los segmentos indicados de un usuario (visible para todos los workers)."""
+        placeholders = ", ".join("?" for _ in segments)
+        with self.db.write() as conn:
+            conn.execute("""
+                INSERT INTO context_cache_generations (user_id, generation, bumped_at) VALUES (?, 1, ?)
+                ON CONFLICT (user_id) DO UPDATE SET generation = generation + 1, bumped_at = excluded.bumped_at
+            """, (user_id, time.time()))
+            deleted = conn.execute(f"""
+                DELETE FROM context_cache WHERE user_id = ? AND segment IN ({placeholders})
+            """, (user_id, *segments)).rowcount
+            # Puede borrar entradas de otros workers aún no contadas aquí
+            self.entries = max(0, self.entries - max(deleted, 0))
+        self.stats.invalidations += 1
+
+    def get_stats(self):
+        stats = self.stats.as_dict()
+        stats.update({"backend": self.backend, "entries": self.entries, "max_entries": self.max_entries})
+        return stats
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,194 @@
+"""
+Motor de reglas para extraer memorias personales de los mensajes del usuario.
+
+Las reglas se compilan una sola vez al crear el motor. Cada regla tiene un
+disparador literal (por defecto, el texto fijo con el que empieza su patrón) y
+su patrón sólo se prueba anclado en las posiciones donde aparece el
+disparador: nunca se vuelve a recorrer el mensaje entero con el patrón. Con
+pocos disparadores (las reglas por defecto) cada uno se busca con ``in``; con
+más de ``SCAN_MIN_TRIGGERS`` se combinan en una única expresión regular y el
+mensaje se recorre en una pasada. Se devuelven todos los hechos encontrados
+como un lote de pares ``(clave, valor)``.
+
+Además de las reglas por defecto (nombre, edad y preferencias) se pueden
+cargar reglas propias desde un fichero JSON (``MEMORY_EXTRACTION_RULES``)::
+
+    [
+        {"name": "ciudad", "pattern": "vivo en (\\\\w+)", "key": "ciudad", "transform": "title"},
+        {"name": "mascota", "pattern": "mi perro se llama (\\\\w+)", "key": "mascota"}
+    ]
+
+El patrón se aplica sobre el mensaje en minúsculas y el grupo 1 es el valor.
+Si el patrón no empieza por texto fijo hay que indicar ``"trigger"``: un texto
+literal con el que empieza cualquier coincidencia. Los dos modos devuelven lo
+mismo, también con disparadores solapados ("me gusta" y "me gusta el").
+"""
+
+import json
+import logging
+import re
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# Transformaciones disponibles para el valor extraído
+TRANSFORMS = {
+    "none": lambda value: value,
+    "strip": str.strip,
+    "capitalize": str.capitalize,
+    "title": str.title,
+    "upper": str.upper,
+}
+
+PREFERENCE_KEYWORDS = ["me gusta", "prefiero", "favorito", "disfruto"]
+
+# A partir de cuántos disparadores distintos compensa recorrer el mensaje con una sola
+# expresión en vez de buscar cada disparador con ``in`` (medido con
+# benchmarks/bench_memory_extraction.py: el punto de cruce está en torno a 10)
+SCAN_MIN_TRIGGERS = 8
+
+_REGEX_SPECIAL = set("\\.^$*+?{}[]|()")
+
+
+def literal_prefix(pattern: str) -> str:
+    """Texto fijo con el que empieza un patrón (vacío si empieza por un metacarácter).
+
+    Los caracteres escapados que no son letras ni dígitos (``\\ ``, ``\\.``, como
+    los que deja ``re.escape``) cuentan como literales.
+    """
+    prefix = ""
+    position = 0
+    while position < len(pattern):
+        char = pattern[position]
+        if char == "\\" and position + 1 < len(pattern) and not pattern[position + 1].isalnum():
+            char = pattern[position + 1]
+            position += 1
+        elif char in _REGEX_SPECIAL:
+            # Un cuantificador afecta al último carácter literal
+            if char in "*+?{" and prefix:
+                prefix = prefix[:-1]
+            break
+        prefix += char
+        position += 1
+    return prefix
+
+
+@dataclass
+class ExtractionRule:
+    """Regla de extracción: el grupo 1 de ``pattern`` es el valor de ``key``."""
+    name: str
+    pattern: str
+    key: str
+    transform: str = "strip"
+    trigger: str = None
+
+    def __post_init__(self):
+        if self.transform not in TRANSFORMS:
+            raise ValueError(f"Transformación '{self.transform}' no válida en la regla '{self.name}'. "
+                             f"Opciones: {sorted(TRANSFORMS)}")
+        self.regex = re.compile(self.pattern)
+        if self.regex.groups < 1:
+            raise ValueError(f"La regla '{self.name}' necesita un grupo de captura para el valor")
+        self.trigger = (self.trigger or literal_prefix(self.pattern)).lower()
+        if not self.trigger:
+            raise ValueError(f"La regla '{self.name}' no empieza por texto fijo: indique un 'trigger'")
+
+
+DEFAULT_RULES = [
+    ExtractionRule("nombre", r"me llamo (\w+)", "nombre", "capitalize"),
+    ExtractionRule("edad", r"tengo (\d+) años", "edad"),
+] + [
+    # Clave compatible con las memorias ya guardadas ("preferencia_me gusta", ...)
+    ExtractionRule(f"preferencia_{keyword}", rf"{re.escape(keyword)} (.+)", f"preferencia_{keyword}")
+    for keyword in PREFERENCE_KEYWORDS
+]
+
+
+def load_rules(path: str):
+    """Leer reglas de usuario desde un fichero JSON (lista de objetos)."""
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    return [
+        ExtractionRule(
+            name=entry["name"],
+            pattern=entry["pattern"],
+            key=entry.get("key", entry["name"]),
+            transform=entry.get("transform", "strip"),
+            trigger=entry.get("trigger"),
+        )
+        for entry in entries
+    ]
+
+
+class RuleEngine:
+    """Extractor de una sola pasada sobre un conjunto de reglas compiladas."""
+
+    def __init__(self, rules=None):
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        # Disparador -> (posición, regla) de las reglas que empiezan por él, en orden de definición
+        self._rules_by_trigger = {}
+        for index, rule in enumerate(self.rules):
+            self._rules_by_trigger.setdefault(rule.trigger, []).append((index, rule))
+        # Con muchos disparadores, una sola expresión que los combina; los más largos
+        # primero, así que cada coincidencia es el disparador más largo en esa posición
+        self._scanner = None
+        if len(self._rules_by_trigger) > SCAN_MIN_TRIGGERS:
+            triggers = sorted(self._rules_by_trigger, key=len, reverse=True)
+            self._scanner = re.compile("|".join(re.escape(trigger) for trigger in triggers))
+            # Donde empieza un disparador empiezan también todos sus prefijos ("me gusta" en
+            # "me gusta el"): se prueban las reglas de todos ellos
+            self._rules_at = {
+                trigger: sorted(
+                    (entry for prefix, entries in self._rules_by_trigger.items()
+                     if trigger.startswith(prefix) for entry in entries),
+                    key=lambda entry: entry[0],
+                )
+                for trigger in triggers
+            }
+
+    @classmethod
+    def from_config(cls, path: str = None):
+        """Reglas por defecto más las del fichero indicado, si se indica."""
+        rules = list(DEFAULT_RULES)
+        if path:
+            rules += load_rules(path)
+            logger.info("✅ %s reglas de extracción cargadas desde %s", len(rules) - len(DEFAULT_RULES), path)
+        return cls(rules)
+
+    def extract(self, message: str):
+        """Pares (clave, valor) encontrados, como máximo uno por regla y en el orden de las reglas."""
+        text = message.lower()
+        # Posición de la regla -> par encontrado (None si el valor quedó vacío)
+        matched = {}
+        if self._scanner is None:
+            # Pocos disparadores: un ``in`` por disparador (búsqueda en C) es lo más rápido
+            for trigger, rules in self._rules_by_trigger.items():
+                if trigger not in text:
+                    continue
+                position = text.find(trigger)
+                while position != -1:
+                    self._match_at(text, position, rules, matched)
+                    position = text.find(trigger, position + 1)
+        else:
+            # La mayoría de mensajes no contiene ningún disparador: una búsqueda y fuera.
+            # Se sigue desde la posición siguiente, no desde el final: los disparadores
+            # pueden solaparse igual que con ``find``
+            found = self._scanner.search(text)
+            while found is not None:
+                self._match_at(text, found.start(), self._rules_at[found.group()], matched)
+                found = self._scanner.search(text, found.start() + 1)
+        if not matched:
+            return []
+        return [memory for _, memory in sorted(matched.items()) if memory is not None]
+
+    @staticmethod
+    def _match_at(text, position, rules, matched):
+        """Probar reglas ancladas donde aparece su disparador (toda coincidencia empieza por él)."""
+        for index, rule in rules:
+            if index in matched:
+                continue
+            match = rule.regex.match(text, position)
+            if match is None:
+                continue
+            value = TRANSFORMS[rule.transform](match.group(1) or "")
+            matched[index] = (rule.key, value) if value else None
@@ -0,0 +1,193 @@
+"""
+Escrituras en la memoria remota fuera del camino de la respuesta.
+
+El turno se encola como ``MemoryWrite`` y el agente responde sin esperar.
+Varios workers vacían una cola acotada llamando a ``write(item)``. Cada
+fallo se reintenta con backoff exponencial y jitter. Lo que agota los
+intentos, no cabe en la cola o sigue pendiente al apagar se añade como una
+línea JSON al fichero de dead-letter, para reenviarlo más tarde. El fichero
+se escribe por lotes en un hilo (``asyncio.to_thread``), nunca en el event loop.
+
+``get_stats`` expone la profundidad de la cola, los turnos en curso y el
+retraso (lag) desde que se encola un turno hasta que queda escrito.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from dataclasses import asdict, dataclass, field
+
+from .stage_timings import StageTimings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MemoryWrite:
+    """Un turno de chat pendiente de guardar en la memoria."""
+
+    user_id: str
+    session_id: str
+    message: str
+    response: str
+    enqueued_at: float = field(default_factory=time.time)
+
+
+class BackgroundMemoryWriter:
+    """Cola acotada con workers que reintentan con backoff y mandan lo fallido a dead-letter."""
+
+    def __init__(self, write, max_size: int = 1000, workers: int = 4, max_attempts: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, drain_timeout: float = 30.0,
+                 dead_letter_path: str = "memory_dead_letter.jsonl"):
+        # Corrutina write(item) que guarda un turno (lanza excepción si falla)
+        self.write = write
+        self.max_size = max_size
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.drain_timeout = drain_timeout
+        self.dead_letter_path = dead_letter_path
+
+        self._queue = None
+        self._tasks = []
+        self.in_flight = 0
+        self.timings = StageTimings()
+        self.written = 0
+        self.retries = 0
+        self.dead_lettered = 0
+        # Registros de dead-letter aún no escritos y el task que los escribe
+        self._dead_letters = []
+        self._dead_letter_task = None
+
+    @classmethod
+    def from_env(cls, write, prefix: str, default_dead_letter: str):
+        """Configurar con {prefix}_QUEUE_SIZE, _WRITERS, _MAX_ATTEMPTS, _DRAIN_SECONDS y _DEAD_LETTER."""
+        return cls(
+            write,
+            max_size=int(os.getenv(f"{prefix}_QUEUE_SIZE", "1000")),
+            workers=int(os.getenv(f"{prefix}_WRITERS", "4")),
+            max_attempts=int(os.getenv(f"{prefix}_MAX_ATTEMPTS", "5")),
+            drain_timeout=float(os.getenv(f"{prefix}_DRAIN_SECONDS", "30")),
+            dead_letter_path=os.getenv(f"{prefix}_DEAD_LETTER", default_dead_letter),
+        )
+
+    def _ensure_workers(self):
+        """Crear la cola y los workers en el event loop actual."""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._run()))
+
+    def submit(self, item: MemoryWrite):
+        """Encolar un turno sin esperar; con la cola llena va directo a dead-letter."""
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            logger.warning("⚠️  Cola de escritura en memoria llena (%s): turno de %s a dead-letter",
+                           self.max_size, item.user_id)
+            self._dead_letter(item, 0, "cola llena")
+
+    async def _run(self):
+        """Worker: escribir un turno, reintentando con backoff, y pasar al siguiente."""
+        while True:
+            item = await self._queue.get()
+            self.in_flight += 1
+            try:
+                await self._write_with_retry(item)
+            except asyncio.CancelledError:
+                # Apagado con el turno a medias (escribiendo o esperando un reintento)
+                self._dead_letter(item, 0, "apagado")
+                raise
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+
+    async def _write_with_retry(self, item):
+        for attempt in range(1, self.max_attempts + 1):
+            started = time.perf_counter()
+            try:
+                await self.write(item)
+            except Exception as e:
+                self.timings.record("write", time.perf_counter() - started, "error")
+                if attempt == self.max_attempts:
+                    logger.error("❌ Turno de %s a dead-letter tras %s intentos: %s", item.user_id, attempt, e)
+                    self._dead_letter(item, attempt, e)
+                    return
+                self.retries += 1
+                # Backoff exponencial con jitter completo
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+                logger.warning("⚠️  Error guardando en memoria (intento %s/%s, reintento en %.1f s): %s",
+                               attempt, self.max_attempts, delay, e)
+                await asyncio.sleep(delay)
+            else:
+                self.timings.record("write", time.perf_counter() - started)
+                self.timings.record("lag", time.time() - item.enqueued_at)
+                self.written += 1
+                return
+
+    def _dead_letter(self, item, attempts, error):
+        """Apuntar el turno para dead-letter; un task lo escribe en el fichero junto con los demás."""
+        self.dead_lettered += 1
+        self._dead_letters.append({**asdict(item), "attempts": attempts, "error": str(error),
+                                   "failed_at": time.time()})
+        if self._dead_letter_task is None or self._dead_letter_task.done():
+            self._dead_letter_task = asyncio.create_task(self._write_dead_letters())
+
+    async def _write_dead_letters(self):
+        """Vaciar los registros pendientes al fichero, un lote por escritura."""
+        while self._dead_letters:
+            records, self._dead_letters = self._dead_letters, []
+            await asyncio.to_thread(self._append_dead_letters, records)
+
+    def _append_dead_letters(self, records):
+        """Añadir los registros al fichero de dead-letter (una línea JSON cada uno)."""
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as dead_letter:
+                dead_letter.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+        except OSError as e:
+            logger.error("❌ No se pudo escribir en %s, %s turnos perdidos: %s",
+                         self.dead_letter_path, len(records), e)
+
+    async def flush(self):
+        """Esperar a que todo lo encolado esté escrito (o en dead-letter)."""
+        if self._queue is not None and any(not task.done() for task in self._tasks):
+            await self._queue.join()
+
+    async def close(self):
+        """Vaciar la cola (como mucho drain_timeout s); lo que quede va a dead-letter."""
+        try:
+            await asyncio.wait_for(self.flush(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️  La cola de escritura en memoria no se vació en %s s", self.drain_timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while self._queue is not None and not self._queue.empty():
+            self._dead_letter(self._queue.get_nowait(), 0, "apagado")
+        # Lo que quedaba se escribe de una vez
+        if self._dead_letter_task is not None:
+            await self._dead_letter_task
+
+    def get_stats(self):
+        """Profundidad de la cola, turnos en curso, resultados y lag (encolado -> escrito)."""
+        timings = self.timings.get_stats()
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": self.in_flight,
+            "max_size": self.max_size,
+            "workers": self.workers,
+            "written": self.written,
+            "retries": self.retries,
+            "dead_lettered": self.dead_lettered,
+            "dead_letter_pending": len(self._dead_letters),
+            "dead_letter_path": self.dead_letter_path,
+            "write": timings.get("write"),
+            "lag": timings.get("lag"),
+        }
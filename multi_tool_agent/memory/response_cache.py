@@ -0,0 +1,150 @@
+"""
+Caché de respuestas del modelo por mensaje normalizado y contexto.
+
+Muchos mensajes se repiten ("hola", "¿cómo estás?") con el mismo contexto de
+memoria. La clave combina el mensaje normalizado (minúsculas, sin acentos,
+signos ni espacios repetidos) con una huella SHA-256 de todo lo demás que ve
+el modelo (modelo, instrucciones y contexto ensamblado): si el contexto
+cambia, la clave cambia y no hace falta invalidar nada. Las entradas tienen
+TTL y un tamaño máximo con expulsión LRU.
+
+Es opcional y se activa por agente con RESPONSE_CACHE_AGENTS. El resultado
+de cada consulta (HIT, MISS o BYPASS) se anota en la petición en curso para
+que el servidor lo devuelva en la cabecera X-Cache.
+"""
+
+import contextvars
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from ..storage import text_search
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+# Resultado de la caché en la petición actual (lo rellena el agente, lo lee el servidor)
+_request_status = contextvars.ContextVar("response_cache_status", default=None)
+
+
+def normalize_message(message: str) -> str:
+    """``"¡Hola!  ¿Cómo estás?"`` -> ``"hola como estas"``."""
+    return " ".join(_PUNCTUATION.sub(" ", text_search.normalize_text(message)).split())
+
+
+def context_fingerprint(*parts) -> str:
+    """Huella SHA-256 de todo lo que recibe el modelo además del mensaje."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def track_cache_status() -> dict:
+    """Registrar el resultado de la caché en la petición actual.
+
+    Devuelve el dict que rellenará el agente (``status`` y ``age`` en
+    segundos). Debe llamarse antes de crear la tarea que ejecuta el turno:
+    la tarea hereda el contexto y escribe en el mismo dict.
+    """
+    status = {"status": None, "age": None}
+    _request_status.set(status)
+    return status
+
+
+def _report(status: str, age: float = None):
+    request_status = _request_status.get()
+    if request_status is not None:
+        request_status["status"] = status
+        request_status["age"] = age
+
+
+class ResponseCache:
+    """Caché LRU + TTL en memoria del proceso de las respuestas de un agente."""
+
+    def __init__(self, agent: str, max_entries: int = 1000, ttl_seconds: float = 600):
+        self.agent = agent
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # (mensaje normalizado, huella del contexto) -> (expires_at, created_at, respuesta)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, agent: str):
+        """Crear la caché si RESPONSE_CACHE_AGENTS incluye el agente (o "all"); si no, None."""
+        enabled = {name.strip().lower() for name in os.getenv("RESPONSE_CACHE_AGENTS", "").split(",")}
+        if agent not in enabled and "all" not in enabled:
+            return None
+        cache = cls(
+            agent,
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")),
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "600")),
+        )
+        logger.info("🗃️  Caché de respuestas activada para %s (máx. %s respuestas, TTL %g s)",
+                    agent, cache.max_entries, cache.ttl_seconds)
+        return cache
+
+    def get(self, message: str, fingerprint: str):
+        """Devolver la respuesta cacheada o None si no existe o ha caducado."""
+        key = (normalize_message(message), fingerprint)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry is None:
+            _report("MISS")
+            return None
+        _report("HIT", now - entry[1])
+        return entry[2]
+
+    def set(self, message: str, fingerprint: str, response: str):
+        """Guardar una respuesta del modelo, expulsando las menos usadas si se supera el límite."""
+        key = (normalize_message(message), fingerprint)
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now + self.ttl_seconds, now, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def bypass(self):
+        """Anotar un turno que no puede usar la caché (el modelo ve algo fuera de la huella)."""
+        with self._lock:
+            self.bypassed += 1
+        _report("BYPASS")
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "agent": self.agent,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                # Cada acierto es una llamada al modelo que no se hizo
+                "model_calls_saved": self.hits,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
@@ -0,0 +1,48 @@
+"""
+Latencia por etapa de cada turno del agente.
+
+Cada etapa (sesión, lecturas de contexto, ensamblado, LLM, escritura) guarda
+sus últimas muestras en una ventana acotada y cuenta sus resultados (``ok``,
+``timeout``, ``error``). ``get_stats`` resume la ventana con mediana, p95 y
+máximo para /health.
+"""
+
+import threading
+from collections import deque
+
+
+class StageTimings:
+    """Ventana de latencias y contadores de resultado por etapa."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._outcomes = {}
+
+    def record(self, stage: str, seconds: float, outcome: str = "ok"):
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+            outcomes = self._outcomes.setdefault(stage, {})
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = {}
+            for stage, samples in self._samples.items():
+                ordered = sorted(samples)
+                stats[stage] = {
+                    "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+                    "p95_ms": round(ordered[max(0, int(len(ordered) * 0.95) - 1)] * 1000, 2),
+                    "max_ms": round(ordered[-1] * 1000, 2),
+                    "outcomes": dict(self._outcomes[stage]),
+                }
+            return stats
+
+
+def format_timings(timings) -> str:
+    """``{"llm": (0.81, "ok"), ...}`` -> ``"llm=810.0ms ..."`` para los logs de cada turno."""
+    return " ".join(
+        f"{stage}={seconds * 1000:.1f}ms" + ("" if outcome == "ok" else f"({outcome})")
+        for stage, (seconds, outcome) in timings.items()
+    )
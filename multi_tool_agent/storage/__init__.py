@@ -0,0 +1,25 @@
+"""
+Infraestructura de almacenamiento compartida por los sistemas de memoria de los agentes.
+"""
+
+from .sqlite_pool import SQLiteConnectionManager
+from .memory_store import MemoryStore, create_memory_store, create_sqlite_memory_system, MEMORY_STORE_BACKENDS
+from .sqlite_store import DatabaseMemorySystem, SQLiteMemoryStore
+from .sharding import ShardedMemorySystem, reshard, shard_index
+from .inmemory_store import InMemoryMemoryStore
+from .bulk_transfer import export_ndjson, NDJSONImporter
+from .retention import RetentionManager, RetentionPolicy, RetentionWorker, load_retention_policies
+from .migrations import apply_migrations, get_schema_version, has_table, LATEST_VERSION
+from .embeddings import HashingEmbedder, load_embedder
+from .vector_index import VectorIndex
+from .session_store import BoundedSessionService
+from .adk_memory_service import SQLiteMemoryService
+from .memory_snapshot import SnapshotMemoryService
+
+__all__ = ['SQLiteConnectionManager', 'MemoryStore', 'create_memory_store', 'create_sqlite_memory_system', 'MEMORY_STORE_BACKENDS',
+           'DatabaseMemorySystem', 'SQLiteMemoryStore', 'InMemoryMemoryStore',
+           'ShardedMemorySystem', 'reshard', 'shard_index', 'export_ndjson', 'NDJSONImporter',
+           'RetentionManager', 'RetentionPolicy', 'RetentionWorker', 'load_retention_policies',
+           'apply_migrations', 'get_schema_version', 'has_table', 'LATEST_VERSION',
+           'HashingEmbedder', 'load_embedder', 'VectorIndex', 'BoundedSessionService',
+           'SQLiteMemoryService', 'SnapshotMemoryService']
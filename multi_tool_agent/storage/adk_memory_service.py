@@ -0,0 +1,233 @@
+"""
+MemoryService de ADK persistente sobre SQLite con índice FTS5.
+
+``InMemoryMemoryService`` pierde todo lo que ``load_memory`` puede recordar al
+reiniciar, y cada búsqueda recorre todos los eventos guardados del usuario.
+``SQLiteMemoryService`` implementa la misma interfaz guardando el texto de
+cada evento en SQLite con un índice invertido FTS5 (mismo tokenizador y
+consultas que la búsqueda semántica del Database Agent):
+
+- partición por usuario: la columna ``user_id`` del índice restringe la
+  búsqueda a los eventos del usuario antes de puntuar con BM25,
+- ingesta por lotes: los eventos pasan por una ``WriteBehindQueue`` que
+  confirma lo pendiente de todas las sesiones en una transacción; una
+  búsqueda espera a que lo encolado esté confirmado,
+- idempotente: cada evento se guarda una vez por (app, usuario, sesión, id),
+  así que añadir de nuevo una sesión completa sólo inserta los eventos nuevos.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Tuple
+
+from google.adk.memory import BaseMemoryService
+from google.adk.memory.base_memory_service import SearchMemoryResponse
+from google.adk.memory.memory_entry import MemoryEntry
+from google.genai import types
+
+from . import text_search
+from .sqlite_pool import SQLiteConnectionManager
+from .write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+_UNKNOWN_SESSION_ID = "__unknown_session_id__"
+
+
+@dataclass
+class EventRows:
+    """Filas de eventos de un usuario, la unidad que se encola para escribir."""
+
+    user_id: str
+    rows: List[Tuple] = field(default_factory=list)
+
+
+def event_text(event) -> str:
+    """Texto indexable de un evento (las partes de texto, sin los pensamientos del modelo)."""
+    if not event.content or not event.content.parts:
+        return ""
+    return " ".join(part.text for part in event.content.parts if part.text and not part.thought)
+
+
+class SQLiteMemoryService(BaseMemoryService):
+    """Memoria de ADK en un fichero SQLite con búsqueda FTS5 (BM25) por usuario."""
+
+    def __init__(self, db_path: str = "adk_agent_memory.db", search_limit: int = 10,
+                 batch_size: int = 256, readers: int = 2):
+        self.db_path = db_path
+        self.search_limit = search_limit
+        self.db = SQLiteConnectionManager(db_path, readers=readers)
+        # sqlite3 es bloqueante: un hilo escritor más uno por lector
+        self._executor = ThreadPoolExecutor(max_workers=max(1, self.db.max_readers) + 1,
+                                            thread_name_prefix="adk-memory")
+        # Quien añade eventos no espera al commit; las búsquedas vacían la cola antes
+        self.write_queue = WriteBehindQueue(self._commit_batch, durability="deferred",
+                                            batch_size=batch_size)
+        self.searches = 0
+        with self.db.write() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS adk_memory_events (
+                    id INTEGER PRIMARY KEY,
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    event_id TEXT NOT NULL,
+                    author TEXT,
+                    timestamp REAL NOT NULL,
+                    text TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    UNIQUE (app_name, user_id, session_id, event_id)
+                )
+            """)
+            self.fts_enabled = self._create_fts(conn)
+            # Sin borrados, el mayor id es el número de eventos (COUNT(*) recorrería la tabla);
+            # a partir de aquí lo mantiene el escritor y get_stats no consulta la base de datos
+            self.events = conn.execute("SELECT COALESCE(MAX(id), 0) FROM adk_memory_events").fetchone()[0]
+
+    @classmethod
+    def from_env(cls, default_db_path: str = "adk_agent_memory.db"):
+        """Crear el servicio con ADK_MEMORY_DB, ADK_MEMORY_SEARCH_LIMIT y ADK_MEMORY_BATCH_SIZE."""
+        return cls(
+            db_path=os.getenv("ADK_MEMORY_DB", default_db_path),
+            search_limit=int(os.getenv("ADK_MEMORY_SEARCH_LIMIT", "10")),
+            batch_size=int(os.getenv("ADK_MEMORY_BATCH_SIZE", "256")),
+        )
+
+    def _create_fts(self, conn) -> bool:
+        """Índice FTS5 de contenido externo sincronizado con triggers (False si no hay FTS5)."""
+        try:
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS adk_memory_events_fts USING fts5(
+                    user_id, text,
+                    content='adk_memory_events', content_rowid='id',
+                    tokenize='{text_search.FTS_TOKENIZER}'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            logger.warning("⚠️  FTS5 no disponible, la memoria ADK buscará con LIKE: %s", e)
+            return False
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS adk_memory_events_fts_insert
+            AFTER INSERT ON adk_memory_events BEGIN
+                INSERT INTO adk_memory_events_fts (rowid, user_id, text)
+                VALUES (new.id, new.user_id, new.text);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS adk_memory_events_fts_delete
+            AFTER DELETE ON adk_memory_events BEGIN
+                INSERT INTO adk_memory_events_fts (adk_memory_events_fts, rowid, user_id, text)
+                VALUES ('delete', old.id, old.user_id, old.text);
+            END
+        """)
+        return True
+
+    # ------------------------------------------------------------------
+    # API de BaseMemoryService
+    # ------------------------------------------------------------------
+
+    async def add_session_to_memory(self, session):
+        await self.add_events_to_memory(app_name=session.app_name, user_id=session.user_id,
+                                        events=session.events, session_id=session.id)
+
+    async def add_events_to_memory(self, *, app_name, user_id, events, session_id=None,
+                                   custom_metadata=None):
+        rows = []
+        for event in events:
+            text = event_text(event)
+            if text:
+                rows.append((app_name, user_id, session_id or _UNKNOWN_SESSION_ID, event.id, event.author,
+                             event.timestamp, text, event.content.model_dump_json(exclude_none=True)))
+        if rows:
+            await self.write_queue.submit(EventRows(user_id, rows))
+
+    async def search_memory(self, *, app_name, user_id, query):
+        # Lo encolado hasta ahora debe poder encontrarse
+        await self.write_queue.flush()
+        self.searches += 1
+        rows = await self._run(self._search, app_name, user_id, query, self.search_limit)
+        return SearchMemoryResponse(memories=[
+            MemoryEntry(
+                id=event_id,
+                content=types.Content.model_validate_json(content),
+                author=author,
+                # Mismo formato ISO 8601 que InMemoryMemoryService
+                timestamp=datetime.fromtimestamp(timestamp).isoformat(),
+            )
+            for event_id, author, timestamp, content in rows
+        ])
+
+    async def close(self):
+        """Confirmar los eventos encolados y cerrar el fichero."""
+        await self.write_queue.close()
+        await asyncio.to_thread(self._executor.shutdown, True)
+        self.db.close()
+
+    def get_stats(self):
+        return {
+            "db_path": self.db_path,
+            "fts_enabled": self.fts_enabled,
+            "events": self.events,
+            "searches": self.searches,
+            "write_queue": self.write_queue.get_stats(),
+        }
+
+    # ------------------------------------------------------------------
+    # SQLite (en el pool de hilos)
+    # ------------------------------------------------------------------
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+    async def _commit_batch(self, batches):
+        rows = [row for batch in batches for row in batch.rows]
+        await self._run(self._insert_rows, rows)
+
+    def _insert_rows(self, rows):
+        with self.db.write() as conn:
+            cursor = conn.executemany("""
+                INSERT OR IGNORE INTO adk_memory_events
+                (app_name, user_id, session_id, event_id, author, timestamp, text, content)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+        # rowcount suma las filas insertadas (no las ignoradas por repetidas); ya confirmadas
+        self.events += cursor.rowcount
+
+    def _search(self, app_name, user_id, query, limit):
+        if not self.fts_enabled:
+            return self._search_like(app_name, user_id, query, limit)
+        match_expression = text_search.build_match_expression(query, {"user_id": user_id})
+        if not match_expression:
+            return []
+        # La columna user_id acota la búsqueda y no puntúa; la igualdad exacta
+        # sobre la tabla descarta coincidencias parciales de otro user_id
+        with self.db.read() as conn:
+            return conn.execute("""
+                SELECT m.event_id, m.author, m.timestamp, m.content
+                FROM adk_memory_events_fts
+                JOIN adk_memory_events m ON m.id = adk_memory_events_fts.rowid
+                WHERE adk_memory_events_fts MATCH ? AND m.user_id = ? AND m.app_name = ?
+                ORDER BY bm25(adk_memory_events_fts, 0.0, 1.0)
+                LIMIT ?
+            """, (match_expression, user_id, app_name, limit)).fetchall()
+
+    def _search_like(self, app_name, user_id, query, limit):
+        terms = text_search.query_terms(query)
+        if not terms:
+            return []
+        conditions = " OR ".join("text LIKE ?" for _ in terms)
+        with self.db.read() as conn:
+            return conn.execute(f"""
+                SELECT event_id, author, timestamp, content FROM adk_memory_events
+                WHERE app_name = ? AND user_id = ? AND ({conditions})
+                ORDER BY timestamp DESC
+                LIMIT ?
+            """, (app_name, user_id, *(f"%{term}%" for term in terms), limit)).fetchall()
+
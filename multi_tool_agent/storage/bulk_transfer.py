@@ -0,0 +1,278 @@
+"""
+Exportación e importación masiva de la memoria SQLite en NDJSON.
+
+Formato: una línea JSON por fila. La primera es una cabecera (``format``,
+``version``, ``schema_version``...) y el resto llevan ``table``, ``cursor`` y
+las columnas de la fila, sin ids internos::
+
+    {"format": "adk-memory-ndjson", "version": 1, "schema_version": 6, ...}
+    {"table": "user_memories", "cursor": "0:user_memories:17", "user_id": "u1", "key": "nombre", ...}
+
+Exportación: se lee por trozos con un cursor por rowid (``WHERE rowid > ?``);
+cada trozo es una transacción de lectura corta, así que la memoria usada no
+depende del tamaño de la base de datos y el servidor puede seguir escribiendo
+(no es una instantánea: las filas nuevas detrás del cursor también salen).
+Para reanudar se pasa el ``cursor`` de la última línea recibida.
+
+Importación: las filas se agrupan en lotes de ``batch_size`` que se insertan
+con ``executemany`` en una transacción por shard. En la misma transacción se
+guarda la última línea confirmada (tabla ``import_progress``), de modo que una
+importación interrumpida se reanuda con el mismo ``import_id`` sin duplicar
+filas. Las memorias se fusionan por (user_id, key) conservando la más reciente;
+los embeddings se recalculan con el embedder configurado.
+"""
+
+import json
+from datetime import datetime, timezone
+
+FORMAT = "adk-memory-ndjson"
+FORMAT_VERSION = 1
+
+# Tablas en orden de exportación -> campos exportados
+EXPORT_FIELDS = {
+    "sessions": ("session_id", "user_id", "created_at", "last_activity"),
+    "user_memories": ("user_id", "session_id", "key", "value", "timestamp"),
+    "user_memory_history": ("user_id", "session_id", "key", "value", "timestamp", "replaced_at"),
+    "conversation_log": ("user_id", "session_id", "role", "content", "timestamp"),
+    "semantic_context": ("user_id", "session_id", "context_type", "content", "relevance_score", "timestamp"),
+}
+TABLE_ORDER = list(EXPORT_FIELDS)
+
+
+def _select_list(table: str) -> str:
+    # En sessions el id de la fila es el id de sesión
+    return ", ".join("id AS session_id" if (table, field) == ("sessions", "session_id") else field
+                     for field in EXPORT_FIELDS[table])
+
+
+def parse_cursor(cursor: str):
+    """``"shard:tabla:rowid"`` -> (shard, tabla, rowid)."""
+    try:
+        shard, table, rowid = cursor.split(":")
+        if table not in EXPORT_FIELDS:
+            raise ValueError(table)
+        return int(shard), table, int(rowid)
+    except ValueError:
+        raise ValueError(f"Cursor de exportación no válido: {cursor!r}") from None
+
+
+def export_records(memory_system, user_id: str = None, cursor: str = None, chunk_size: int = 1000):
+    """Generar las filas (dicts) de un usuario o de todos, a partir de ``cursor`` si se indica."""
+    start = parse_cursor(cursor) if cursor else (0, TABLE_ORDER[0], 0)
+    start_position = (start[0], TABLE_ORDER.index(start[1]))
+
+    for shard_no, shard in enumerate(memory_system.shards):
+        # Las filas de un usuario están todas en su shard
+        if user_id is not None and shard_no != memory_system.shard_index(user_id):
+            continue
+        for table_no, table in enumerate(TABLE_ORDER):
+            if (shard_no, table_no) < start_position:
+                continue
+            last_rowid = start[2] if (shard_no, table_no) == start_position else 0
+            fields = EXPORT_FIELDS[table]
+            user_filter = "AND user_id = ?" if user_id is not None else ""
+            params = (user_id,) if user_id is not None else ()
+
+            while True:
+                with shard.db.read() as conn:
+                    rows = conn.execute(f"""
+                        SELECT rowid, {_select_list(table)}
+                        FROM {table}
+                        WHERE rowid > ? {user_filter}
+                        ORDER BY rowid
+                        LIMIT ?
+                    """, (last_rowid, *params, chunk_size)).fetchall()
+                for row in rows:
+                    record = {"table": table, "cursor": f"{shard_no}:{table}:{row[0]}"}
+                    record.update(zip(fields, row[1:]))
+                    yield record
+                if len(rows) < chunk_size:
+                    break
+                last_rowid = rows[-1][0]
+
+
+def export_ndjson(memory_system, user_id: str = None, cursor: str = None, chunk_size: int = 1000,
+                  progress=None, progress_every: int = 10000):
+    """Generar las líneas NDJSON de la exportación (con cabecera si no se reanuda).
+
+    ``progress(rows, table)`` se llama cada ``progress_every`` filas y al terminar.
+    """
+    if cursor is None:
+        header = {
+            "format": FORMAT,
+            "version": FORMAT_VERSION,
+            "schema_version": memory_system.shards[0].schema_version,
+            "exported_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "user_id": user_id,
+        }
+        yield json.dumps(header, ensure_ascii=False) + "\n"
+
+    rows = 0
+    table = None
+    for record in export_records(memory_system, user_id, cursor, chunk_size):
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+        rows += 1
+        table = record["table"]
+        if progress is not None and rows % progress_every == 0:
+            progress(rows, table)
+    if progress is not None:
+        progress(rows, table)
+
+
+class NDJSONImporter:
+    """Importación incremental por lotes: ``add_lines(...)`` tantas veces como haga falta y ``finish()``."""
+
+    def __init__(self, memory_system, import_id: str, batch_size: int = 5000, user_id: str = None,
+                 on_batch=None, progress=None):
+        self.memory_system = memory_system
+        self.import_id = import_id
+        self.batch_size = batch_size
+        # Importar sólo las filas de este usuario (opcional)
+        self.user_id = user_id
+        # on_batch(user_ids) tras confirmar cada lote (p. ej. invalidar cachés)
+        self.on_batch = on_batch
+        # progress(stats) tras confirmar cada lote
+        self.progress = progress
+
+        # Última línea ya confirmada en cada shard: se salta al reanudar
+        self._committed = [self._read_progress(shard) for shard in memory_system.shards]
+        self._resume_line = min(self._committed)
+        self.line = 0
+        self.imported = dict.fromkeys(TABLE_ORDER, 0)
+        self.skipped = 0
+        self._pending = {}
+        self._pending_rows = 0
+
+    def _read_progress(self, shard) -> int:
+        with shard.db.read() as conn:
+            row = conn.execute("SELECT line FROM import_progress WHERE import_id = ?", (self.import_id,)).fetchone()
+        return row[0] if row else 0
+
+    def reset(self):
+        """Olvidar el progreso guardado y empezar desde la primera línea."""
+        for shard in self.memory_system.shards:
+            with shard.db.write() as conn:
+                conn.execute("DELETE FROM import_progress WHERE import_id = ?", (self.import_id,))
+        self._committed = [0] * len(self.memory_system.shards)
+        self._resume_line = 0
+
+    def add_lines(self, lines):
+        """Procesar líneas NDJSON (str o bytes); confirma un lote cada ``batch_size`` filas."""
+        for line in lines:
+            if not line.strip():
+                continue
+            self.line += 1
+            if self.line <= self._resume_line:
+                self.skipped += 1
+                continue
+
+            record = json.loads(line)
+            table = record.get("table")
+            if table is None:
+                self._check_header(record)
+                continue
+            if table not in EXPORT_FIELDS:
+                raise ValueError(f"Línea {self.line}: tabla desconocida {table!r}")
+            if not record.get("user_id"):
+                raise ValueError(f"Línea {self.line}: fila sin user_id")
+            if self.user_id is not None and record.get("user_id") != self.user_id:
+                continue
+
+            shard_no = self.memory_system.shard_index(record["user_id"])
+            if self.line <= self._committed[shard_no]:
+                self.skipped += 1
+                continue
+            self._pending.setdefault(shard_no, []).append(record)
+            self._pending_rows += 1
+            if self._pending_rows >= self.batch_size:
+                self.flush()
+
+    def _check_header(self, header):
+        if header.get("format") != FORMAT:
+            raise ValueError(f"Línea {self.line}: no es una exportación {FORMAT}")
+        if header.get("version", 0) > FORMAT_VERSION:
+            raise ValueError(f"Versión de formato {header['version']} no soportada (máximo {FORMAT_VERSION})")
+
+    def flush(self):
+        """Confirmar el lote pendiente: una transacción por shard, con su progreso."""
+        if not self._pending:
+            return
+        user_ids = set()
+        for shard_no, records in self._pending.items():
+            shard = self.memory_system.shards[shard_no]
+            by_table = self._group(records)
+            # Los embeddings se calculan antes de tomar el bloqueo de escritura
+            semantic = [row[:5] for row in by_table.get("semantic_context", [])]
+            vectors = shard._embed_semantic_rows(semantic)
+            with shard.db.write() as conn:
+                self._insert(shard, conn, by_table, vectors)
+                conn.execute("""
+                    INSERT INTO import_progress (import_id, line, updated_at)
+                    VALUES (?, ?, datetime('now'))
+                    ON CONFLICT(import_id) DO UPDATE SET line = excluded.line, updated_at = excluded.updated_at
+                """, (self.import_id, self.line))
+            self._committed[shard_no] = self.line
+            user_ids.update(record["user_id"] for record in records)
+
+        self._pending = {}
+        self._pending_rows = 0
+        if self.on_batch is not None:
+            self.on_batch(user_ids)
+        if self.progress is not None:
+            self.progress(self.get_stats())
+
+    @staticmethod
+    def _group(records):
+        """Filas de un shard agrupadas por tabla (orden de llegada dentro de cada tabla)."""
+        by_table = {}
+        for record in records:
+            by_table.setdefault(record["table"], []).append(
+                tuple(record.get(field) for field in EXPORT_FIELDS[record["table"]])
+            )
+        return by_table
+
+    def _insert(self, shard, conn, by_table, vectors):
+        """Insertar las filas agrupadas de un shard; ``vectors`` son los embeddings de semantic_context."""
+        for table in TABLE_ORDER:
+            rows = by_table.get(table)
+            if not rows:
+                continue
+            if table == "sessions":
+                conn.executemany("""
+                    INSERT INTO sessions (id, user_id, created_at, last_activity)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET last_activity = MAX(last_activity, excluded.last_activity)
+                """, rows)
+            elif table == "user_memories":
+                # Una fila por clave: gana la memoria más reciente (la existente o la importada)
+                conn.executemany("""
+                    INSERT INTO user_memories (user_id, session_id, key, value, timestamp)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(user_id, key) DO UPDATE SET
+                        session_id = excluded.session_id,
+                        value = excluded.value,
+                        timestamp = excluded.timestamp
+                    WHERE excluded.timestamp >= user_memories.timestamp
+                """, rows)
+            elif table == "semantic_context":
+                shard._insert_semantic_rows(conn, [row[:5] for row in rows], vectors, [row[5] for row in rows])
+            else:
+                fields = EXPORT_FIELDS[table]
+                conn.executemany(f"""
+                    INSERT INTO {table} ({", ".join(fields)})
+                    VALUES ({", ".join("?" for _ in fields)})
+                """, rows)
+            self.imported[table] += len(rows)
+
+    def finish(self):
+        """Confirmar lo pendiente y devolver el resumen."""
+        self.flush()
+        return self.get_stats()
+
+    def get_stats(self):
+        return {
+            "import_id": self.import_id,
+            "lines": self.line,
+            "imported": dict(self.imported),
+            "skipped": self.skipped,
+        }
@@ -0,0 +1,104 @@
+"""
+Funciones de embedding locales para el contexto semántico.
+
+Un embedder es cualquier objeto con ``name`` (identifica el modelo con el que se
+calculó cada fila), ``dim`` y ``embed(texts) -> np.ndarray`` de forma
+``(len(texts), dim)`` en float32 y normalizado (norma 1), para que el producto
+escalar sea la similitud coseno.
+
+``HashingEmbedder`` es determinista y no necesita modelos ni red: sirve para
+pruebas sin conexión y como opción por defecto. Se puede usar otro embedder
+indicando ``modulo:fabrica`` en ``SEMANTIC_EMBEDDER``.
+"""
+
+import hashlib
+import importlib
+from functools import lru_cache
+
+import numpy as np
+
+from .text_search import query_terms
+
+# Peso de los n-gramas de caracteres frente al término completo
+CHAR_NGRAM_WEIGHT = 0.5
+
+
+class HashingEmbedder:
+    """Embedding por hashing de términos y trigramas de caracteres.
+
+    Los términos usan la misma normalización y stemming ligero que la búsqueda
+    FTS5; los trigramas acercan variantes que el stemming no une ("viaje",
+    "viajar"). Cada rasgo se proyecta con un hash estable (blake2b), así que el
+    resultado no depende del proceso ni de ``PYTHONHASHSEED``.
+    """
+
+    def __init__(self, dim: int = 256, ngram: int = 3):
+        self.dim = dim
+        self.ngram = ngram
+        self.name = f"hashing-{dim}-{ngram}"
+        # Rasgos de cada término ya proyectados: (índices, pesos con signo)
+        self._term_features = lru_cache(maxsize=65536)(self._project_term)
+
+    def _project_term(self, term: str):
+        features = [(term, 1.0)]
+        padded = f"#{term}#"
+        if len(padded) > self.ngram:
+            features += [(padded[i:i + self.ngram], CHAR_NGRAM_WEIGHT)
+                         for i in range(len(padded) - self.ngram + 1)]
+
+        indices = np.empty(len(features), dtype=np.int64)
+        weights = np.empty(len(features), dtype=np.float32)
+        for position, (feature, weight) in enumerate(features):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            indices[position] = value % self.dim
+            # El bit alto decide el signo: las colisiones tienden a cancelarse
+            weights[position] = weight if value >> 63 else -weight
+        return indices, weights
+
+    def embed(self, texts):
+        """Vectores normalizados (float32) de una lista de textos."""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = [self._term_features(term) for term in query_terms(text)]
+            if not features:
+                continue
+            indices = np.concatenate([indices for indices, _ in features])
+            weights = np.concatenate([weights for _, weights in features])
+            vectors[row] = np.bincount(indices, weights=weights, minlength=self.dim)
+        return normalize_rows(vectors)
+
+    def __repr__(self):
+        return f"HashingEmbedder(dim={self.dim}, ngram={self.ngram})"
+
+
+def normalize_rows(vectors):
+    """Normalizar cada fila a norma 1 (las filas nulas se dejan a cero)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def load_embedder(spec: str = "hashing", dim: int = 256):
+    """Crear el embedder configurado.
+
+    ``spec`` es ``hashing`` o ``paquete.modulo:fabrica``; la fábrica se llama
+    sin argumentos y debe devolver un objeto con ``name``, ``dim`` y ``embed``.
+    """
+    if not spec or spec == "hashing":
+        return HashingEmbedder(dim=dim)
+
+    module_name, _, factory_name = spec.partition(":")
+    if not factory_name:
+        raise ValueError(f"Embedder '{spec}' no válido: use 'hashing' o 'modulo:fabrica'")
+    factory = getattr(importlib.import_module(module_name), factory_name)
+    embedder = factory()
+    for attribute in ("name", "dim", "embed"):
+        if not hasattr(embedder, attribute):
+            raise TypeError(f"El embedder '{spec}' no define '{attribute}'")
+    return embedder
+
+
+def to_blob(vector) -> bytes:
+    """Serializar un vector para la columna embedding (float32 little-endian)."""
+    return np.asarray(vector, dtype="<f4").tobytes()
@@ -0,0 +1,137 @@
+"""
+Almacén de memoria en el proceso, sin persistencia.
+
+Reproduce la semántica del almacén SQLite (una memoria por clave con
+historial, límites por usuario, búsqueda por términos con prefijo) sobre
+diccionarios, para pruebas y desarrollo sin base de datos.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+from . import text_search
+from .memory_store import MemoryStore, memory_limits
+
+
+def _now() -> str:
+    """Marca de tiempo UTC con el mismo formato que datetime('now') de SQLite."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _age_days(timestamp: str) -> float:
+    stored = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - stored).total_seconds() / 86400
+
+
+class InMemoryMemoryStore(MemoryStore):
+    """MemoryStore sobre diccionarios del proceso."""
+
+    backend = "memory"
+
+    def __init__(self, max_memories_per_user: int = None, memory_history_versions: int = None):
+        self.max_memories_per_user, self.memory_history_versions = memory_limits(
+            max_memories_per_user, memory_history_versions
+        )
+        # user_id -> {key: (value, session_id, timestamp)} en orden de última escritura
+        self._memories = {}
+        # (user_id, key) -> [(value, timestamp, replaced_at)], la más reciente primero
+        self._history = {}
+        # user_id -> [(role, content, timestamp, session_id)] en orden de llegada
+        self._conversations = {}
+        # session_id -> {"user_id", "created_at", "last_activity"}
+        self._sessions = {}
+        # user_id -> [(content, relevance_score, timestamp, tokens normalizados)]
+        self._semantic = {}
+        # Las escrituras de un lote se aplican sin intercalarse con otro lote
+        self._write_lock = asyncio.Lock()
+
+    async def get_memories(self, user_id: str):
+        memories = self._memories.get(user_id, {})
+        return [(key, value, timestamp) for key, (value, _, timestamp) in reversed(memories.items())]
+
+    async def get_memory_history(self, user_id: str, key: str):
+        return list(self._history.get((user_id, key), []))
+
+    async def get_conversation_history(self, user_id: str, limit: int = 10):
+        messages = self._conversations.get(user_id, [])
+        return [(role, content, timestamp) for role, content, timestamp, _ in reversed(messages[-limit:])]
+
+    async def search_semantic_context(self, user_id: str, query: str, limit: int = 5):
+        terms = text_search.query_terms(query)
+        if not terms:
+            return []
+
+        results = []
+        for content, relevance_score, timestamp, tokens in self._semantic.get(user_id, []):
+            # Misma semántica que la consulta FTS5: términos por prefijo
+            matched = sum(1 for term in terms if any(token.startswith(term) for token in tokens))
+            if matched:
+                score = text_search.blend_signals(matched / len(terms), relevance_score, _age_days(timestamp))
+                results.append((content, score, timestamp))
+        results.sort(key=lambda row: row[1], reverse=True)
+        return results[:limit]
+
+    async def get_or_create_session(self, user_id: str, session_id: str = None):
+        if not session_id:
+            session_id = str(uuid.uuid4())
+        now = _now()
+        session = self._sessions.setdefault(session_id, {"user_id": user_id, "created_at": now})
+        session["last_activity"] = now
+        return session_id
+
+    async def save_turns(self, records):
+        async with self._write_lock:
+            for record in records:
+                now = _now()
+                if record.messages:
+                    self._conversations.setdefault(record.user_id, []).extend(
+                        (role, content, now, record.session_id) for role, content in record.messages
+                    )
+                for key, value in record.memories:
+                    self._upsert_memory(record.user_id, record.session_id, key, value, now)
+                if record.semantic:
+                    self._semantic.setdefault(record.user_id, []).extend(
+                        (content, score, now, text_search.normalize_text(content).split())
+                        for _, content, score in record.semantic
+                    )
+
+    def _upsert_memory(self, user_id: str, session_id: str, key: str, value: str, now: str):
+        memories = self._memories.setdefault(user_id, {})
+        previous = memories.pop(key, None)
+        if previous is not None and previous[0] != value and self.memory_history_versions > 0:
+            history = self._history.setdefault((user_id, key), [])
+            history.insert(0, (previous[0], previous[2], now))
+            del history[self.memory_history_versions:]
+        memories[key] = (value, session_id, now)
+
+        if self.max_memories_per_user > 0:
+            # Se descartan las memorias menos recientes (las primeras del diccionario)
+            while len(memories) > self.max_memories_per_user:
+                del memories[next(iter(memories))]
+
+    async def get_debug_info(self, user_id: str):
+        messages = self._conversations.get(user_id, [])
+        return {
+            "memory_count": len(self._memories.get(user_id, {})),
+            "conversation_count": len(messages),
+            "recent_conversations": [
+                {"role": role, "content": content[:100], "timestamp": timestamp, "session_id": session_id}
+                for role, content, timestamp, session_id in reversed(messages[-5:])
+            ],
+        }
+
+    async def get_storage_stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "user_memories": sum(len(memories) for memories in self._memories.values()),
+            "conversation_log": sum(len(messages) for messages in self._conversations.values()),
+            "semantic_context": sum(len(entries) for entries in self._semantic.values()),
+            "users": len(self._conversations),
+        }
+
+    def get_info(self):
+        return {"backend": self.backend, "semantic_search": "terms", "users": len(self._memories)}
+
+    async def close(self):
+        pass
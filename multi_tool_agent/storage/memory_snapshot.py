@@ -0,0 +1,203 @@
+"""
+Instantáneas en disco de ``InMemoryMemoryService`` para reinicios en caliente.
+
+``SnapshotMemoryService`` es el ``InMemoryMemoryService`` de ADK más:
+
+- ``snapshot()``: escribe todo su contenido en un fichero binario compacto,
+  en un hilo aparte y de forma atómica (fichero temporal + ``fsync`` +
+  ``os.replace``): un corte a mitad deja la instantánea anterior intacta,
+- restauración perezosa: al arrancar sólo se lee el índice del fichero; los
+  eventos de cada usuario se descomprimen la primera vez que se buscan o se
+  amplían. En la siguiente instantánea, los bloques de los usuarios que no
+  se han tocado se copian tal cual, sin descomprimirlos.
+
+Formato: ``MAGIC``, un bloque zlib por usuario (JSON con sus sesiones y
+eventos), el índice (zlib, JSON con app, usuario, posición y longitud de cada
+bloque) y al final la posición y longitud del índice más ``MAGIC``.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+
+from google.adk.events import Event
+from google.adk.memory import InMemoryMemoryService
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ADKMEM1\n"
+_TRAILER = struct.Struct("<QQ")
+
+
+class SnapshotMemoryService(InMemoryMemoryService):
+    """InMemoryMemoryService con instantáneas atómicas y restauración perezosa por usuario."""
+
+    def __init__(self, snapshot_path: str = "adk_agent_memory.snapshot", compression_level: int = 6):
+        super().__init__()
+        self.snapshot_path = snapshot_path
+        self.compression_level = compression_level
+        # (app_name, user_id) -> (posición, longitud) del bloque aún sin cargar
+        self._unloaded = {}
+        # Fichero restaurado: se mantiene abierto mientras queden bloques sin cargar
+        # (sigue siendo legible aunque una instantánea nueva lo sustituya)
+        self._restored_file = None
+        self._changed = False
+        self._snapshot_lock = asyncio.Lock()
+        self.stats = {"snapshots": 0, "last_snapshot_bytes": 0, "last_snapshot_ms": 0.0,
+                      "restored_users": 0, "hydrated_users": 0, "restore_ms": 0.0}
+        self.restore()
+
+    @classmethod
+    def from_env(cls, default_path: str = "adk_agent_memory.snapshot"):
+        """Crear el servicio con ADK_MEMORY_SNAPSHOT."""
+        return cls(os.getenv("ADK_MEMORY_SNAPSHOT", default_path))
+
+    # ------------------------------------------------------------------
+    # API de BaseMemoryService: cargar el usuario antes de tocarlo
+    # ------------------------------------------------------------------
+
+    async def add_session_to_memory(self, session):
+        self._hydrate((session.app_name, session.user_id))
+        self._changed = True
+        await super().add_session_to_memory(session)
+
+    async def add_events_to_memory(self, *, app_name, user_id, events, session_id=None,
+                                   custom_metadata=None):
+        self._hydrate((app_name, user_id))
+        self._changed = True
+        await super().add_events_to_memory(app_name=app_name, user_id=user_id, events=events,
+                                           session_id=session_id, custom_metadata=custom_metadata)
+
+    async def search_memory(self, *, app_name, user_id, query):
+        self._hydrate((app_name, user_id))
+        return await super().search_memory(app_name=app_name, user_id=user_id, query=query)
+
+    # ------------------------------------------------------------------
+    # Instantáneas
+    # ------------------------------------------------------------------
+
+    async def snapshot(self, force: bool = False):
+        """Escribir la instantánea si hubo cambios desde la anterior (o con ``force``)."""
+        async with self._snapshot_lock:
+            if not (self._changed or force):
+                return None
+            # Copia de las listas en el event loop; serializar y escribir, en un hilo
+            with self._lock:
+                users = {
+                    user_key: {session_id: list(events) for session_id, events in sessions.items()}
+                    for user_key, sessions in self._session_events.items()
+                }
+            unloaded = dict(self._unloaded)
+            self._changed = False
+            started = time.perf_counter()
+            try:
+                size = await asyncio.to_thread(self._write_snapshot, users, unloaded, self._restored_file)
+            except Exception:
+                self._changed = True
+                raise
+            if not self._unloaded and self._restored_file is not None:
+                self._restored_file.close()
+                self._restored_file = None
+            self.stats["snapshots"] += 1
+            self.stats["last_snapshot_bytes"] = size
+            self.stats["last_snapshot_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            logger.debug("💾 Instantánea de memoria escrita: %s bytes en %s ms",
+                         size, self.stats["last_snapshot_ms"])
+            return size
+
+    def _write_snapshot(self, users, unloaded, restored_file):
+        index = []
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "wb") as out:
+            out.write(MAGIC)
+            for (app_name, user_id), sessions in users.items():
+                payload = {
+                    session_id: [event.model_dump(mode="json", exclude_defaults=True) for event in events]
+                    for session_id, events in sessions.items()
+                }
+                block = zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                                      self.compression_level)
+                index.append((app_name, user_id, out.tell(), len(block)))
+                out.write(block)
+            # Usuarios restaurados que nadie ha tocado: el bloque se copia sin descomprimir
+            for (app_name, user_id), (offset, length) in unloaded.items():
+                index.append((app_name, user_id, out.tell(), length))
+                out.write(os.pread(restored_file.fileno(), length, offset))
+            index_block = zlib.compress(json.dumps(index, ensure_ascii=False).encode("utf-8"))
+            index_offset = out.tell()
+            out.write(index_block)
+            out.write(_TRAILER.pack(index_offset, len(index_block)))
+            out.write(MAGIC)
+            out.flush()
+            os.fsync(out.fileno())
+            size = out.tell()
+        os.replace(tmp_path, self.snapshot_path)
+        return size
+
+    def restore(self):
+        """Leer sólo el índice de la instantánea; los usuarios se cargan al usarse."""
+        if not os.path.exists(self.snapshot_path):
+            return
+        started = time.perf_counter()
+        snapshot_file = open(self.snapshot_path, "rb")
+        try:
+            size = os.fstat(snapshot_file.fileno()).st_size
+            tail_size = _TRAILER.size + len(MAGIC)
+            if size < len(MAGIC) + tail_size or snapshot_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError("cabecera no válida")
+            tail = os.pread(snapshot_file.fileno(), tail_size, size - tail_size)
+            if tail[_TRAILER.size:] != MAGIC:
+                raise ValueError("instantánea incompleta")
+            index_offset, index_length = _TRAILER.unpack(tail[:_TRAILER.size])
+            index = json.loads(zlib.decompress(os.pread(snapshot_file.fileno(), index_length, index_offset)))
+        except Exception as e:
+            snapshot_file.close()
+            logger.warning("⚠️  Instantánea de memoria %s descartada: %s", self.snapshot_path, e)
+            return
+        self._unloaded = {(app_name, user_id): (offset, length) for app_name, user_id, offset, length in index}
+        self._restored_file = snapshot_file if self._unloaded else None
+        if self._restored_file is None:
+            snapshot_file.close()
+        self.stats["restored_users"] = len(self._unloaded)
+        self.stats["restore_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        logger.info("♻️  Memoria restaurada de %s: %s usuarios (%s ms, carga perezosa)",
+                    self.snapshot_path, len(self._unloaded), self.stats["restore_ms"])
+
+    def _hydrate(self, user_key):
+        """Cargar los eventos de un usuario desde la instantánea restaurada, si está pendiente."""
+        location = self._unloaded.pop(user_key, None)
+        if location is None:
+            return
+        offset, length = location
+        payload = json.loads(zlib.decompress(os.pread(self._restored_file.fileno(), length, offset)))
+        sessions = {
+            session_id: [Event.model_validate(event) for event in events]
+            for session_id, events in payload.items()
+        }
+        with self._lock:
+            self._session_events[user_key] = sessions
+        self.stats["hydrated_users"] += 1
+        # Una instantánea en curso puede estar copiando bloques de este fichero
+        if not self._unloaded and not self._snapshot_lock.locked():
+            self._restored_file.close()
+            self._restored_file = None
+
+    async def close(self):
+        """Última instantánea al apagar."""
+        await self.snapshot()
+        if self._restored_file is not None:
+            self._restored_file.close()
+            self._restored_file = None
+
+    def get_stats(self):
+        return {
+            "snapshot_path": self.snapshot_path,
+            "users_in_memory": len(self._session_events),
+            "users_not_loaded": len(self._unloaded),
+            "pending_changes": self._changed,
+            **self.stats,
+        }
@@ -0,0 +1,124 @@
+"""
+Interfaz asíncrona común de los almacenes de memoria del Database Agent.
+
+El agente y el servidor sólo usan ``MemoryStore``; el backend se elige con
+``MEMORY_STORE_BACKEND``:
+
+- ``sqlite`` (por defecto): fichero SQLite local (``SQLiteMemoryStore``), o
+  varios ficheros repartidos por usuario con ``SQLITE_SHARDS``.
+- ``memory``: todo en el proceso, sin persistencia (``InMemoryMemoryStore``),
+  pensado para pruebas.
+- ``postgres``: servidor PostgreSQL con pool de conexiones
+  (``PostgresMemoryStore``, requiere ``asyncpg``).
+
+Formatos de retorno, iguales en todos los backends (marcas de tiempo en UTC
+como texto ``YYYY-MM-DD HH:MM:SS``):
+
+- memorias: ``(key, value, timestamp)``, las más recientes primero
+- historial de una memoria: ``(value, timestamp, replaced_at)``
+- conversación: ``(role, content, timestamp)``, los mensajes más recientes primero
+- contexto semántico: ``(content, score, timestamp)``, por puntuación
+"""
+
+import os
+from abc import ABC, abstractmethod
+
+from .write_behind import TurnRecord
+
+MEMORY_STORE_BACKENDS = ("sqlite", "memory", "postgres")
+
+
+class MemoryStore(ABC):
+    """Operaciones de memoria persistente que usan el agente y el servidor."""
+
+    backend = "abstract"
+
+    @abstractmethod
+    async def get_memories(self, user_id: str):
+        """Memorias personales de un usuario."""
+
+    @abstractmethod
+    async def get_memory_history(self, user_id: str, key: str):
+        """Valores anteriores de una memoria, del más reciente al más antiguo."""
+
+    @abstractmethod
+    async def get_conversation_history(self, user_id: str, limit: int = 10):
+        """Últimos mensajes de la conversación de un usuario."""
+
+    @abstractmethod
+    async def search_semantic_context(self, user_id: str, query: str, limit: int = 5):
+        """Entradas de contexto semántico relevantes para la consulta."""
+
+    @abstractmethod
+    async def get_or_create_session(self, user_id: str, session_id: str = None):
+        """Crear la sesión o actualizar su actividad; devuelve su id."""
+
+    @abstractmethod
+    async def save_turns(self, records):
+        """Confirmar uno o varios turnos (TurnRecord) de forma atómica."""
+
+    @abstractmethod
+    async def get_debug_info(self, user_id: str):
+        """Contadores y últimos mensajes de un usuario para /debug."""
+
+    @abstractmethod
+    async def get_storage_stats(self):
+        """Totales del almacén (filas por tabla, usuarios...) para administración."""
+
+    @abstractmethod
+    def get_info(self):
+        """Descripción del backend (tipo, ubicación, búsqueda...)."""
+
+    @abstractmethod
+    async def close(self):
+        """Esperar a las operaciones en curso y liberar las conexiones."""
+
+    def shard_key(self, user_id: str):
+        """Partición de escritura del usuario: turnos de particiones distintas se confirman en paralelo."""
+        return 0
+
+    async def save_memory(self, user_id: str, session_id: str, key: str, value: str):
+        """Guardar una sola memoria (una fila por clave: gana el último valor)."""
+        await self.save_turns([TurnRecord(user_id, session_id, memories=[(key, value)])])
+
+
+def memory_limits(max_memories_per_user: int = None, memory_history_versions: int = None):
+    """Límites de crecimiento de la memoria personal (argumentos o variables de entorno)."""
+    if max_memories_per_user is None:
+        max_memories_per_user = int(os.getenv("MEMORY_MAX_KEYS_PER_USER", "50"))
+    if memory_history_versions is None:
+        memory_history_versions = int(os.getenv("MEMORY_HISTORY_VERSIONS", "5"))
+    return max_memories_per_user, memory_history_versions
+
+
+def create_sqlite_memory_system(db_path: str = None, shards: int = None, **options):
+    """DatabaseMemorySystem (o ShardedMemorySystem con varios shards) según el entorno."""
+    from .sqlite_store import DatabaseMemorySystem
+    db_path = db_path or os.getenv("DATABASE_AGENT_DB_PATH", "database_agent_sessions.db")
+    shards = shards or int(os.getenv("SQLITE_SHARDS", "1"))
+    if shards > 1:
+        from .sharding import ShardedMemorySystem
+        return ShardedMemorySystem(db_path, shards, **options)
+    return DatabaseMemorySystem(db_path, **options)
+
+
+def create_memory_store(backend: str = None, **options):
+    """Crear el almacén configurado en ``MEMORY_STORE_BACKEND`` (o el indicado)."""
+    backend = (backend or os.getenv("MEMORY_STORE_BACKEND", "sqlite")).lower()
+
+    if backend == "sqlite":
+        from .sqlite_store import SQLiteMemoryStore
+        return SQLiteMemoryStore(create_sqlite_memory_system(**options))
+
+    if backend == "memory":
+        from .inmemory_store import InMemoryMemoryStore
+        return InMemoryMemoryStore(**options)
+
+    if backend == "postgres":
+        from .postgres_store import PostgresMemoryStore
+        dsn = options.pop("dsn", None) or os.getenv("MEMORY_STORE_POSTGRES_DSN")
+        if not dsn:
+            raise ValueError("MEMORY_STORE_POSTGRES_DSN es obligatorio con MEMORY_STORE_BACKEND=postgres")
+        return PostgresMemoryStore(dsn, **options)
+
+    raise ValueError(f"Backend de memoria '{backend}' no válido. Opciones: {MEMORY_STORE_BACKENDS}")
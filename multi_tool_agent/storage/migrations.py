@@ -0,0 +1,277 @@
+"""
+Migraciones versionadas del esquema de la base de datos de memoria.
+
+La versión aplicada se guarda en ``PRAGMA user_version``. Cada migración se
+ejecuta en su propia transacción junto con la actualización de la versión, así
+que una base de datos existente se actualiza en el sitio al arrancar y un fallo
+a mitad de camino no deja el esquema en un estado intermedio.
+"""
+
+import logging
+import sqlite3
+
+from .text_search import FTS_TOKENIZER
+
+logger = logging.getLogger(__name__)
+
+
+def _create_base_schema(conn):
+    """Esquema inicial (compatible con bases de datos creadas antes de las migraciones)."""
+    # Tabla de memorias de usuario
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_memories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Tabla de conversaciones
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS conversation_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Tabla de sesiones
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_activity DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Tabla de contexto semántico
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS semantic_context (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            context_type TEXT NOT NULL,
+            content TEXT NOT NULL,
+            relevance_score REAL DEFAULT 1.0,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _add_user_indexes(conn):
+    """Índices compuestos por usuario para evitar recorridos completos de tabla."""
+    # Memorias: índice cubriente para "WHERE user_id = ? ORDER BY timestamp DESC"
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_memories_user_ts
+        ON user_memories (user_id, timestamp, key, value)
+    """)
+
+    # Historial: lecturas recientes por usuario y mensajes por sesión (/debug)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conversation_log_user_ts
+        ON conversation_log (user_id, timestamp)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conversation_log_user_session
+        ON conversation_log (user_id, session_id, timestamp)
+    """)
+
+    # Sesiones de un usuario por actividad
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_user_activity
+        ON sessions (user_id, last_activity)
+    """)
+
+    # Contexto semántico por usuario
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_semantic_context_user_ts
+        ON semantic_context (user_id, timestamp)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_semantic_context_user_session
+        ON semantic_context (user_id, session_id)
+    """)
+
+    # Estadísticas para que el planificador elija los índices nuevos
+    conn.execute("ANALYZE")
+
+
+def _add_semantic_fts(conn):
+    """Índice FTS5 sobre semantic_context, sincronizado mediante triggers."""
+    try:
+        # Tabla de contenido externo: el texto sólo se guarda en semantic_context
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS semantic_context_fts USING fts5(
+                user_id, content,
+                content='semantic_context', content_rowid='id',
+                tokenize='{FTS_TOKENIZER}'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        # SQLite compilado sin FTS5: la búsqueda sigue funcionando con LIKE
+        logger.warning("⚠️  FTS5 no disponible, se mantiene la búsqueda por LIKE: %s", e)
+        return
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS semantic_context_fts_insert
+        AFTER INSERT ON semantic_context BEGIN
+            INSERT INTO semantic_context_fts (rowid, user_id, content)
+            VALUES (new.id, new.user_id, new.content);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS semantic_context_fts_delete
+        AFTER DELETE ON semantic_context BEGIN
+            INSERT INTO semantic_context_fts (semantic_context_fts, rowid, user_id, content)
+            VALUES ('delete', old.id, old.user_id, old.content);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS semantic_context_fts_update
+        AFTER UPDATE OF user_id, content ON semantic_context BEGIN
+            INSERT INTO semantic_context_fts (semantic_context_fts, rowid, user_id, content)
+            VALUES ('delete', old.id, old.user_id, old.content);
+            INSERT INTO semantic_context_fts (rowid, user_id, content)
+            VALUES (new.id, new.user_id, new.content);
+        END
+    """)
+
+    # Indexar las filas existentes
+    conn.execute("INSERT INTO semantic_context_fts (semantic_context_fts) VALUES ('rebuild')")
+
+
+def _unique_user_memories(conn):
+    """Compactar memorias duplicadas y crear la clave única (user_id, key)."""
+    # Historial de versiones anteriores de cada memoria
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_memory_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            timestamp DATETIME,
+            replaced_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_memory_history_user_key
+        ON user_memory_history (user_id, key, replaced_at)
+    """)
+
+    # Filas que no son la más reciente de su (user_id, key)
+    conn.execute("""
+        CREATE TEMP TABLE superseded_memories AS
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY user_id, key ORDER BY timestamp DESC, id DESC
+            ) AS position
+            FROM user_memories
+        )
+        WHERE position > 1
+    """)
+    conn.execute("""
+        INSERT INTO user_memory_history (user_id, session_id, key, value, timestamp)
+        SELECT user_id, session_id, key, value, timestamp
+        FROM user_memories
+        WHERE id IN (SELECT id FROM superseded_memories)
+    """)
+    removed = conn.execute("""
+        DELETE FROM user_memories WHERE id IN (SELECT id FROM superseded_memories)
+    """).rowcount
+    conn.execute("DROP TABLE superseded_memories")
+
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_user_memories_user_key
+        ON user_memories (user_id, key)
+    """)
+    if removed:
+        logger.info("🧹 Memorias duplicadas compactadas: %s", removed)
+
+
+def _add_semantic_embeddings(conn):
+    """Columnas para el embedding de cada fila de semantic_context."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(semantic_context)")}
+    # Vector float32 serializado y nombre del embedder que lo calculó; las filas
+    # existentes quedan a NULL y se calculan al reconstruir el índice vectorial
+    if "embedding" not in columns:
+        conn.execute("ALTER TABLE semantic_context ADD COLUMN embedding BLOB")
+    if "embedding_model" not in columns:
+        conn.execute("ALTER TABLE semantic_context ADD COLUMN embedding_model TEXT")
+
+
+def _add_import_progress(conn):
+    """Última línea confirmada de cada importación NDJSON (para reanudarla)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS import_progress (
+            import_id TEXT PRIMARY KEY,
+            line INTEGER NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _add_retention_indexes(conn):
+    """Índices por fecha para localizar las filas caducadas sin recorrer la tabla."""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conversation_log_ts
+        ON conversation_log (timestamp)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_semantic_context_ts
+        ON semantic_context (timestamp)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_memory_history_replaced
+        ON user_memory_history (replaced_at)
+    """)
+
+
+# (versión, descripción, función) en orden estricto de aplicación
+MIGRATIONS = [
+    (1, "Esquema base de memoria", _create_base_schema),
+    (2, "Índices compuestos (user_id, timestamp) / (user_id, session_id)", _add_user_indexes),
+    (3, "Índice FTS5 de semantic_context", _add_semantic_fts),
+    (4, "Clave única (user_id, key) en user_memories e historial de versiones", _unique_user_memories),
+    (5, "Columnas de embedding en semantic_context", _add_semantic_embeddings),
+    (6, "Progreso de importaciones NDJSON", _add_import_progress),
+    (7, "Índices por fecha para la retención", _add_retention_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Versión de esquema aplicada en la base de datos."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def has_table(conn, name: str) -> bool:
+    """Comprobar si existe una tabla (o tabla virtual) en el esquema."""
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row is not None
+
+
+def apply_migrations(db):
+    """Aplicar las migraciones pendientes sobre un SQLiteConnectionManager.
+
+    Devuelve la lista de versiones aplicadas en esta llamada.
+    """
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        with db.write() as conn:
+            # Releer dentro de la transacción por si otro proceso migró antes
+            if get_schema_version(conn) >= version:
+                continue
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+        applied.append(version)
+        logger.info("🔄 Migración %s aplicada: %s", version, description)
+    return applied
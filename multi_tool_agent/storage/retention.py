@@ -0,0 +1,336 @@
+"""
+Retención, archivado y recuperación de espacio de la memoria SQLite.
+
+Cada turno añade filas a ``conversation_log`` y ``semantic_context`` (el
+mensaje y la respuesta completa), así que sin límites el fichero, la caché de
+páginas y los recorridos crecen sin fin. Una política por tabla fija la
+antigüedad máxima de las filas y/o cuántas conserva cada usuario (las más
+recientes). Configuración por variables de entorno::
+
+    RETENTION_CONVERSATION_LOG_MAX_AGE_DAYS=90
+    RETENTION_SEMANTIC_CONTEXT_MAX_ROWS_PER_USER=2000
+
+Las filas caducadas se escriben antes de borrarlas en ficheros fríos NDJSON
+comprimidos con gzip (mismo formato que la exportación, así que se recuperan
+con ``memory_transfer.py import``), uno por tabla y día en
+``<base de datos>_archive/``. El fichero se sincroniza con fsync antes del
+borrado: una interrupción entre ambos puede archivar una fila dos veces, pero
+nunca perderla.
+
+Todo se hace en pasos pequeños: cada lote se lee con un lector (WAL) y se
+borra en una transacción corta, y entre pasos se cede el escritor a las
+peticiones. Con ``auto_vacuum=INCREMENTAL`` las páginas liberadas se devuelven
+al sistema con ``PRAGMA incremental_vacuum`` también por pasos.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from .bulk_transfer import EXPORT_FIELDS, FORMAT, FORMAT_VERSION, _select_list
+
+logger = logging.getLogger(__name__)
+
+# Tablas con política de retención -> columna de fecha
+RETENTION_TABLES = {
+    "conversation_log": "timestamp",
+    "semantic_context": "timestamp",
+    "user_memory_history": "replaced_at",
+}
+ARCHIVE_MODES = ("gzip", "off")
+
+
+@dataclass
+class RetentionPolicy:
+    """Límites de una tabla (0 = sin límite)."""
+
+    table: str
+    max_age_days: float = 0
+    max_rows_per_user: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_age_days > 0 or self.max_rows_per_user > 0
+
+
+def load_retention_policies():
+    """Políticas activas según ``RETENTION_<TABLA>_MAX_AGE_DAYS`` / ``_MAX_ROWS_PER_USER``."""
+    policies = []
+    for table in RETENTION_TABLES:
+        prefix = f"RETENTION_{table.upper()}"
+        policy = RetentionPolicy(
+            table,
+            max_age_days=float(os.getenv(f"{prefix}_MAX_AGE_DAYS", "0")),
+            max_rows_per_user=int(os.getenv(f"{prefix}_MAX_ROWS_PER_USER", "0")),
+        )
+        if policy.enabled:
+            policies.append(policy)
+    return policies
+
+
+class RetentionManager:
+    """Aplica las políticas y recupera espacio en todos los shards, por pasos."""
+
+    def __init__(self, memory_system, policies=None, archive: str = None, archive_dir: str = None,
+                 batch_size: int = None, vacuum_pages: int = None, pause_seconds: float = None,
+                 on_expire=None):
+        # DatabaseMemorySystem o ShardedMemorySystem
+        self.memory_system = memory_system
+        # on_expire(table, user_ids) tras borrar cada lote (p. ej. invalidar cachés)
+        self.on_expire = on_expire
+        self.policies = load_retention_policies() if policies is None else policies
+        archive = (archive or os.getenv("RETENTION_ARCHIVE", "gzip")).lower()
+        if archive not in ARCHIVE_MODES:
+            raise ValueError(f"Modo de archivado '{archive}' no válido. Opciones: {ARCHIVE_MODES}")
+        self.archive = archive
+        self.archive_dir = archive_dir or os.getenv("RETENTION_ARCHIVE_DIR")
+        # Filas por transacción de borrado y páginas por paso de incremental_vacuum
+        self.batch_size = batch_size or int(os.getenv("RETENTION_BATCH_SIZE", "250"))
+        self.vacuum_pages = vacuum_pages if vacuum_pages is not None else int(os.getenv("RETENTION_VACUUM_PAGES", "256"))
+        # Pausa entre pasos para que las peticiones tomen el escritor
+        self.pause_seconds = (pause_seconds if pause_seconds is not None
+                              else float(os.getenv("RETENTION_PAUSE_SECONDS", "0.05")))
+
+        self.passes = 0
+        self.deleted = dict.fromkeys(RETENTION_TABLES, 0)
+        self.archived = 0
+        self.vacuumed_pages = 0
+        self.last_pass = None
+
+    def archive_path(self, shard, table: str) -> str:
+        """Fichero frío de hoy para una tabla de un shard."""
+        root = os.path.splitext(shard.db_path)[0]
+        if self.archive_dir:
+            directory = os.path.join(self.archive_dir, os.path.basename(root))
+        else:
+            directory = f"{root}_archive"
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        return os.path.join(directory, f"{table}-{day}.ndjson.gz")
+
+    def run_pass(self, stop_event: threading.Event = None, dry_run: bool = False):
+        """Aplicar todas las políticas y recuperar espacio; devuelve el resumen de la pasada.
+
+        ``stop_event`` interrumpe la pasada entre dos pasos. Con ``dry_run``
+        sólo cuenta las filas que se borrarían.
+        """
+        started = time.perf_counter()
+        summary = {"deleted": dict.fromkeys(RETENTION_TABLES, 0), "vacuumed_pages": 0}
+        for shard in self.memory_system.shards:
+            if shard.db.in_memory and self.archive == "gzip":
+                # Sin fichero no hay dónde dejar el archivo frío
+                continue
+            for policy in self.policies:
+                for ids in self._expired_batches(shard, policy):
+                    if stop_event is not None and stop_event.is_set():
+                        return self._finish_pass(summary, started, interrupted=True)
+                    if not dry_run:
+                        self._expire(shard, policy.table, ids)
+                        self._pause()
+                    summary["deleted"][policy.table] += len(ids)
+            if not dry_run:
+                summary["vacuumed_pages"] += self._reclaim(shard, stop_event)
+        if dry_run:
+            return summary
+        return self._finish_pass(summary, started)
+
+    def _finish_pass(self, summary, started, interrupted: bool = False):
+        self.passes += 1
+        for table, count in summary["deleted"].items():
+            self.deleted[table] += count
+        self.vacuumed_pages += summary["vacuumed_pages"]
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        summary["interrupted"] = interrupted
+        self.last_pass = summary
+        if any(summary["deleted"].values()) or summary["vacuumed_pages"]:
+            logger.info("🧹 Filas caducadas: %s, páginas devueltas: %s (%s s)",
+                        summary['deleted'], summary['vacuumed_pages'], summary['seconds'], extra={"retention": summary})
+        return summary
+
+    def _pause(self):
+        if self.pause_seconds > 0:
+            time.sleep(self.pause_seconds)
+
+    def _expired_batches(self, shard, policy: RetentionPolicy):
+        """Ids caducados en lotes de ``batch_size``: primero por antigüedad, después por usuario."""
+        table, column = policy.table, RETENTION_TABLES[policy.table]
+
+        if policy.max_age_days > 0:
+            age = f"-{policy.max_age_days} days"
+            # Los borrados de cada lote mueven el recorrido: se parte del último id visto
+            last = ("", 0)
+            while True:
+                with shard.db.read() as conn:
+                    rows = conn.execute(f"""
+                        SELECT {column}, id FROM {table}
+                        WHERE {column} < datetime('now', ?) AND ({column}, id) > (?, ?)
+                        ORDER BY {column}, id
+                        LIMIT ?
+                    """, (age, *last, self.batch_size)).fetchall()
+                if not rows:
+                    break
+                yield [row_id for _, row_id in rows]
+                last = rows[-1]
+
+        if policy.max_rows_per_user > 0:
+            # Recorrido del índice (user_id, fecha) sin tocar la tabla
+            with shard.db.read() as conn:
+                over_limit = conn.execute(f"""
+                    SELECT user_id, COUNT(*) - ? FROM {table}
+                    GROUP BY user_id
+                    HAVING COUNT(*) > ?
+                """, (policy.max_rows_per_user, policy.max_rows_per_user)).fetchall()
+            for user_id, excess in over_limit:
+                # Las filas más antiguas del usuario, en lotes
+                while excess > 0:
+                    with shard.db.read() as conn:
+                        ids = [row[0] for row in conn.execute(f"""
+                            SELECT id FROM {table}
+                            WHERE user_id = ?
+                            ORDER BY {column}, id
+                            LIMIT ?
+                        """, (user_id, min(excess, self.batch_size)))]
+                    if not ids:
+                        break
+                    yield ids
+                    excess -= len(ids)
+
+    def _expire(self, shard, table: str, ids):
+        """Archivar (si procede) y borrar un lote de filas en una transacción corta."""
+        placeholders = ", ".join("?" for _ in ids)
+        with shard.db.read() as conn:
+            rows = conn.execute(f"""
+                SELECT {_select_list(table)} FROM {table} WHERE id IN ({placeholders})
+            """, ids).fetchall()
+        if not rows:
+            return
+
+        # Las filas no cambian una vez escritas: se archivan fuera del bloqueo de escritura
+        if self.archive == "gzip":
+            self._write_archive(shard, table, rows)
+
+        user_column = EXPORT_FIELDS[table].index("user_id")
+        user_ids = {row[user_column] for row in rows}
+        with shard.db.write() as conn:
+            conn.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+            if table == "semantic_context":
+                # Los vectores de las filas borradas no deben seguir en el índice
+                shard._forget_vector_index(user_ids)
+        if self.archive == "gzip":
+            self.archived += len(rows)
+        if self.on_expire is not None:
+            self.on_expire(table, user_ids)
+
+    def _write_archive(self, shard, table: str, rows):
+        """Añadir las filas al fichero frío del día y sincronizarlo con el disco."""
+        path = self.archive_path(shard, table)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lines = []
+        if not os.path.exists(path):
+            header = {
+                "format": FORMAT,
+                "version": FORMAT_VERSION,
+                "schema_version": shard.schema_version,
+                "archived_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+            lines.append(json.dumps(header, ensure_ascii=False))
+        fields = EXPORT_FIELDS[table]
+        for row in rows:
+            record = {"table": table}
+            record.update(zip(fields, row))
+            lines.append(json.dumps(record, ensure_ascii=False))
+
+        # Cada lote es un miembro gzip independiente: gzip los lee como un solo flujo
+        with open(path, "ab") as f:
+            f.write(gzip.compress(("\n".join(lines) + "\n").encode("utf-8")))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _reclaim(self, shard, stop_event: threading.Event = None) -> int:
+        """Devolver las páginas libres al sistema en pasos de ``vacuum_pages``."""
+        if shard.db.auto_vacuum != "INCREMENTAL" or self.vacuum_pages <= 0:
+            return 0
+        reclaimed = 0
+        free = shard.db.free_pages()
+        while free > 0:
+            if stop_event is not None and stop_event.is_set():
+                break
+            shard.db.incremental_vacuum(self.vacuum_pages)
+            remaining = shard.db.free_pages()
+            if remaining >= free:
+                break
+            reclaimed += free - remaining
+            free = remaining
+            self._pause()
+        if reclaimed:
+            # El fichero se acorta al copiar el WAL; PASSIVE no espera a nadie
+            shard.db.checkpoint("PASSIVE")
+        return reclaimed
+
+    def get_stats(self):
+        """Métricas acumuladas para /health."""
+        return {
+            "policies": [
+                {"table": p.table, "max_age_days": p.max_age_days, "max_rows_per_user": p.max_rows_per_user}
+                for p in self.policies
+            ],
+            "archive": self.archive,
+            "passes": self.passes,
+            "deleted": dict(self.deleted),
+            "archived": self.archived,
+            "vacuumed_pages": self.vacuumed_pages,
+            "last_pass": self.last_pass,
+        }
+
+
+class RetentionWorker:
+    """Ejecuta ``RetentionManager.run_pass`` periódicamente en un hilo, sin bloquear el event loop."""
+
+    def __init__(self, manager: RetentionManager, interval_seconds: float = 600):
+        self.manager = manager
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._task = None
+        self._current_pass = None
+        self.failed_passes = 0
+
+    def start(self):
+        """Crear la tarea periódica en el event loop actual."""
+        if self._task is None or self._task.done():
+            self._stop.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._stop.is_set():
+            self._current_pass = asyncio.ensure_future(asyncio.to_thread(self.manager.run_pass, self._stop))
+            try:
+                await self._current_pass
+            except Exception as e:
+                self.failed_passes += 1
+                logger.warning("⚠️  Error en la pasada de retención: %s", e)
+            finally:
+                self._current_pass = None
+            await asyncio.sleep(self.interval_seconds)
+
+    async def close(self):
+        """Detener la tarea: la pasada en curso termina tras su paso actual."""
+        self._stop.set()
+        if self._current_pass is not None:
+            # El hilo sigue usando la base de datos hasta acabar el paso: esperarlo
+            await asyncio.gather(self._current_pass, return_exceptions=True)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self):
+        return {"interval_seconds": self.interval_seconds, "failed_passes": self.failed_passes,
+                **self.manager.get_stats()}
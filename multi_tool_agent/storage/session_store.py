@@ -0,0 +1,354 @@
+"""
+SessionService de ADK con memoria acotada y volcado a disco.
+
+``InMemorySessionService`` guarda todas las sesiones (con todos sus eventos)
+hasta que el proceso muere, y las pierde al reiniciar. ``BoundedSessionService``
+mantiene en memoria sólo las sesiones calientes, con un límite de número y de
+tamaño aproximado y expulsión LRU: las sesiones expulsadas se guardan en un
+fichero SQLite (JSON comprimido con zlib) y se recargan al volver a usarlas.
+
+Las lecturas y escrituras en disco se hacen en un hilo dedicado para no
+detener el event loop; al ser un único hilo, una sesión que se expulsa queda
+escrita antes de que cualquier recarga posterior la lea. ``flush()`` escribe
+las sesiones modificadas sin expulsarlas (al apagar el agente), de modo que
+sobreviven a un reinicio.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from google.adk.sessions import InMemorySessionService, Session
+from google.adk.sessions.base_session_service import ListSessionsResponse
+from google.adk.sessions.state import State
+
+from .sqlite_pool import SQLiteConnectionManager
+
+logger = logging.getLogger(__name__)
+
+# Al superar un límite se expulsa hasta esta fracción de él
+EVICTION_LOW_WATER = 0.9
+# Sesiones por transacción en flush(): entre lotes el event loop atiende otras peticiones
+FLUSH_CHUNK = 500
+
+
+class BoundedSessionService(InMemorySessionService):
+    """InMemorySessionService con límite LRU de sesiones en memoria y volcado a SQLite.
+
+    El tamaño de cada sesión se estima por su serialización JSON (la huella
+    real en memoria de los objetos de Python es varias veces mayor); sirve
+    para acotar, no para medir. El estado de usuario y de aplicación (claves
+    ``user:`` y ``app:``) es pequeño y se mantiene siempre en memoria, pero
+    también se guarda en disco.
+    """
+
+    def __init__(self, db_path: str = "adk_agent_sessions.db", max_sessions: int = 1000,
+                 max_memory_mb: float = 64):
+        super().__init__()
+        self.db_path = db_path
+        self.max_sessions = max(1, max_sessions)
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        # (app_name, user_id, session_id) -> tamaño estimado en bytes, de menos a más reciente
+        self._lru = OrderedDict()
+        self._bytes = 0
+        # Sesiones con cambios que aún no están en disco
+        self._dirty = set()
+        # (app_name, user_id) con estado de usuario pendiente de guardar ("" = estado de la app)
+        self._dirty_scoped = set()
+        self.evictions = 0
+        self.spilled = 0
+        self.reloads = 0
+
+        # Una sesión cabe en una fila: no hace falta sincronizar cada escritura
+        self.db = SQLiteConnectionManager(db_path, readers=1, synchronous="NORMAL",
+                                          cache_size_kb=4096, mmap_size_mb=0)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="adk-sessions")
+        with self.db.write() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS adk_sessions (
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    last_update_time REAL NOT NULL,
+                    state TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (app_name, user_id, session_id)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS adk_scoped_state (
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    PRIMARY KEY (app_name, user_id)
+                ) WITHOUT ROWID
+            """)
+        self._load_scoped_state()
+
+    @classmethod
+    def from_env(cls, default_db_path: str = "adk_agent_sessions.db"):
+        """Crear el servicio con ADK_SESSION_DB, ADK_SESSION_MAX_SESSIONS y ADK_SESSION_MAX_MB."""
+        return cls(
+            db_path=os.getenv("ADK_SESSION_DB", default_db_path),
+            max_sessions=int(os.getenv("ADK_SESSION_MAX_SESSIONS", "1000")),
+            max_memory_mb=float(os.getenv("ADK_SESSION_MAX_MB", "64")),
+        )
+
+    # ------------------------------------------------------------------
+    # API de BaseSessionService
+    # ------------------------------------------------------------------
+
+    async def create_session(self, *, app_name, user_id, state=None, session_id=None):
+        session_id = session_id.strip() if session_id else None
+        if session_id:
+            # Una sesión volcada a disco también "existe": AlreadyExistsError como en memoria
+            await self._ensure_loaded((app_name, user_id, session_id))
+        session = self._create_session_impl(app_name=app_name, user_id=user_id, state=state,
+                                            session_id=session_id)
+        key = (app_name, user_id, session.id)
+        self._touch(key, len(session.model_dump_json()))
+        self._dirty.add(key)
+        if state and any(k.startswith((State.APP_PREFIX, State.USER_PREFIX)) for k in state):
+            self._mark_scoped_dirty(app_name, user_id)
+        await self._enforce_limits()
+        return session
+
+    async def get_session(self, *, app_name, user_id, session_id, config=None):
+        session_id = session_id.strip() if session_id else session_id
+        key = (app_name, user_id, session_id)
+        await self._ensure_loaded(key)
+        session = self._get_session_impl(app_name=app_name, user_id=user_id, session_id=session_id,
+                                         config=config)
+        if session is not None:
+            self._lru.move_to_end(key)
+            await self._enforce_limits()
+        return session
+
+    async def list_sessions(self, *, app_name, user_id=None):
+        response = self._list_sessions_impl(app_name=app_name, user_id=user_id)
+        in_memory = {(s.user_id, s.id) for s in response.sessions}
+        rows = await self._run(self._read_session_summaries, app_name, user_id)
+        for row_user_id, row_session_id, last_update_time, state in rows:
+            if (row_user_id, row_session_id) in in_memory:
+                continue
+            session = Session(app_name=app_name, user_id=row_user_id, id=row_session_id,
+                              state=json.loads(state), last_update_time=last_update_time)
+            response.sessions.append(self._merge_state(app_name, row_user_id, session))
+        response.sessions.sort(key=lambda s: (s.last_update_time, s.user_id, s.id))
+        return ListSessionsResponse(sessions=response.sessions)
+
+    async def delete_session(self, *, app_name, user_id, session_id):
+        session_id = session_id.strip() if session_id else session_id
+        key = (app_name, user_id, session_id)
+        if key in self._lru:
+            self._drop_from_memory(key)
+        self._dirty.discard(key)
+        await self._run(self._delete_rows, [key])
+
+    async def append_event(self, session, event):
+        if event.partial:
+            return event
+        key = (session.app_name, session.user_id, session.id)
+        # La sesión pudo expulsarse mientras el modelo respondía
+        await self._ensure_loaded(key)
+        event = await super().append_event(session=session, event=event)
+        if key in self._lru:
+            self._touch(key, self._lru[key] + len(event.model_dump_json(exclude_none=True)))
+            self._dirty.add(key)
+        if event.actions and event.actions.state_delta and any(
+            k.startswith((State.APP_PREFIX, State.USER_PREFIX)) for k in event.actions.state_delta
+        ):
+            self._mark_scoped_dirty(session.app_name, session.user_id)
+        await self._enforce_limits()
+        return event
+
+    async def get_events_since(self, *, app_name, user_id, session_id, start: int = 0):
+        """Eventos de la sesión desde la posición ``start``, sin copiar la sesión entera.
+
+        Los eventos de una sesión sólo se añaden al final: con la posición del
+        último evento procesado basta para obtener los nuevos. Devuelve None si
+        la sesión no existe. Los eventos son los objetos guardados: no deben
+        modificarse.
+        """
+        key = (app_name, user_id, session_id)
+        await self._ensure_loaded(key)
+        session = self.sessions.get(app_name, {}).get(user_id, {}).get(session_id)
+        if session is None:
+            return None
+        events = session.events[start:]
+        await self._enforce_limits()
+        return events
+
+    async def flush(self):
+        """Escribir en disco las sesiones y el estado modificados (sin expulsarlos de memoria)."""
+        keys = [key for key in self._dirty if key in self._lru]
+        self._dirty.clear()
+        scoped = self._take_scoped_rows()
+        for start in range(0, len(keys), FLUSH_CHUNK):
+            # Una sesión expulsada mientras se escribía el lote anterior ya está en disco
+            sessions = [self._capture(key) for key in keys[start:start + FLUSH_CHUNK] if key in self._lru]
+            await self._run(self._write_rows, sessions, scoped)
+            self.spilled += len(sessions)
+            scoped = []
+        if scoped:
+            await self._run(self._write_rows, [], scoped)
+
+    async def close(self):
+        """Guardar lo pendiente y cerrar el fichero."""
+        await self.flush()
+        await asyncio.to_thread(self._executor.shutdown, True)
+        self.db.close()
+
+    def get_stats(self):
+        return {
+            "db_path": self.db_path,
+            "sessions_in_memory": len(self._lru),
+            "max_sessions": self.max_sessions,
+            "estimated_mb": round(self._bytes / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "dirty": len(self._dirty),
+            "evictions": self.evictions,
+            "spilled": self.spilled,
+            "reloads": self.reloads,
+        }
+
+    # ------------------------------------------------------------------
+    # Memoria: LRU y expulsión
+    # ------------------------------------------------------------------
+
+    def _touch(self, key, size: int):
+        self._bytes += size - self._lru.get(key, 0)
+        self._lru[key] = size
+        self._lru.move_to_end(key)
+
+    def _drop_from_memory(self, key):
+        app_name, user_id, session_id = key
+        self._bytes -= self._lru.pop(key)
+        user_sessions = self.sessions[app_name][user_id]
+        user_sessions.pop(session_id, None)
+        # Sin diccionarios vacíos por cada usuario que pasó por el servidor
+        if not user_sessions:
+            del self.sessions[app_name][user_id]
+
+    async def _enforce_limits(self):
+        """Expulsar las sesiones menos usadas por encima de los límites (la más reciente nunca).
+
+        Se baja hasta el 90% de cada límite para escribir las expulsiones en
+        lotes (una transacción cada varias sesiones nuevas, no una por sesión).
+        """
+        if len(self._lru) <= self.max_sessions and self._bytes <= self.max_bytes:
+            return
+        max_sessions = int(self.max_sessions * EVICTION_LOW_WATER)
+        max_bytes = int(self.max_bytes * EVICTION_LOW_WATER)
+        sessions = []
+        while len(self._lru) > 1 and (len(self._lru) > max_sessions or self._bytes > max_bytes):
+            key = next(iter(self._lru))
+            if key in self._dirty:
+                sessions.append(self._capture(key))
+                self._dirty.discard(key)
+            self._drop_from_memory(key)
+            self.evictions += 1
+        if sessions:
+            await self._run(self._write_rows, sessions, self._take_scoped_rows())
+            self.spilled += len(sessions)
+
+    async def _ensure_loaded(self, key):
+        """Recargar desde disco una sesión que no está en memoria (si existe)."""
+        if key in self._lru:
+            return
+        row = await self._run(self._read_session, key)
+        # Otra corrutina pudo cargarla mientras se leía
+        if row is None or key in self._lru:
+            return
+        data = zlib.decompress(row)
+        session = Session.model_validate_json(data)
+        app_name, user_id, session_id = key
+        self.sessions.setdefault(app_name, {}).setdefault(user_id, {})[session_id] = session
+        self._touch(key, len(data))
+        self.reloads += 1
+
+    def _capture(self, key):
+        """Copia ligera de la sesión para serializarla fuera del event loop.
+
+        Los eventos no cambian una vez añadidos: basta con copiar las listas
+        y el estado para que los turnos siguientes no afecten a la copia.
+        """
+        app_name, user_id, session_id = key
+        session = self.sessions[app_name][user_id][session_id]
+        return session.model_copy(update={"events": list(session.events), "state": dict(session.state)})
+
+    @staticmethod
+    def _serialize(session):
+        # Sin los campos con su valor por defecto: unas 6 veces menos JSON por evento
+        data = zlib.compress(session.model_dump_json(exclude_defaults=True).encode("utf-8"), 1)
+        state = json.dumps(session.state, ensure_ascii=False, default=str)
+        return (session.app_name, session.user_id, session.id, session.last_update_time, state, data)
+
+    def _mark_scoped_dirty(self, app_name: str, user_id: str):
+        self._dirty_scoped.add((app_name, ""))
+        self._dirty_scoped.add((app_name, user_id))
+
+    def _take_scoped_rows(self):
+        rows = []
+        for app_name, user_id in self._dirty_scoped:
+            if user_id:
+                state = self.user_state.get(app_name, {}).get(user_id, {})
+            else:
+                state = self.app_state.get(app_name, {})
+            rows.append((app_name, user_id, json.dumps(state, ensure_ascii=False, default=str)))
+        self._dirty_scoped.clear()
+        return rows
+
+    def _load_scoped_state(self):
+        with self.db.read() as conn:
+            for app_name, user_id, state in conn.execute("SELECT app_name, user_id, state FROM adk_scoped_state"):
+                if user_id:
+                    self.user_state.setdefault(app_name, {})[user_id] = json.loads(state)
+                else:
+                    self.app_state[app_name] = json.loads(state)
+
+    # ------------------------------------------------------------------
+    # Disco (en el hilo dedicado)
+    # ------------------------------------------------------------------
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+    def _write_rows(self, sessions, scoped_rows):
+        rows = [self._serialize(session) for session in sessions]
+        with self.db.write() as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO adk_sessions
+                (app_name, user_id, session_id, last_update_time, state, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            conn.executemany("INSERT OR REPLACE INTO adk_scoped_state (app_name, user_id, state) VALUES (?, ?, ?)",
+                             scoped_rows)
+
+    def _read_session(self, key):
+        with self.db.read() as conn:
+            row = conn.execute("""
+                SELECT data FROM adk_sessions WHERE app_name = ? AND user_id = ? AND session_id = ?
+            """, key).fetchone()
+        return row[0] if row else None
+
+    def _read_session_summaries(self, app_name, user_id):
+        with self.db.read() as conn:
+            if user_id is None:
+                return conn.execute("""
+                    SELECT user_id, session_id, last_update_time, state FROM adk_sessions WHERE app_name = ?
+                """, (app_name,)).fetchall()
+            return conn.execute("""
+                SELECT user_id, session_id, last_update_time, state FROM adk_sessions
+                WHERE app_name = ? AND user_id = ?
+            """, (app_name, user_id)).fetchall()
+
+    def _delete_rows(self, keys):
+        with self.db.write() as conn:
+            conn.executemany("DELETE FROM adk_sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", keys)
@@ -0,0 +1,194 @@
+"""
+Reparto de la memoria SQLite en varios ficheros (shards) por usuario.
+
+SQLite admite un único escritor por fichero: con una sola base de datos todas
+las escrituras de todos los usuarios se serializan. Con ``SQLITE_SHARDS=N``
+cada ``user_id`` se asigna a uno de N ficheros mediante un hash estable
+(blake2b, igual en todos los procesos y ejecuciones), y cada shard tiene su
+propio escritor, lectores, FTS5 e índice vectorial. Todas las filas de un
+usuario viven en su shard, así que las consultas por usuario tocan un solo
+fichero; las consultas de administración se reparten entre todos.
+
+Los ficheros incluyen el número de shards en el nombre
+(``database_agent_sessions.shard0of4.db``): cambiar N no mezcla repartos
+distintos. Para pasar de un reparto a otro se usa ``reshard`` (o el script
+``reshard_memory.py``).
+"""
+
+import hashlib
+import logging
+import os
+
+from .sqlite_store import DatabaseMemorySystem
+
+logger = logging.getLogger(__name__)
+
+# Tablas con datos por usuario que se copian al cambiar el reparto
+SHARDED_TABLES = ("sessions", "user_memories", "user_memory_history", "conversation_log", "semantic_context")
+
+
+def shard_index(user_id: str, shard_count: int) -> int:
+    """Shard de un usuario (estable entre procesos, a diferencia de hash())."""
+    if shard_count <= 1:
+        return 0
+    digest = hashlib.blake2b(user_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+def shard_paths(db_path: str, shard_count: int):
+    """Ficheros de un reparto; con un solo shard es la base de datos original."""
+    if shard_count <= 1:
+        return [db_path]
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}.shard{i}of{shard_count}{ext or '.db'}" for i in range(shard_count)]
+
+
+class ShardedMemorySystem:
+    """Misma interfaz que DatabaseMemorySystem repartida en N ficheros SQLite."""
+
+    def __init__(self, db_path: str = "database_agent_sessions.db", shard_count: int = 2,
+                 max_memories_per_user: int = None, memory_history_versions: int = None):
+        if shard_count < 2:
+            raise ValueError("ShardedMemorySystem necesita al menos 2 shards")
+        self.db_path = db_path
+        self.shard_count = shard_count
+        paths = shard_paths(db_path, shard_count)
+
+        if os.path.exists(db_path) and not any(os.path.exists(path) for path in paths):
+            logger.warning("⚠️  %s existe pero no hay shards: sus datos no se verán. "
+                           "Migrarlos con: python reshard_memory.py --db %s --to %s", db_path, db_path, shard_count)
+
+        self.shards = [
+            DatabaseMemorySystem(path, max_memories_per_user, memory_history_versions)
+            for path in paths
+        ]
+        logger.info("✅ Memoria repartida en %s shards", shard_count)
+
+    @property
+    def max_connections(self):
+        return sum(shard.max_connections for shard in self.shards)
+
+    def shard_index(self, user_id: str) -> int:
+        return shard_index(user_id, self.shard_count)
+
+    def shard_for(self, user_id: str) -> DatabaseMemorySystem:
+        return self.shards[self.shard_index(user_id)]
+
+    def group_by_shard(self, records):
+        """Agrupar TurnRecord por shard, conservando el orden dentro de cada grupo."""
+        groups = {}
+        for record in records:
+            groups.setdefault(self.shard_index(record.user_id), []).append(record)
+        return [(self.shards[index], group) for index, group in groups.items()]
+
+    def save_memory(self, user_id: str, session_id: str, key: str, value: str):
+        self.shard_for(user_id).save_memory(user_id, session_id, key, value)
+
+    def get_memories(self, user_id: str):
+        return self.shard_for(user_id).get_memories(user_id)
+
+    def get_memory_history(self, user_id: str, key: str):
+        return self.shard_for(user_id).get_memory_history(user_id, key)
+
+    def log_conversation(self, user_id: str, session_id: str, role: str, content: str):
+        self.shard_for(user_id).log_conversation(user_id, session_id, role, content)
+
+    def get_or_create_session(self, user_id: str, session_id: str = None):
+        return self.shard_for(user_id).get_or_create_session(user_id, session_id)
+
+    def get_conversation_history(self, user_id: str, limit: int = 10):
+        return self.shard_for(user_id).get_conversation_history(user_id, limit)
+
+    def save_semantic_context(self, user_id: str, session_id: str, context_type: str,
+                              content: str, relevance_score: float = 1.0):
+        self.shard_for(user_id).save_semantic_context(user_id, session_id, context_type, content, relevance_score)
+
+    def save_turns(self, records):
+        """Confirmar turnos: una transacción por shard (atómico dentro de cada shard)."""
+        for shard, group in self.group_by_shard(records):
+            shard.save_turns(group)
+
+    def search_semantic_context(self, user_id: str, query: str, limit: int = 5):
+        return self.shard_for(user_id).search_semantic_context(user_id, query, limit)
+
+    def get_debug_info(self, user_id: str):
+        info = self.shard_for(user_id).get_debug_info(user_id)
+        info["shard"] = self.shard_index(user_id)
+        return info
+
+    def get_info(self):
+        info = self.shards[0].get_info()
+        info.update({
+            "database_path": self.db_path,
+            "shard_count": self.shard_count,
+            "db_file_size": sum(shard.get_info()["db_file_size"] for shard in self.shards),
+        })
+        return info
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+
+
+def reshard(db_path: str, source_shards: int, target_shards: int, batch_size: int = 5000):
+    """Copiar todos los datos de un reparto a otro; devuelve las filas copiadas por tabla.
+
+    Los ficheros de destino no deben existir. Los ficheros de origen no se
+    modifican (salvo para aplicarles migraciones pendientes) y se pueden
+    borrar al terminar. Los ids cambian al juntar filas de varios shards; los
+    embeddings se copian y el índice vectorial se regenera al primer uso.
+    Debe ejecutarse con el servidor parado.
+    """
+    if source_shards == target_shards:
+        raise ValueError("El reparto de origen y el de destino son el mismo")
+    targets = shard_paths(db_path, target_shards)
+    existing = [path for path in targets if os.path.exists(path)]
+    if existing:
+        raise FileExistsError(f"Los ficheros de destino ya existen: {existing}")
+    sources = shard_paths(db_path, source_shards)
+    missing = [path for path in sources if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Faltan ficheros de origen: {missing}")
+
+    source_systems = [DatabaseMemorySystem(path) for path in sources]
+    target_systems = [DatabaseMemorySystem(path) for path in targets]
+    copied = dict.fromkeys(SHARDED_TABLES, 0)
+    try:
+        for source in source_systems:
+            for table in SHARDED_TABLES:
+                copied[table] += _copy_table(source, target_systems, table, batch_size)
+    finally:
+        for system in source_systems + target_systems:
+            system.close()
+
+    logger.info("✅ %s -> %s shards: %s", len(sources), len(targets),
+                ", ".join(f"{table}={count}" for table, count in copied.items()))
+    return copied
+
+
+def _copy_table(source: DatabaseMemorySystem, targets, table: str, batch_size: int) -> int:
+    """Copiar una tabla de un shard de origen a los shards de destino por lotes."""
+    with source.db.read() as conn:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})") if row[1] != "id"]
+        # sessions usa el id de sesión como clave: se copia tal cual
+        if table == "sessions":
+            columns.insert(0, "id")
+        user_column = columns.index("user_id")
+        column_list = ", ".join(columns)
+        placeholders = ", ".join("?" for _ in columns)
+        insert = f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})"
+
+        copied = 0
+        cursor = conn.execute(f"SELECT {column_list} FROM {table} ORDER BY rowid")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            by_shard = {}
+            for row in rows:
+                by_shard.setdefault(shard_index(row[user_column], len(targets)), []).append(row)
+            for index, shard_rows in by_shard.items():
+                with targets[index].db.write() as target_conn:
+                    target_conn.executemany(insert, shard_rows)
+            copied += len(rows)
+    return copied
@@ -0,0 +1,202 @@
+"""
+Gestor de conexiones SQLite de larga duración.
+
+Mantiene una única conexión escritora y un pool de conexiones lectoras sobre la
+misma base de datos en modo WAL, de forma que las lecturas no bloquean a la
+escritura y ninguna operación paga el coste de abrir una conexión nueva.
+"""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+# Valores de PRAGMA auto_vacuum en el orden de su código numérico
+AUTO_VACUUM_MODES = ("NONE", "FULL", "INCREMENTAL")
+
+
+class SQLiteConnectionManager:
+    """Un escritor serializado más un pool de lectores con pragmas ajustados."""
+
+    def __init__(self, db_path: str, readers: int = 4, synchronous: str = "NORMAL",
+                 cache_size_kb: int = 16384, mmap_size_mb: int = 128,
+                 busy_timeout_ms: int = 5000, auto_vacuum: str = "INCREMENTAL"):
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Modo synchronous '{synchronous}' no válido. Opciones: {SYNCHRONOUS_MODES}")
+        auto_vacuum = auto_vacuum.upper()
+        if auto_vacuum not in AUTO_VACUUM_MODES:
+            raise ValueError(f"Modo auto_vacuum '{auto_vacuum}' no válido. Opciones: {AUTO_VACUUM_MODES}")
+
+        self.db_path = db_path
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size_mb = mmap_size_mb
+        self.busy_timeout_ms = busy_timeout_ms
+        self.requested_auto_vacuum = auto_vacuum
+
+        # Una base de datos en memoria no se comparte entre conexiones:
+        # en ese caso todas las lecturas usan la conexión escritora
+        self.in_memory = db_path == ":memory:" or db_path.startswith("file::memory:")
+        self.max_readers = 0 if self.in_memory else max(0, readers)
+
+        self._writer_lock = threading.RLock()
+        self._writer = self._connect()
+        self.journal_mode = self._writer.execute("PRAGMA journal_mode").fetchone()[0]
+        # Modo efectivo: en una base de datos con tablas sólo cambia con VACUUM
+        self.auto_vacuum = AUTO_VACUUM_MODES[self._writer.execute("PRAGMA auto_vacuum").fetchone()[0]]
+
+        self._readers = queue.LifoQueue()
+        self._readers_lock = threading.Lock()
+        self._created_readers = 0
+        self._all_readers = []
+        self._closed = False
+
+    def _connect(self, read_only: bool = False):
+        """Abrir una conexión y aplicar los pragmas de rendimiento."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,  # Las transacciones se controlan explícitamente
+            check_same_thread=False,
+        )
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        if not read_only:
+            # Sólo surte efecto al crear la base de datos (antes de la primera tabla)
+            conn.execute(f"PRAGMA auto_vacuum = {self.requested_auto_vacuum}")
+        if not self.in_memory and not read_only:
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        # cache_size negativo se interpreta en KiB
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size_mb) * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def write(self):
+        """Transacción de escritura sobre la conexión escritora.
+
+        Las llamadas anidadas en el mismo hilo se unen a la transacción en curso,
+        lo que permite agrupar varias operaciones en un único commit.
+        """
+        with self._writer_lock:
+            self._ensure_open()
+            conn = self._writer
+            if conn.in_transaction:
+                yield conn
+                return
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+
+    @contextmanager
+    def read(self):
+        """Conexión de lectura tomada del pool (o la escritora si no hay pool)."""
+        if self.max_readers == 0:
+            with self._writer_lock:
+                self._ensure_open()
+                yield self._writer
+            return
+
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def _acquire_reader(self):
+        """Reutilizar un lector libre, crear uno nuevo o esperar a que se libere."""
+        self._ensure_open()
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._readers_lock:
+            if self._created_readers < self.max_readers:
+                conn = self._connect(read_only=True)
+                self._created_readers += 1
+                self._all_readers.append(conn)
+                return conn
+
+        return self._readers.get(timeout=self.busy_timeout_ms / 1000)
+
+    def free_pages(self) -> int:
+        """Páginas libres del fichero (reutilizables o recuperables con incremental_vacuum)."""
+        with self.read() as conn:
+            return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def incremental_vacuum(self, pages: int):
+        """Devolver al sistema hasta ``pages`` páginas libres en una transacción corta.
+
+        Requiere auto_vacuum=INCREMENTAL. Se ejecuta fuera de ``write()``:
+        executescript confirma su propia transacción y recorre el pragma
+        completo (``execute`` sólo liberaría una página).
+        """
+        with self._writer_lock:
+            self._ensure_open()
+            if self._writer.in_transaction:
+                raise sqlite3.ProgrammingError("incremental_vacuum no puede ejecutarse dentro de una transacción")
+            self._writer.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+
+    def vacuum(self, auto_vacuum: str = None):
+        """Reescribir el fichero completo (opcionalmente cambiando auto_vacuum).
+
+        Bloquea las escrituras mientras dura: sólo para mantenimiento con el servidor parado.
+        """
+        with self._writer_lock:
+            self._ensure_open()
+            if auto_vacuum is not None:
+                auto_vacuum = auto_vacuum.upper()
+                if auto_vacuum not in AUTO_VACUUM_MODES:
+                    raise ValueError(f"Modo auto_vacuum '{auto_vacuum}' no válido. Opciones: {AUTO_VACUUM_MODES}")
+                self._writer.execute(f"PRAGMA auto_vacuum = {auto_vacuum}")
+            self._writer.execute("VACUUM")
+            self.auto_vacuum = AUTO_VACUUM_MODES[self._writer.execute("PRAGMA auto_vacuum").fetchone()[0]]
+
+    def checkpoint(self, mode: str = "PASSIVE"):
+        """Checkpoint del WAL; PASSIVE no espera a lectores ni escritores."""
+        if self.in_memory:
+            return None
+        with self._writer_lock:
+            self._ensure_open()
+            return self._writer.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+
+    def _ensure_open(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError(f"El gestor de conexiones de {self.db_path} está cerrado")
+
+    def get_info(self):
+        """Información de configuración y uso del pool."""
+        return {
+            "db_path": self.db_path,
+            "journal_mode": self.journal_mode,
+            "synchronous": self.synchronous,
+            "cache_size_kb": self.cache_size_kb,
+            "mmap_size_mb": self.mmap_size_mb,
+            "auto_vacuum": self.auto_vacuum,
+            "max_readers": self.max_readers,
+            "open_readers": self._created_readers,
+        }
+
+    def close(self):
+        """Cerrar la conexión escritora y todos los lectores."""
+        if self._closed:
+            return
+        with self._writer_lock:
+            self._closed = True
+            with self._readers_lock:
+                for conn in self._all_readers:
+                    conn.close()
+                self._all_readers.clear()
+            self._writer.close()
@@ -0,0 +1,564 @@
+"""
+Almacén de memoria sobre SQLite.
+
+``DatabaseMemorySystem`` es la implementación síncrona (pool de conexiones en
+WAL, FTS5 e índice vectorial local). ``SQLiteMemoryStore`` la expone como
+``MemoryStore`` asíncrono ejecutando cada operación en un pool de hilos
+dedicado: sqlite3 es bloqueante y una consulta hecha directamente en una
+corrutina detendría el event loop y, con él, todas las peticiones del servidor.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import text_search
+from .embeddings import load_embedder, to_blob
+from .memory_store import MemoryStore, memory_limits
+from .migrations import apply_migrations, get_schema_version, has_table
+from .sqlite_pool import SQLiteConnectionManager
+from .vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseMemorySystem:
+    """Sistema de memoria persistente completo usando SQLite."""
+    
+    # Un único fichero (ver ShardedMemorySystem para repartir usuarios en varios)
+    shard_count = 1
+    
+    def __init__(self, db_path: str = "database_agent_sessions.db", max_memories_per_user: int = None,
+                 memory_history_versions: int = None):
+        self.db_path = db_path
+        # Conexiones de larga duración: un escritor + pool de lectores en modo WAL
+        self.db = SQLiteConnectionManager(
+            db_path,
+            readers=int(os.getenv("SQLITE_READER_POOL_SIZE", "4")),
+            synchronous=os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+            cache_size_kb=int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384")),
+            mmap_size_mb=int(os.getenv("SQLITE_MMAP_SIZE_MB", "128")),
+            auto_vacuum=os.getenv("SQLITE_AUTO_VACUUM", "INCREMENTAL"),
+        )
+        # Límites de crecimiento de la memoria personal
+        self.max_memories_per_user, self.memory_history_versions = memory_limits(
+            max_memories_per_user, memory_history_versions
+        )
+        self._init_db()
+        self._setup_vector_search()
+        logger.info("✅ Base de datos inicializada: %s (esquema v%s, journal_mode=%s)",
+                    db_path, self.schema_version, self.db.journal_mode)
+        if self.db.auto_vacuum != self.db.requested_auto_vacuum and not self.db.in_memory:
+            # Bases de datos anteriores: el modo sólo cambia reescribiendo el fichero
+            logger.warning("⚠️  %s usa auto_vacuum=%s; para recuperar espacio en segundo plano: "
+                           "python maintain_memory.py --enable-incremental-vacuum", db_path, self.db.auto_vacuum)
+    
+    @property
+    def shards(self):
+        return [self]
+    
+    @property
+    def max_connections(self):
+        """Conexiones disponibles (lectores + escritor), para dimensionar el executor."""
+        return self.db.max_readers + 1
+    
+    def shard_index(self, user_id: str) -> int:
+        return 0
+    
+    def _init_db(self):
+        """Inicializar o actualizar el esquema aplicando las migraciones pendientes."""
+        apply_migrations(self.db)
+        with self.db.read() as conn:
+            self.schema_version = get_schema_version(conn)
+            self.fts_enabled = has_table(conn, "semantic_context_fts")
+    
+    def _setup_vector_search(self):
+        """Configurar el embedder y el índice vectorial local del contexto semántico."""
+        # fts: búsqueda por palabras clave (BM25); vector: similitud coseno de embeddings
+        self.semantic_search_mode = os.getenv("SEMANTIC_SEARCH_MODE", "fts").lower()
+        self.min_similarity = float(os.getenv("SEMANTIC_MIN_SIMILARITY", "0.15"))
+        self.embedder = load_embedder(
+            os.getenv("SEMANTIC_EMBEDDER", "hashing"),
+            dim=int(os.getenv("SEMANTIC_EMBEDDING_DIM", "256")),
+        )
+        
+        index_dir = os.getenv("SEMANTIC_INDEX_DIR")
+        if not index_dir and not self.db.in_memory:
+            index_dir = f"{os.path.splitext(self.db_path)[0]}_vectors"
+        # Un subdirectorio por embedder: cambiar de modelo no mezcla vectores
+        if index_dir:
+            index_dir = os.path.join(index_dir, self.embedder.name)
+        self.vector_index = VectorIndex(index_dir, self.embedder.dim)
+        # Usuarios cuyo índice ya se ha contrastado con la base de datos en este proceso
+        self._vector_ready = set()
+        self._vector_ready_lock = threading.Lock()
+    
+    def save_memory(self, user_id: str, session_id: str, key: str, value: str):
+        """Guardar memoria del usuario (una fila por clave: gana el último valor)."""
+        with self.db.write() as conn:
+            self._upsert_memories(conn, user_id, session_id, [(key, value)])
+    
+    def _upsert_memories(self, conn, user_id: str, session_id: str, memories):
+        """Insertar o actualizar memorias dentro de una transacción abierta."""
+        for key, value in memories:
+            if self.memory_history_versions > 0:
+                # Conservar el valor anterior si cambia
+                conn.execute("""
+                    INSERT INTO user_memory_history (user_id, session_id, key, value, timestamp)
+                    SELECT user_id, session_id, key, value, timestamp
+                    FROM user_memories
+                    WHERE user_id = ? AND key = ? AND value <> ?
+                """, (user_id, key, value))
+            
+            conn.execute("""
+                INSERT INTO user_memories (user_id, session_id, key, value, timestamp)
+                VALUES (?, ?, ?, ?, datetime('now'))
+                ON CONFLICT(user_id, key) DO UPDATE SET
+                    session_id = excluded.session_id,
+                    value = excluded.value,
+                    timestamp = excluded.timestamp
+            """, (user_id, session_id, key, value))
+        
+        if self.memory_history_versions > 0:
+            # Mantener sólo las últimas versiones de cada clave modificada
+            conn.executemany("""
+                DELETE FROM user_memory_history
+                WHERE user_id = ? AND key = ? AND id NOT IN (
+                    SELECT id FROM user_memory_history
+                    WHERE user_id = ? AND key = ?
+                    ORDER BY replaced_at DESC, id DESC
+                    LIMIT ?
+                )
+            """, [(user_id, key, user_id, key, self.memory_history_versions) for key, _ in memories])
+        
+        if self.max_memories_per_user > 0:
+            # Límite por usuario: se descartan las memorias menos recientes
+            conn.execute("""
+                DELETE FROM user_memories
+                WHERE user_id = ? AND id NOT IN (
+                    SELECT id FROM user_memories
+                    WHERE user_id = ?
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                )
+            """, (user_id, user_id, self.max_memories_per_user))
+    
+    def get_memories(self, user_id: str):
+        """Obtener todas las memorias de un usuario."""
+        with self.db.read() as conn:
+            cursor = conn.execute("""
+                SELECT key, value, timestamp 
+                FROM user_memories 
+                WHERE user_id = ? 
+                ORDER BY timestamp DESC, id DESC
+            """, (user_id,))
+            return cursor.fetchall()
+    
+    def get_memory_history(self, user_id: str, key: str):
+        """Valores anteriores de una memoria, del más reciente al más antiguo."""
+        with self.db.read() as conn:
+            cursor = conn.execute("""
+                SELECT value, timestamp, replaced_at
+                FROM user_memory_history
+                WHERE user_id = ? AND key = ?
+                ORDER BY replaced_at DESC, id DESC
+            """, (user_id, key))
+            return cursor.fetchall()
+    
+    def log_conversation(self, user_id: str, session_id: str, role: str, content: str):
+        """Registrar conversación."""
+        with self.db.write() as conn:
+            conn.execute("""
+                INSERT INTO conversation_log 
+                (user_id, session_id, role, content, timestamp)
+                VALUES (?, ?, ?, ?, datetime('now'))
+            """, (user_id, session_id, role, content))
+    
+    def get_or_create_session(self, user_id: str, session_id: str = None):
+        """Obtener sesión existente o crear nueva."""
+        if not session_id:
+            session_id = str(uuid.uuid4())
+        
+        with self.db.write() as conn:
+            # Crear la sesión o actualizar su última actividad en una sola sentencia
+            conn.execute("""
+                INSERT INTO sessions (id, user_id, created_at, last_activity)
+                VALUES (?, ?, datetime('now'), datetime('now'))
+                ON CONFLICT(id) DO UPDATE SET last_activity = datetime('now')
+            """, (session_id, user_id))
+        
+        return session_id
+    
+    def get_conversation_history(self, user_id: str, limit: int = 10):
+        """Obtener historial de conversaciones."""
+        with self.db.read() as conn:
+            cursor = conn.execute("""
+                SELECT role, content, timestamp 
+                FROM conversation_log 
+                WHERE user_id = ? 
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            """, (user_id, limit))
+            return cursor.fetchall()
+    
+    def save_semantic_context(self, user_id: str, session_id: str, context_type: str,
+                              content: str, relevance_score: float = 1.0):
+        """Guardar una entrada de contexto semántico."""
+        rows = [(user_id, session_id, context_type, content, relevance_score)]
+        vectors = self._embed_semantic_rows(rows)
+        with self.db.write() as conn:
+            self._insert_semantic_rows(conn, rows, vectors)
+    
+    def _embed_semantic_rows(self, rows):
+        """Embeddings del contenido de las filas, en una sola llamada al embedder.
+        
+        Se calcula antes de abrir la transacción de escritura: con un modelo
+        real (SEMANTIC_EMBEDDER) la inferencia no debe retener el bloqueo de
+        escritura de SQLite.
+        """
+        if not rows:
+            return []
+        return self.embedder.embed([row[3] for row in rows])
+    
+    def _insert_semantic_rows(self, conn, rows, vectors, timestamps=None):
+        """Insertar filas (user_id, session_id, tipo, contenido, relevancia) con su embedding.
+        
+        Se llama dentro de la transacción de escritura con los vectores de
+        ``_embed_semantic_rows``: el índice vectorial se actualiza bajo el mismo
+        bloqueo que sus reconstrucciones. ``timestamps`` (opcional, p. ej. al
+        importar) conserva la fecha original de cada fila.
+        """
+        if not rows:
+            return
+        timestamps = timestamps or [None] * len(rows)
+        indexed = {}
+        for row, vector, timestamp in zip(rows, vectors, timestamps):
+            cursor = conn.execute("""
+                INSERT INTO semantic_context 
+                (user_id, session_id, context_type, content, relevance_score, embedding, embedding_model, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, datetime('now')))
+            """, (*row, to_blob(vector), self.embedder.name, timestamp))
+            indexed.setdefault(row[0], ([], []))
+            indexed[row[0]][0].append(cursor.lastrowid)
+            indexed[row[0]][1].append(vector)
+        
+        for user_id, (ids, user_vectors) in indexed.items():
+            self.vector_index.add(user_id, ids, np.stack(user_vectors))
+    
+    def save_turns(self, records):
+        """Confirmar uno o varios turnos completos (TurnRecord) en una sola transacción."""
+        # Los embeddings del lote se calculan en una sola llamada al embedder, fuera de la transacción
+        semantic_rows = [(record.user_id, record.session_id, context_type, content, score)
+                         for record in records for context_type, content, score in record.semantic]
+        vectors = self._embed_semantic_rows(semantic_rows)
+        with self.db.write() as conn:
+            for record in records:
+                if record.messages:
+                    conn.executemany("""
+                        INSERT INTO conversation_log 
+                        (user_id, session_id, role, content, timestamp)
+                        VALUES (?, ?, ?, ?, datetime('now'))
+                    """, [(record.user_id, record.session_id, role, content)
+                          for role, content in record.messages])
+                
+                if record.memories:
+                    self._upsert_memories(conn, record.user_id, record.session_id, record.memories)
+            
+            self._insert_semantic_rows(conn, semantic_rows, vectors)
+    
+    def search_semantic_context(self, user_id: str, query: str, limit: int = 5):
+        """Búsqueda en el contexto semántico del usuario.
+        
+        Usa el índice FTS5 (BM25 combinado con relevancia y recencia) y recurre
+        a la búsqueda por LIKE si SQLite no dispone de FTS5. Con
+        SEMANTIC_SEARCH_MODE=vector usa el índice vectorial local.
+        """
+        if self.semantic_search_mode == "vector":
+            return self._search_semantic_context_vector(user_id, query, limit)
+        if not self.fts_enabled:
+            return self._search_semantic_context_like(user_id, query, limit)
+        
+        match_expression = text_search.build_match_expression(query, {"user_id": user_id})
+        if not match_expression:
+            return []
+        
+        # Candidatos ordenados por BM25; la columna user_id no puntúa
+        with self.db.read() as conn:
+            cursor = conn.execute("""
+                SELECT s.content, s.relevance_score, s.timestamp,
+                       bm25(semantic_context_fts, 0.0, 1.0) AS text_rank,
+                       julianday('now') - julianday(s.timestamp) AS age_days
+                FROM semantic_context_fts
+                JOIN semantic_context s ON s.id = semantic_context_fts.rowid
+                WHERE semantic_context_fts MATCH ? AND s.user_id = ?
+                ORDER BY text_rank
+                LIMIT ?
+            """, (match_expression, user_id, limit * 10))
+            candidates = cursor.fetchall()
+        
+        if not candidates:
+            return []
+        
+        best_rank = candidates[0][3]
+        ranked = sorted(
+            (
+                (content, text_search.blend_score(text_rank, best_rank, relevance_score, age_days), timestamp)
+                for content, relevance_score, timestamp, text_rank, age_days in candidates
+            ),
+            key=lambda row: row[1],
+            reverse=True,
+        )
+        return ranked[:limit]
+    
+    def _search_semantic_context_vector(self, user_id: str, query: str, limit: int = 5):
+        """Búsqueda por similitud coseno en el índice vectorial del usuario."""
+        self._ensure_vector_index(user_id)
+        query_vector = self.embedder.embed([query])[0]
+        if not query_vector.any():
+            return []
+        
+        similarity = {
+            row_id: score
+            for row_id, score in self.vector_index.search(user_id, query_vector, limit * 10)[0]
+            if score >= self.min_similarity
+        }
+        if not similarity:
+            return []
+        
+        # Búsqueda por rowid: "+user_id" evita que el planificador recorra el índice por usuario
+        placeholders = ", ".join("?" for _ in similarity)
+        with self.db.read() as conn:
+            cursor = conn.execute(f"""
+                SELECT id, content, relevance_score, timestamp,
+                       julianday('now') - julianday(timestamp) AS age_days
+                FROM semantic_context
+                WHERE id IN ({placeholders}) AND +user_id = ?
+            """, (*similarity, user_id))
+            candidates = cursor.fetchall()
+        
+        ranked = sorted(
+            (
+                (content, text_search.blend_signals(similarity[row_id], relevance_score, age_days), timestamp)
+                for row_id, content, relevance_score, timestamp, age_days in candidates
+            ),
+            key=lambda row: row[1],
+            reverse=True,
+        )
+        return ranked[:limit]
+    
+    def _ensure_vector_index(self, user_id: str):
+        """Reconstruir el índice del usuario si falta o no coincide con la base de datos.
+        
+        La comprobación se hace una vez por usuario y proceso; después el índice
+        se mantiene al día con cada inserción. Quien borre filas de
+        semantic_context debe llamar a ``vector_index.drop(user_id)``.
+        """
+        if user_id in self._vector_ready:
+            return
+        with self.db.write() as conn:
+            count = conn.execute(
+                "SELECT COUNT(*) FROM semantic_context WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+            if self.vector_index.size(user_id) != count:
+                self._rebuild_vector_index(conn, user_id)
+        with self._vector_ready_lock:
+            self._vector_ready.add(user_id)
+    
+    def _rebuild_vector_index(self, conn, user_id: str, batch_size: int = 1024):
+        """Regenerar el índice desde la columna embedding, calculando los que falten."""
+        rows = conn.execute("""
+            SELECT id, content, embedding, embedding_model
+            FROM semantic_context
+            WHERE user_id = ?
+            ORDER BY id
+        """, (user_id,)).fetchall()
+        
+        dim = self.embedder.dim
+        blob_size = dim * 4
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        vectors = np.zeros((len(rows), dim), dtype=np.float32)
+        
+        stored = [i for i, row in enumerate(rows)
+                  if row[3] == self.embedder.name and row[2] is not None and len(row[2]) == blob_size]
+        if stored:
+            vectors[stored] = np.frombuffer(b"".join(rows[i][2] for i in stored), dtype="<f4").reshape(-1, dim)
+        
+        # Filas anteriores a los embeddings o calculadas con otro embedder
+        stored_set = set(stored)
+        missing = [i for i in range(len(rows)) if i not in stored_set]
+        for start in range(0, len(missing), batch_size):
+            chunk = missing[start:start + batch_size]
+            chunk_vectors = self.embedder.embed([rows[i][1] for i in chunk])
+            vectors[chunk] = chunk_vectors
+            conn.executemany("""
+                UPDATE semantic_context SET embedding = ?, embedding_model = ? WHERE id = ?
+            """, [(to_blob(vector), self.embedder.name, rows[i][0]) for i, vector in zip(chunk, chunk_vectors)])
+        
+        self.vector_index.rebuild(user_id, ids, vectors)
+        logger.info("🧮 Índice vectorial reconstruido para %s: %s vectores (%s embeddings calculados)",
+                    user_id, len(rows), len(missing))
+    
+    def _forget_vector_index(self, user_ids):
+        """Descartar el índice vectorial de usuarios cuyas filas se han borrado.
+        
+        Se llama dentro de la transacción del borrado: la próxima búsqueda lo
+        reconstruye desde la base de datos.
+        """
+        with self._vector_ready_lock:
+            for user_id in user_ids:
+                self.vector_index.drop(user_id)
+                self._vector_ready.discard(user_id)
+    
+    def _search_semantic_context_like(self, user_id: str, query: str, limit: int = 5):
+        """Búsqueda por palabras clave con LIKE (sin índice de texto completo)."""
+        query_terms = text_search.query_terms(query)
+        if not query_terms:
+            return []
+        
+        conditions = []
+        params = [user_id]
+        for term in query_terms:
+            conditions.append("content LIKE ?")
+            params.append(f"%{term}%")
+        
+        where_clause = " OR ".join(conditions)
+        params.append(limit)
+        
+        with self.db.read() as conn:
+            cursor = conn.execute(f"""
+                SELECT content, relevance_score, timestamp 
+                FROM semantic_context 
+                WHERE user_id = ? AND ({where_clause})
+                ORDER BY relevance_score DESC, timestamp DESC
+                LIMIT ?
+            """, params)
+            return cursor.fetchall()
+    
+    def get_debug_info(self, user_id: str):
+        """Contadores y últimos mensajes de un usuario para /debug."""
+        with self.db.read() as conn:
+            memory_count = conn.execute(
+                "SELECT COUNT(*) FROM user_memories WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+            conversation_count = conn.execute(
+                "SELECT COUNT(*) FROM conversation_log WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+            recent_conversations = conn.execute("""
+                SELECT role, content, timestamp, session_id 
+                FROM conversation_log 
+                WHERE user_id = ? 
+                ORDER BY timestamp DESC, id DESC
+                LIMIT 5
+            """, (user_id,)).fetchall()
+        
+        return {
+            "memory_count": memory_count,
+            "conversation_count": conversation_count,
+            "recent_conversations": [
+                {"role": role, "content": content[:100], "timestamp": timestamp, "session_id": session_id}
+                for role, content, timestamp, session_id in recent_conversations
+            ],
+        }
+    
+    def get_info(self):
+        """Descripción de la base de datos para /health y /debug."""
+        search = self.semantic_search_mode
+        if search == "vector":
+            search = f"vector ({self.embedder.name})"
+        elif not self.fts_enabled:
+            search = "like"
+        return {
+            "database_path": self.db_path,
+            "schema_version": self.schema_version,
+            "journal_mode": self.db.journal_mode,
+            "auto_vacuum": self.db.auto_vacuum,
+            "semantic_search": search,
+            "db_file_size": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+        }
+    
+    def get_storage_stats(self):
+        """Filas por tabla y tamaño del fichero (consulta de administración)."""
+        with self.db.read() as conn:
+            stats = {
+                table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("sessions", "user_memories", "conversation_log", "semantic_context")
+            }
+            stats["users"] = conn.execute("SELECT COUNT(DISTINCT user_id) FROM conversation_log").fetchone()[0]
+            # Páginas libres pendientes de reutilizar o de devolver con incremental_vacuum
+            stats["free_pages"] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        stats["database_path"] = self.db_path
+        stats["db_file_size"] = os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+        return stats
+    
+    def close(self):
+        """Cerrar las conexiones abiertas con la base de datos."""
+        # Refrescar estadísticas del planificador si han quedado desactualizadas
+        with self.db.write() as conn:
+            conn.execute("PRAGMA optimize")
+        self.vector_index.close()
+        self.db.close()
+
+
+class SQLiteMemoryStore(MemoryStore):
+    """MemoryStore sobre DatabaseMemorySystem con su propio executor."""
+
+    backend = "sqlite"
+
+    def __init__(self, memory_system, max_workers: int = None):
+        # DatabaseMemorySystem o ShardedMemorySystem (misma interfaz)
+        self.memory_system = memory_system
+        # Más hilos que conexiones sólo añadiría espera en el pool de lectores
+        workers = max_workers or memory_system.max_connections
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="memory-db")
+
+    async def run(self, fn, *args, **kwargs):
+        """Ejecutar una función bloqueante en el executor de base de datos."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def get_memories(self, user_id: str):
+        return await self.run(self.memory_system.get_memories, user_id)
+
+    async def get_memory_history(self, user_id: str, key: str):
+        return await self.run(self.memory_system.get_memory_history, user_id, key)
+
+    async def get_conversation_history(self, user_id: str, limit: int = 10):
+        return await self.run(self.memory_system.get_conversation_history, user_id, limit)
+
+    async def search_semantic_context(self, user_id: str, query: str, limit: int = 5):
+        return await self.run(self.memory_system.search_semantic_context, user_id, query, limit)
+
+    async def get_or_create_session(self, user_id: str, session_id: str = None):
+        return await self.run(self.memory_system.get_or_create_session, user_id, session_id)
+
+    async def save_turns(self, records):
+        return await self.run(self.memory_system.save_turns, records)
+
+    async def get_debug_info(self, user_id: str):
+        return await self.run(self.memory_system.get_debug_info, user_id)
+
+    async def get_storage_stats(self):
+        # Una consulta por shard, en paralelo
+        shards = await asyncio.gather(*(self.run(shard.get_storage_stats) for shard in self.memory_system.shards))
+        totals = {key: sum(shard[key] for shard in shards)
+                  for key in shards[0] if key != "database_path"}
+        if len(shards) > 1:
+            totals["shards"] = shards
+        return totals
+
+    def shard_key(self, user_id: str):
+        return self.memory_system.shard_index(user_id)
+
+    def get_info(self):
+        return {"backend": self.backend, **self.memory_system.get_info()}
+
+    async def close(self):
+        """Esperar a las operaciones en curso y cerrar la base de datos."""
+        await asyncio.to_thread(self._executor.shutdown, True)
+        self.memory_system.close()
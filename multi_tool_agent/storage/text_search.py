@@ -0,0 +1,103 @@
+"""
+Utilidades de búsqueda de texto en español sobre índices FTS5 de SQLite.
+
+Normaliza la consulta igual que el tokenizador ``unicode61 remove_diacritics 2``
+(minúsculas y sin tildes), descarta palabras vacías del español y aplica un
+stemming ligero que se traduce en consultas por prefijo, de forma que
+"gatos" encuentra "gato", "gata" o "gatito".
+"""
+
+import math
+import re
+import unicodedata
+
+# Tokenizador usado por todas las tablas FTS5 del proyecto
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Peso de cada señal en la puntuación final de un resultado
+TEXT_WEIGHT = 0.6
+RELEVANCE_WEIGHT = 0.25
+RECENCY_WEIGHT = 0.15
+
+# Días tras los que la señal de recencia cae a la mitad
+RECENCY_HALF_LIFE_DAYS = 30.0
+
+SPANISH_STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aqui asi aun bien cada como con
+contra cual cuales cuando de del desde donde dos e el ella ellas ello ellos en entre era
+eran eres es esa esas ese eso esos esta estaba estado estan estar estas este esto estos
+estoy fue fueron ha habia han has hasta hay he la las le les lo los mas me mi mis mucho
+muy nada ni no nos nosotros o os otra otro para pero poco por porque que quien se sea
+ser si sido sin sobre soy su sus tambien te tengo ti tiene tienen todo todos tu tus un una
+unas uno unos usted ustedes vosotros y ya yo
+""".split())
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas y sin diacríticos, como el tokenizador FTS5."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def light_stem(word: str) -> str:
+    """Stemming ligero del español: plural y género."""
+    if len(word) > 4 and word.endswith("es") and word[-3] not in "aeiou":
+        word = word[:-2]
+    elif len(word) > 3 and word.endswith("s"):
+        word = word[:-1]
+    if len(word) > 3 and word[-1] in "aoe":
+        word = word[:-1]
+    return word
+
+
+def query_terms(query: str):
+    """Términos de búsqueda normalizados, sin palabras vacías ni duplicados."""
+    terms = []
+    for word in _WORD_RE.findall(normalize_text(query)):
+        if len(word) < 2 or word in SPANISH_STOPWORDS or word.replace("_", "") == "":
+            continue
+        stem = light_stem(word) if not word.isdigit() else word
+        if stem not in terms:
+            terms.append(stem)
+    return terms
+
+
+def fts_phrase(text: str):
+    """Frase FTS5 entrecomillada, o None si el texto no contiene ningún token."""
+    if not _WORD_RE.search(normalize_text(text).replace("_", " ")):
+        return None
+    return '"' + text.replace('"', '""') + '"'
+
+
+def build_match_expression(query: str, filters: dict = None):
+    """Expresión MATCH: términos por prefijo unidos con OR, más filtros por columna.
+
+    Devuelve None si la consulta no contiene términos útiles.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return None
+
+    expression = "(" + " OR ".join(f'"{term}"*' for term in terms) + ")"
+    for column, value in (filters or {}).items():
+        phrase = fts_phrase(value)
+        if phrase:
+            expression = f"{column} : {phrase} AND {expression}"
+    return expression
+
+
+def blend_score(text_rank: float, best_rank: float, relevance_score: float, age_days: float) -> float:
+    """Combinar BM25 (normalizado respecto al mejor resultado), relevancia y recencia."""
+    # bm25() devuelve valores negativos: cuanto menor, mejor
+    text_score = text_rank / best_rank if best_rank < 0 else 0.0
+    return blend_signals(text_score, relevance_score, age_days)
+
+
+def blend_signals(text_score: float, relevance_score: float, age_days: float) -> float:
+    """Puntuación final a partir de la similitud textual (0-1), relevancia y recencia."""
+    recency = math.pow(0.5, max(age_days or 0.0, 0.0) / RECENCY_HALF_LIFE_DAYS)
+    return (TEXT_WEIGHT * text_score
+            + RELEVANCE_WEIGHT * (relevance_score or 0.0)
+            + RECENCY_WEIGHT * recency)
@@ -0,0 +1,173 @@
+"""
+Índice vectorial local por usuario para el contexto semántico.
+
+Cada usuario tiene un fichero de registros ``(id, vector)`` de tamaño fijo que
+se abre con ``np.memmap``: sólo se cargan en memoria las páginas que se leen y
+varios procesos pueden compartir el mismo índice. Las filas nuevas se añaden al
+final (una sola escritura por lote) y el índice completo se reconstruye de
+forma perezosa desde la columna ``embedding`` de SQLite cuando falta o no
+coincide con la base de datos.
+
+La búsqueda es similitud coseno exacta (vectores normalizados) por bloques:
+cada bloque se puntúa con un producto de matrices y se conserva el top-k
+parcial, de modo que la memoria temporal no depende del tamaño del índice.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Filas puntuadas por bloque en una búsqueda
+SEARCH_BLOCK_ROWS = 65536
+
+
+class VectorIndex:
+    """Índices por usuario en disco (``index_dir``) o en memoria (``index_dir=None``)."""
+
+    def __init__(self, index_dir: str, dim: int, max_open_users: int = 256):
+        self.index_dir = index_dir
+        self.dim = dim
+        self.max_open_users = max_open_users
+        self.record_dtype = np.dtype([("id", "<i8"), ("vector", "<f4", (dim,))])
+        self._lock = threading.RLock()
+        # user_id -> (tamaño del fichero al abrirlo, registros mapeados)
+        self._open = OrderedDict()
+        # Sin directorio (base de datos :memory:) los registros viven en el proceso
+        self._in_memory = {}
+
+    def _path(self, user_id: str) -> str:
+        # Nombre de fichero seguro e independiente del contenido de user_id
+        digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.index_dir, f"{digest}.vec")
+
+    def _to_records(self, ids, vectors):
+        records = np.empty(len(ids), dtype=self.record_dtype)
+        records["id"] = ids
+        records["vector"] = vectors
+        return records
+
+    def _records(self, user_id: str):
+        """Registros del usuario (memmap de sólo lectura) o None si no hay índice."""
+        if not self.index_dir:
+            return self._in_memory.get(user_id)
+
+        path = self._path(user_id)
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                self._open.pop(user_id, None)
+                return None
+            if size % self.record_dtype.itemsize:
+                # Escritura incompleta: se trata como índice inexistente
+                return None
+
+            cached = self._open.get(user_id)
+            if cached is not None and cached[0] == size:
+                self._open.move_to_end(user_id)
+                return cached[1]
+
+            count = size // self.record_dtype.itemsize
+            records = (np.memmap(path, dtype=self.record_dtype, mode="r", shape=(count,))
+                       if count else np.empty(0, dtype=self.record_dtype))
+            self._open[user_id] = (size, records)
+            self._open.move_to_end(user_id)
+            while len(self._open) > self.max_open_users:
+                self._open.popitem(last=False)
+            return records
+
+    def size(self, user_id: str):
+        """Número de vectores indexados, o None si el índice no existe."""
+        records = self._records(user_id)
+        return None if records is None else len(records)
+
+    def add(self, user_id: str, ids, vectors):
+        """Añadir vectores a un índice existente (si no existe se creará al reconstruir)."""
+        if len(ids) == 0:
+            return
+        records = self._to_records(ids, vectors)
+        with self._lock:
+            if not self.index_dir:
+                if user_id in self._in_memory:
+                    self._in_memory[user_id] = np.concatenate([self._in_memory[user_id], records])
+                return
+
+            path = self._path(user_id)
+            if not os.path.exists(path):
+                return
+            # O_APPEND con una sola escritura: los registros no se intercalan entre procesos
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(fd, records.tobytes())
+            finally:
+                os.close(fd)
+
+    def rebuild(self, user_id: str, ids, vectors):
+        """Sustituir el índice del usuario de forma atómica."""
+        records = self._to_records(ids, vectors)
+        with self._lock:
+            if not self.index_dir:
+                self._in_memory[user_id] = records
+                return
+
+            os.makedirs(self.index_dir, exist_ok=True)
+            path = self._path(user_id)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(records.tobytes())
+            os.replace(tmp_path, path)
+            self._open.pop(user_id, None)
+
+    def drop(self, user_id: str):
+        """Eliminar el índice del usuario (se reconstruirá en la próxima búsqueda)."""
+        with self._lock:
+            self._in_memory.pop(user_id, None)
+            self._open.pop(user_id, None)
+            if self.index_dir:
+                try:
+                    os.remove(self._path(user_id))
+                except FileNotFoundError:
+                    pass
+
+    def search(self, user_id: str, query_vectors, k: int):
+        """Top-k por similitud coseno para una o varias consultas.
+
+        Devuelve, por cada consulta, una lista de ``(id, similitud)`` ordenada
+        de mayor a menor similitud.
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        records = self._records(user_id)
+        if records is None or len(records) == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        k = min(k, len(records))
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(records), SEARCH_BLOCK_ROWS):
+            block = records[start:start + SEARCH_BLOCK_ROWS]
+            scores = queries @ block["vector"].T
+            ids = np.broadcast_to(block["id"], scores.shape)
+
+            # Unir el top-k acumulado con el bloque y quedarse de nuevo con k
+            scores = np.concatenate([best_scores, scores], axis=1)
+            ids = np.concatenate([best_ids, ids], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                ids = np.take_along_axis(ids, top, axis=1)
+            best_scores, best_ids = scores, ids
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_ids = np.take_along_axis(best_ids, order, axis=1)
+        return [list(zip(row_ids.tolist(), row_scores.tolist()))
+                for row_ids, row_scores in zip(best_ids, best_scores)]
+
+    def close(self):
+        """Liberar los ficheros mapeados."""
+        with self._lock:
+            self._open.clear()
+            self._in_memory.clear()
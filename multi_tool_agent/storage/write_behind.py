@@ -0,0 +1,175 @@
+"""
+Persistencia diferida (write-behind) de los turnos de chat.
+
+Cada turno se agrupa en un ``TurnRecord`` que se confirma en una sola
+transacción. Los registros pasan por una cola asíncrona acotada cuyo worker
+agrupa los turnos pendientes de todos los usuarios en un único commit
+(group commit); con ``partition_key`` el lote se divide por partición (p. ej.
+shard de SQLite) y cada parte se confirma en paralelo. El modo de durabilidad decide si quien encola espera a que su
+turno esté confirmado (``sync``) o vuelve inmediatamente (``deferred``).
+"""
+
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ("sync", "deferred")
+
+
+@dataclass
+class TurnRecord:
+    """Todas las escrituras de un turno de chat."""
+
+    user_id: str
+    session_id: str
+    # (role, content)
+    messages: List[Tuple[str, str]] = field(default_factory=list)
+    # (key, value)
+    memories: List[Tuple[str, str]] = field(default_factory=list)
+    # (context_type, content, relevance_score)
+    semantic: List[Tuple[str, str, float]] = field(default_factory=list)
+
+
+class WriteBehindQueue:
+    """Cola acotada con un worker que confirma lotes de turnos en una transacción."""
+
+    def __init__(self, commit_batch, durability: str = "sync", max_size: int = 1000,
+                 batch_size: int = 64, on_commit=None, partition_key=None):
+        durability = durability.lower()
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Modo de durabilidad '{durability}' no válido. Opciones: {DURABILITY_MODES}")
+
+        # Corrutina commit_batch(records) que confirma una lista de turnos
+        self.commit_batch = commit_batch
+        # Callback opcional on_commit(records), función o corrutina, tras confirmar (p. ej. invalidar cachés)
+        self.on_commit = on_commit
+        # Función opcional partition_key(user_id): particiones con escritores independientes
+        self.partition_key = partition_key
+        self.durability = durability
+        self.max_size = max_size
+        self.batch_size = batch_size
+
+        self._queue = None
+        self._worker = None
+        self.committed_turns = 0
+        self.committed_batches = 0
+        self.failed_turns = 0
+
+    def _ensure_worker(self):
+        """Crear la cola y el worker en el event loop actual."""
+        if self._worker is None or self._worker.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, record: TurnRecord):
+        """Encolar un turno; en modo sync espera a que esté confirmado."""
+        self._ensure_worker()
+        # En modo deferred nadie espera el resultado: los fallos sólo se registran
+        future = asyncio.get_running_loop().create_future() if self.durability == "sync" else None
+        # Si la cola está llena, quien escribe espera (backpressure)
+        await self._queue.put((record, future))
+        if future is not None:
+            await future
+
+    async def _run(self):
+        """Worker: tomar todo lo pendiente (hasta batch_size) y confirmarlo junto."""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            try:
+                if self.partition_key is None:
+                    await self._commit(batch)
+                else:
+                    partitions = {}
+                    for item in batch:
+                        partitions.setdefault(self.partition_key(item[0].user_id), []).append(item)
+                    await asyncio.gather(*(self._commit(part) for part in partitions.values()))
+            except Exception as e:
+                # El worker no debe morir: flush() dejaría de esperar y lo encolado no se escribiría
+                logger.exception("❌ Error inesperado en la cola de escritura: %s", e)
+                for _, future in batch:
+                    if future is None or not future.done():
+                        self.failed_turns += 1
+                    if future is not None and not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit(self, batch):
+        records = [record for record, _ in batch]
+        try:
+            await self.commit_batch(records)
+            self.committed_batches += 1
+        except Exception as batch_error:
+            # Un registro defectuoso no debe arrastrar al resto del lote
+            logger.warning("⚠️  Error confirmando lote de %s turnos: %s", len(batch), batch_error)
+            for record, future in batch:
+                try:
+                    await self.commit_batch([record])
+                except Exception as record_error:
+                    self.failed_turns += 1
+                    logger.error("❌ Turno de %s descartado: %s", getattr(record, "user_id", "?"), record_error)
+                    if future is not None and not future.done():
+                        future.set_exception(record_error)
+                else:
+                    self.committed_turns += 1
+                    await self._notify_commit([record])
+                    if future is not None and not future.done():
+                        future.set_result(None)
+            return
+
+        self.committed_turns += len(batch)
+        await self._notify_commit(records)
+        for _, future in batch:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    async def _notify_commit(self, records):
+        """Avisar de los turnos confirmados antes de despertar a quien espera."""
+        if self.on_commit is None:
+            return
+        try:
+            # on_commit puede ser una corrutina (p. ej. invalidar una caché en disco fuera del event loop)
+            result = self.on_commit(records)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.warning("⚠️  Error en on_commit: %s", e)
+
+    async def flush(self):
+        """Esperar a que todos los turnos encolados estén confirmados."""
+        if self._queue is not None and self._worker is not None and not self._worker.done():
+            await self._queue.join()
+
+    async def close(self):
+        """Vaciar la cola y detener el worker (al apagar el servidor)."""
+        await self.flush()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def get_stats(self):
+        """Métricas de la cola."""
+        return {
+            "durability": self.durability,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "max_size": self.max_size,
+            "committed_turns": self.committed_turns,
+            "committed_batches": self.committed_batches,
+            "failed_turns": self.failed_turns,
+        }
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Cambiar el número de shards SQLite de la memoria del Database Agent.
+
+Copia todas las filas de cada usuario al fichero que le corresponde en el
+nuevo reparto. Ejecutar con el servidor parado; después, ajustar
+SQLITE_SHARDS en .env y, una vez comprobado, borrar los ficheros antiguos.
+
+Uso:
+    python reshard_memory.py --from 1 --to 4
+    python reshard_memory.py --db otra_base.db --from 4 --to 8
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# El paquete importa los agentes al cargarse; esta herramienta no usa el LLM
+os.environ.setdefault("GOOGLE_API_KEY", "reshard-sin-llm")
+
+from multi_tool_agent.storage.sharding import reshard, shard_paths
+from multi_tool_agent.logging_setup import configure_logging
+
+# Registros de la librería (migraciones, progreso) en texto legible por consola
+configure_logging(fmt="text")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Repartir la memoria SQLite en otro número de shards")
+    parser.add_argument("--db", default=os.getenv("DATABASE_AGENT_DB_PATH", "database_agent_sessions.db"),
+                        help="Ruta base de la base de datos")
+    parser.add_argument("--from", dest="source", type=int, default=int(os.getenv("SQLITE_SHARDS", "1")),
+                        help="Shards actuales (1 = un solo fichero)")
+    parser.add_argument("--to", dest="target", type=int, required=True, help="Shards nuevos")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Filas por lote de copia")
+    args = parser.parse_args()
+
+    try:
+        reshard(args.db, args.source, args.target, batch_size=args.batch_size)
+    except (ValueError, FileExistsError, FileNotFoundError) as e:
+        print(f"❌ [RESHARD] {e}")
+        sys.exit(1)
+
+    print(f"➡️  Configure SQLITE_SHARDS={args.target} y, tras comprobarlo, borre los ficheros anteriores:")
+    for path in shard_paths(args.db, args.source):
+        print(f"   {path} (con sus ficheros -wal/-shm y {os.path.splitext(path)[0]}_vectors/)")
+
+
+if __name__ == "__main__":
+    main()
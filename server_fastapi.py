@@ -5,17 +5,27 @@ Servidor FastAPI para el agente con memoria persistente.
 
 import os
 import asyncio
+import hmac
+import json
+import logging
 import sys
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Dict, Any, Optional
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
 # Añadir directorio actual al path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Logging JSON no bloqueante, antes de crear el agente para no perder sus registros de arranque
+from multi_tool_agent.logging_setup import configure_logging, get_logging_stats
+configure_logging()
+logger = logging.getLogger("server_fastapi")
+
 # Importar nuestros módulos
 # Solo importar el agente seleccionado para evitar logs innecesarios
 selected_agent = os.getenv('SELECTED_AGENT', 'database')
@@ -33,12 +43,23 @@ else:
     from multi_tool_agent.agents.database_agent import DatabaseAgent
     current_agent = DatabaseAgent()
 
-print(f"🤖 [SERVER] Agente seleccionado: {selected_agent.upper()}")
+logger.info("🤖 Agente seleccionado: %s", selected_agent.upper())
+
+from multi_tool_agent.memory import track_cache_status
 
 # Cargar variables de entorno
 load_dotenv()
 
-app = FastAPI(title="Agente con Memoria Persistente", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ciclo de vida del servidor: tareas de fondo del agente y, al apagar, vaciar sus escrituras pendientes."""
+    if hasattr(current_agent, "start_background_tasks"):
+        current_agent.start_background_tasks()
+    yield
+    if hasattr(current_agent, "shutdown"):
+        await current_agent.shutdown()
+
+app = FastAPI(title="Agente con Memoria Persistente", version="1.0.0", lifespan=lifespan)
 
 class ChatMessage(BaseModel):
     user_id: str
@@ -169,29 +190,59 @@ async def home():
                         console.log('No hay session_id guardado');
                     }
                     
-                    const response = await fetch('/chat', {
+                    // Streaming (SSE): el texto aparece a medida que lo genera el modelo
+                    const response = await fetch('/chat/stream', {
                         method: 'POST',
                         headers: { 'Content-Type': 'application/json' },
                         body: JSON.stringify(requestBody)
                     });
                     
-                    const data = await response.json();
-                    
-                    // Remover indicador de carga
-                    loadingDiv.remove();
+                    const reader = response.body.getReader();
+                    const decoder = new TextDecoder();
+                    let buffer = '';
+                    let textSpan = null;
+                    let done = null;
                     
-                    // Mostrar respuesta del agente
-                    addMessage(data.response, 'agent');
-                    
-                    // Guardar session_id para futuras conversaciones
-                    if (data.session_id) {
-                        currentSessionId = data.session_id;
-                        console.log('Session ID guardado:', currentSessionId);
+                    while (true) {
+                        const { value, done: finished } = await reader.read();
+                        if (finished) break;
+                        buffer += decoder.decode(value, { stream: true });
+                        
+                        // Cada evento SSE termina en una línea en blanco
+                        let boundary;
+                        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                            const frame = buffer.slice(0, boundary);
+                            buffer = buffer.slice(boundary + 2);
+                            const dataLine = frame.split('\n').find(line => line.startsWith('data: '));
+                            if (!dataLine) continue;
+                            const event = JSON.parse(dataLine.slice(6));
+                            
+                            if (event.type === 'session') {
+                                // Guardar session_id para futuras conversaciones
+                                currentSessionId = event.session_id;
+                            } else if (event.type === 'delta') {
+                                if (!textSpan) {
+                                    // Primer fragmento: sustituir el indicador de carga
+                                    loadingDiv.innerHTML = '<strong>🤖 Agente:</strong> ';
+                                    textSpan = document.createElement('span');
+                                    loadingDiv.appendChild(textSpan);
+                                }
+                                textSpan.textContent += event.text;
+                                const chatContainer = document.getElementById('chat-container');
+                                chatContainer.scrollTop = chatContainer.scrollHeight;
+                            } else if (event.type === 'done') {
+                                done = event;
+                            } else if (event.type === 'error') {
+                                loadingDiv.innerHTML = event.detail;
+                            }
+                        }
                     }
                     
-                    // Actualizar contador de memorias
-                    document.getElementById('memory-status').innerHTML = 
-                        `Usuario: ${userId} | Memorias: ${data.memories_count} | Última respuesta exitosa`;
+                    // Actualizar estado con el tiempo hasta el primer fragmento
+                    if (done) {
+                        document.getElementById('memory-status').innerHTML = 
+                            `Usuario: ${userId} | Primer fragmento en ${Math.round(done.ttft_ms)} ms | Última respuesta exitosa`;
+                    }
                         
                 } catch (error) {
                     loadingDiv.innerHTML = '❌ Error al comunicarse con el agente';
@@ -219,12 +270,41 @@ async def home():
     """
     return HTMLResponse(content=html_content)
 
+# Cada cuánto se comprueba si el cliente de /chat sigue conectado (segundos)
+DISCONNECT_POLL_INTERVAL = float(os.getenv("CHAT_DISCONNECT_POLL_INTERVAL", "0.5"))
+
+class ClientDisconnected(Exception):
+    """El cliente cerró la conexión antes de recibir la respuesta."""
+
+async def run_until_disconnect(request: Request, coro):
+    """Ejecutar la corrutina del agente y cancelarla si el cliente se desconecta."""
+    task = asyncio.create_task(coro)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            raise ClientDisconnected()
+
+def set_cache_headers(http_response: Response, cache_status: dict):
+    """X-Cache (HIT, MISS o BYPASS) y Age de la caché de respuestas, si el agente la usa."""
+    if cache_status["status"]:
+        http_response.headers["X-Cache"] = cache_status["status"]
+    if cache_status["age"] is not None:
+        http_response.headers["Age"] = str(int(cache_status["age"]))
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(message: ChatMessage):
+async def chat_endpoint(message: ChatMessage, request: Request, http_response: Response):
     """Endpoint principal de chat con memoria persistente."""
     
     # Debug: mostrar qué está recibiendo
-    print(f"🔍 [SERVER] Recibido - user_id: {message.user_id}, session_id: {message.session_id}")
+    logger.debug("🔍 Recibido - user_id: %s, session_id: %s", message.user_id, message.session_id,
+                 extra={"user_id": message.user_id, "session_id": message.session_id})
     
     # Obtener el agente seleccionado
     selected_agent = os.getenv('SELECTED_AGENT', 'database')
@@ -245,12 +325,14 @@ async def chat_endpoint(message: ChatMessage):
         )
     
     try:
-        # Ejecutar el agente seleccionado
-        response, session_id = await current_agent.run(
+        # Ejecutar el agente seleccionado (se cancela si el cliente se desconecta)
+        cache_status = track_cache_status()
+        response, session_id = await run_until_disconnect(request, current_agent.run(
             user_id=message.user_id,
             message=message.message,
             session_id=message.session_id
-        )
+        ))
+        set_cache_headers(http_response, cache_status)
         
         # Obtener información del agente actual
         agent_info = {
@@ -266,6 +348,11 @@ async def chat_endpoint(message: ChatMessage):
             memories_count=len(agent_info.get('features', [])) if agent_info else 0
         )
         
+    except ClientDisconnected:
+        logger.info("🔌 Cliente desconectado, ejecución cancelada - user_id: %s", message.user_id)
+        # 499: código habitual para "el cliente cerró la petición"
+        return Response(status_code=499)
+    
     except Exception as e:
         # En caso de error, generar respuesta de fallback
         session_id = message.session_id or f"session_{message.user_id}_{int(asyncio.get_event_loop().time())}"
@@ -279,6 +366,81 @@ async def chat_endpoint(message: ChatMessage):
             memories_count=0
         )
 
+async def agent_stream(user_id: str, message: str, session_id: Optional[str]):
+    """Eventos del turno en streaming; los agentes sin run_stream envían la respuesta en un solo fragmento."""
+    if hasattr(current_agent, "run_stream"):
+        async for event in current_agent.run_stream(user_id=user_id, message=message, session_id=session_id):
+            yield event
+        return
+    
+    started = asyncio.get_running_loop().time()
+    response, session_id = await current_agent.run(user_id=user_id, message=message, session_id=session_id)
+    ttft_ms = round((asyncio.get_running_loop().time() - started) * 1000, 1)
+    yield {"type": "session", "session_id": session_id}
+    yield {"type": "delta", "text": response}
+    yield {"type": "done", "session_id": session_id, "response": response, "ttft_ms": ttft_ms}
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(message: ChatMessage):
+    """Chat en streaming (Server-Sent Events): el texto llega a medida que lo genera el modelo.
+    
+    Eventos ``session``, ``delta`` (fragmento de texto) y ``done`` (respuesta
+    completa, tiempo hasta el primer fragmento y resultado de la caché). Si el cliente se desconecta,
+    Starlette cancela el generador y el turno no se guarda.
+    """
+    logger.debug("🔍 Stream - user_id: %s, session_id: %s", message.user_id, message.session_id)
+    
+    async def frames():
+        # Las cabeceras ya se enviaron: el resultado de la caché va en el evento done
+        cache_status = track_cache_status()
+        try:
+            async for event in agent_stream(message.user_id, message.message, message.session_id):
+                if event["type"] == "done":
+                    event["cache"] = cache_status["status"]
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            error = {"type": "error", "detail": f"⚠️ Error procesando mensaje: {str(e)[:100]}"}
+            yield f"event: error\ndata: {json.dumps(error, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(frames(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        # Evitar que un proxy (nginx) acumule los fragmentos
+        "X-Accel-Buffering": "no",
+    })
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """Chat en streaming por WebSocket: una conexión por conversación.
+    
+    El cliente envía ``{"user_id", "message"}`` por turno y recibe los mismos
+    eventos que en /chat/stream como JSON. La conexión recuerda el
+    session_id entre turnos; cerrarla a mitad de un turno lo cancela.
+    """
+    await websocket.accept()
+    session_id = websocket.query_params.get("session_id")
+    try:
+        while True:
+            payload = await websocket.receive_json()
+            user_id, text = payload.get("user_id"), payload.get("message")
+            if not user_id or not text:
+                await websocket.send_json({"type": "error", "detail": "Se requieren user_id y message"})
+                continue
+            session_id = payload.get("session_id") or session_id
+            cache_status = track_cache_status()
+            try:
+                async for event in agent_stream(user_id, text, session_id):
+                    if event["type"] == "session":
+                        session_id = event["session_id"]
+                    elif event["type"] == "done":
+                        event["cache"] = cache_status["status"]
+                    await websocket.send_json(event)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                await websocket.send_json({"type": "error", "detail": f"⚠️ Error procesando mensaje: {str(e)[:100]}"})
+    except WebSocketDisconnect:
+        logger.info("🔌 WebSocket cerrado - session_id: %s", session_id)
+
 @app.get("/memories/{user_id}")
 async def get_memories(user_id: str):
     """Obtener todas las memorias de un usuario."""
@@ -315,13 +477,21 @@ async def health_check():
         "status": "active"
     }
     
-    return {
+    health = {
         "status": "healthy",
         "api_key_configured": bool(api_key),
         "selected_agent": selected_agent,
         "agent_info": agent_info,
         "available_agents": ["database", "adk", "vertex"]
     }
+    
+    # Métricas del agente activo (colas, cachés), si las expone
+    if hasattr(current_agent, "get_runtime_stats"):
+        health["runtime"] = current_agent.get_runtime_stats()
+    # Registros en cola y descartados por el logging no bloqueante
+    health["logging"] = get_logging_stats()
+    
+    return health
 
 @app.get("/debug/{user_id}")
 async def debug_memory(user_id: str):
@@ -351,185 +521,128 @@ async def debug_memory(user_id: str):
     
     # Información específica según el tipo de agente
     if selected_agent == "database":
-        # Para Database Agent, verificar la base de datos personalizada
-        import sqlite3
-        db_path = "database_agent_sessions.db"
+        # Para Database Agent, consultar el almacén de memoria del agente (cualquier backend)
+        debug_info.update(agent.memory.get_info())
+        debug_info.update(await agent.memory.get_debug_info(user_id))
+        # Totales de todo el almacén (con shards, una consulta por shard en paralelo)
+        debug_info["storage"] = await agent.memory.get_storage_stats()
+    
+    elif selected_agent == "adk":
+        # Las sesiones viven en el SessionService acotado (memoria + tabla adk_sessions): se consultan con su API
+        from multi_tool_agent.storage.adk_memory_service import event_text
         
-        if os.path.exists(db_path):
-            conn = sqlite3.connect(db_path)
-            
-            # Contar registros en tablas personalizadas
-            try:
-                cursor = conn.execute("SELECT COUNT(*) FROM user_memories WHERE user_id = ?", (user_id,))
-                memory_count = cursor.fetchone()[0]
-            except:
-                memory_count = 0
-                
-            try:
-                cursor = conn.execute("SELECT COUNT(*) FROM conversation_log WHERE user_id = ?", (user_id,))
-                conversation_count = cursor.fetchone()[0]
-            except:
-                conversation_count = 0
-            
-            # Obtener últimas conversaciones
-            try:
-                cursor = conn.execute("""
-                    SELECT role, content, timestamp, session_id 
-                    FROM conversation_log 
-                    WHERE user_id = ? 
-                    ORDER BY timestamp DESC 
-                    LIMIT 5
-                """, (user_id,))
-                recent_conversations = cursor.fetchall()
-            except:
-                recent_conversations = []
-            
-            conn.close()
-            
-            debug_info.update({
-                "database_path": db_path,
-                "memory_count": memory_count,
-                "conversation_count": conversation_count,
-                "recent_conversations": [
-                    {"role": row[0], "content": row[1][:100], "timestamp": row[2], "session_id": row[3]}
-                    for row in recent_conversations
-                ],
-                "db_file_size": os.path.getsize(db_path) if os.path.exists(db_path) else 0
-            })
-        else:
-            debug_info["database_path"] = db_path
-            debug_info["status"] = "Base de datos no encontrada"
-    
-    elif selected_agent in ["adk", "vertex"]:
-        # Para ADK y Vertex agents, verificar la base de datos ADK
-        import sqlite3
-        db_path = f"{selected_agent}_agent_sessions.db"
+        session_service = agent.session_service
+        response = await session_service.list_sessions(app_name="adk_agent", user_id=user_id)
+        sessions = sorted(response.sessions, key=lambda s: s.last_update_time, reverse=True)
         
-        if os.path.exists(db_path):
-            conn = sqlite3.connect(db_path)
-            
-            # Verificar tablas ADK
-            try:
-                cursor = conn.execute("SELECT COUNT(*) FROM sessions WHERE user_id = ?", (user_id,))
-                session_count = cursor.fetchone()[0]
-            except:
-                session_count = 0
-                
-            try:
-                cursor = conn.execute("SELECT COUNT(*) FROM messages WHERE user_id = ?", (user_id,))
-                message_count = cursor.fetchone()[0]
-            except:
-                message_count = 0
-            
-            # Obtener últimas sesiones (usando esquema correcto ADK)
-            try:
-                cursor = conn.execute("""
-                    SELECT id, app_name, create_time 
-                    FROM sessions 
-                    WHERE user_id = ? 
-                    ORDER BY create_time DESC 
-                    LIMIT 5
-                """, (user_id,))
-                recent_sessions = cursor.fetchall()
-            except:
-                recent_sessions = []
-            
-            # Obtener mensajes recientes con contenido (usando esquema correcto ADK)
-            try:
-                cursor = conn.execute("""
-                    SELECT m.session_id, m.role, m.content, m.create_time, s.app_name
-                    FROM messages m
-                    LEFT JOIN sessions s ON m.session_id = s.id
-                    WHERE m.user_id = ? 
-                    ORDER BY m.create_time DESC 
-                    LIMIT 10
-                """, (user_id,))
-                recent_messages = cursor.fetchall()
-            except Exception as e:
-                recent_messages = []
-                debug_info["message_error"] = str(e)
-            
-            # Obtener mensajes por sesión (últimas 3 sesiones)
-            try:
-                cursor = conn.execute("""
-                    SELECT session_id, COUNT(*) as message_count
-                    FROM messages 
-                    WHERE user_id = ? 
-                    GROUP BY session_id 
-                    ORDER BY MAX(create_time) DESC 
-                    LIMIT 3
-                """, (user_id,))
-                sessions_with_counts = cursor.fetchall()
-                
-                # Para cada sesión, obtener los mensajes
-                session_messages = {}
-                for session_id, _ in sessions_with_counts:
-                    cursor = conn.execute("""
-                        SELECT role, content, create_time
-                        FROM messages 
-                        WHERE user_id = ? AND session_id = ?
-                        ORDER BY create_time ASC
-                    """, (user_id, session_id))
-                    session_messages[session_id] = [
-                        {"role": row[0], "content": row[1][:200], "timestamp": row[2]}
-                        for row in cursor.fetchall()
-                    ]
-            except Exception as e:
-                session_messages = {}
-                debug_info["session_messages_error"] = str(e)
-            
-            # Verificar si hay memoria almacenada (usando esquema correcto ADK)
-            try:
-                cursor = conn.execute("SELECT COUNT(*) FROM memory WHERE user_id = ?", (user_id,))
-                memory_count = cursor.fetchone()[0]
-                
-                # Obtener memoria reciente
-                cursor = conn.execute("""
-                    SELECT id, content, create_time
-                    FROM memory 
-                    WHERE user_id = ? 
-                    ORDER BY create_time DESC 
-                    LIMIT 5
-                """, (user_id,))
-                recent_memory = cursor.fetchall()
-            except:
-                memory_count = 0
-                recent_memory = []
-            
-            conn.close()
-            
-            debug_info.update({
-                "database_path": db_path,
-                "session_count": session_count,
-                "message_count": message_count,
-                "memory_count": memory_count,
-                "recent_sessions": [
-                    {"session_id": row[0], "app_name": row[1], "create_time": row[2]}
-                    for row in recent_sessions
-                ],
-                "recent_messages": [
-                    {
-                        "session_id": row[0], 
-                        "role": row[1], 
-                        "content": row[2][:300] + "..." if len(row[2]) > 300 else row[2],
-                        "create_time": row[3],
-                        "app_name": row[4]
-                    }
-                    for row in recent_messages
-                ],
-                "session_messages": session_messages,
-                "recent_memory": [
-                    {"id": row[0], "content": row[1][:200], "create_time": row[2]}
-                    for row in recent_memory
-                ],
-                "db_file_size": os.path.getsize(db_path) if os.path.exists(db_path) else 0
-            })
-        else:
-            debug_info["database_path"] = db_path
-            debug_info["status"] = "Base de datos no encontrada"
+        # Mensajes de las 3 sesiones más recientes (las volcadas a disco se recargan)
+        session_messages = {}
+        for session in sessions[:3]:
+            events = await session_service.get_events_since(
+                app_name="adk_agent", user_id=user_id, session_id=session.id
+            ) or []
+            session_messages[session.id] = [
+                {"role": event.author, "content": event_text(event)[:200], "timestamp": event.timestamp}
+                for event in events if event_text(event)
+            ]
+        
+        debug_info.update({
+            "database_path": session_service.db_path,
+            "session_count": len(sessions),
+            "recent_sessions": [
+                {"session_id": s.id, "last_update_time": s.last_update_time}
+                for s in sessions[:5]
+            ],
+            "session_messages": session_messages,
+            "runtime": agent.get_runtime_stats(),
+        })
+    
+    elif selected_agent == "vertex":
+        # Vertex no guarda sesiones en local: memoria en el Memory Bank y métricas del agente
+        debug_info.update({
+            "memory_service": agent.get_memory_service_info(),
+            "runtime": agent.get_runtime_stats(),
+        })
     
     return debug_info
 
+# Token de los endpoints de administración (cabecera X-Admin-Token); sin él están desactivados
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN")
+
+def _admin_memory_system(request: Request):
+    """Sistema de memoria SQLite del agente activo para exportar/importar."""
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Administración desactivada: define ADMIN_API_TOKEN")
+    token = request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(token.encode("utf-8"), ADMIN_API_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="X-Admin-Token no válido")
+    memory_system = getattr(current_agent, "memory_system", None)
+    if memory_system is None:
+        raise HTTPException(status_code=400, detail="La exportación/importación requiere el Database Agent con backend sqlite")
+    return memory_system
+
+@app.get("/admin/export")
+async def export_memory(request: Request, user_id: Optional[str] = None, cursor: Optional[str] = None,
+                        chunk_size: int = 1000):
+    """Exportar la memoria en NDJSON (todo o un usuario); reanudable con el cursor de la última línea."""
+    from multi_tool_agent.storage import export_ndjson
+    from multi_tool_agent.storage.bulk_transfer import parse_cursor
+    
+    memory_system = _admin_memory_system(request)
+    if cursor:
+        try:
+            parse_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    def progress(rows, table):
+        logger.info("📤 Exportación: %s filas (%s)", rows, table)
+    
+    # Generador síncrono: Starlette lo recorre en su pool de hilos, trozo a trozo
+    lines = export_ndjson(memory_system, user_id, cursor, chunk_size, progress, progress_every=100000)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@app.post("/admin/import")
+async def import_memory(request: Request, import_id: Optional[str] = None, user_id: Optional[str] = None,
+                        batch_size: int = 5000):
+    """Importar NDJSON desde el cuerpo de la petición, por lotes y sin cargarlo entero en memoria.
+    
+    Con el mismo import_id, reenviar el fichero completo continúa donde se quedó.
+    """
+    from multi_tool_agent.storage import NDJSONImporter
+    
+    memory_system = _admin_memory_system(request)
+    import_id = import_id or f"api:{uuid.uuid4()}"
+    
+    def invalidate(user_ids):
+        # Las filas importadas cambian el contexto cacheado de esos usuarios
+        if current_agent.context_cache is not None:
+            for imported_user in user_ids:
+                current_agent.context_cache.invalidate(imported_user)
+    
+    def progress(stats):
+        logger.info("📥 Importación %s: línea %s, %s filas",
+                    stats['import_id'], stats['lines'], sum(stats['imported'].values()))
+    
+    # Las operaciones de base de datos se ejecutan en los hilos del almacén, no en el event loop
+    importer = await current_agent.memory.run(
+        NDJSONImporter, memory_system, import_id, batch_size, user_id, invalidate, progress
+    )
+    try:
+        pending = b""
+        async for chunk in request.stream():
+            pending += chunk
+            lines = pending.split(b"\n")
+            pending = lines.pop()
+            if lines:
+                await current_agent.memory.run(importer.add_lines, lines)
+        if pending.strip():
+            await current_agent.memory.run(importer.add_lines, [pending])
+        return await current_agent.memory.run(importer.finish)
+    except ValueError as e:
+        # Lo confirmado hasta aquí queda guardado: se puede corregir y reanudar
+        raise HTTPException(status_code=400, detail={"error": str(e), **importer.get_stats()})
+
 if __name__ == "__main__":
     import uvicorn
     